@@ -0,0 +1,159 @@
+"""
+Микробенчмарк операций db_service: запись отдельными транзакциями с нескольких соединений
+против единственного писателя с групповой фиксацией, а также профиль производительности SQLite
+(прагмы и пул соединений) против настроек SQLite и SQLAlchemy по умолчанию.
+
+Каждая операция выполняется как при обработке отдельного обновления: регистрация пользователя,
+добавление фильмов в избранное (включая попытку сверх лимита и повтор), чтение избранного
+через соединения только для чтения и очистка. Для каждого варианта создаётся своя временная база;
+запись отдельными транзакциями и единственный писатель сравниваются с профилем производительности SQLite.
+
+Два режима нагрузки:
+- предельная: CONCURRENCY пользователей работают одновременно, следующая группа начинает после
+  предыдущей. Чем быстрее вариант, тем чаще идут операции, поэтому задержка здесь включает очередь
+  к циклу событий и пулу соединений чтения, загруженным до предела;
+- одинаковая: каждые 1 / RATE секунд начинает новый пользователь, независимо от того, закончили ли
+  предыдущие. Оба варианта получают одинаковый поток операций, и задержки сравнимы напрямую.
+
+Профиль SQLite сравнивается при предельной нагрузке с единственным писателем, как в боте; без профиля
+движки создаются так же, как при SQLITE_PERFORMANCE_PROFILE=false.
+
+Запуск из корня проекта: python -m benchmarks.db_service
+"""
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from collections import defaultdict
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from config_data import config
+from db import close_db, create_db_engine, init_db
+from db import db_service
+from db.db_service import (AddFavouriteResult, add_movie_to_favourites_in_db, clear_all_favourites,
+                           get_favourites_page, get_user_id, user_writer)
+from db.user_cache import user_id_cache
+from db.writer import DbWriter
+
+USERS = 200
+CONCURRENCY = 20
+READS_PER_USER = 5
+RATES = (10, 20)  # Новых пользователей в секунду при одинаковой нагрузке
+WRITE_MODES = (('транзакция на изменение', False), ('единственный писатель', True))
+PROFILES = (('SQLite по умолчанию', False), ('профиль производительности', True))
+FAVOURITES_LIMIT = 10  # Лимит избранного в бенчмарке, чтобы проверялся и отказ по лимиту
+
+
+class DirectWriter:
+    """Запись как до появления писателя: своя сессия и своя транзакция на каждое изменение."""
+
+    def __init__(self, session_factory: async_sessionmaker):
+        self.session_factory = session_factory
+
+    async def submit(self, run):
+        async with self.session_factory() as session:
+            result = await run(session)
+            await session.commit()
+            return result
+
+    async def close(self) -> None:
+        pass
+
+
+async def user_session(read_factory: async_sessionmaker, telegram_id: int, timings: dict, errors: list) -> None:
+    async def timed(name: str, operation) -> None:
+        async with read_factory() as session:
+            started = time.perf_counter()
+            result = await operation(session)
+            timings[name].append(time.perf_counter() - started)
+            if result is AddFavouriteResult.ERROR:
+                errors.append(name)
+
+    # Регистрация как в /start: профиль ставится в очередь, а get_user_id записывает её и получает users.id
+    user_writer.register(telegram_id, f'user{telegram_id}', 'Имя', None)
+    await timed('register_user', lambda session: get_user_id(session, telegram_id))
+    user_id = user_id_cache.get(telegram_id)
+    # Лимит плюс одна попытка сверх лимита и один повтор
+    for movie_id in list(range(1, FAVOURITES_LIMIT + 2)) + [1]:
+        await timed('add_movie_to_favourites_in_db', lambda session: add_movie_to_favourites_in_db(
+            user_id=user_id, movie_id=movie_id, movie_name=f'Фильм {movie_id}',
+            release_year=2000, genres=['драма'], countries=['Россия'], limit=FAVOURITES_LIMIT,
+        ))
+    for _ in range(READS_PER_USER):
+        await timed('get_favourites_page', lambda session: get_favourites_page(session, telegram_id))
+    await timed('clear_all_favourites', lambda session: clear_all_favourites(session, telegram_id))
+
+
+# rate — новых пользователей в секунду; None — группами по CONCURRENCY без пауз
+async def run(url: str, single_writer: bool, rate: float | None = None,
+              performance_profile: bool = True) -> tuple[float, dict, list]:
+    write_engine = create_db_engine(url, performance_profile, pool_size=1 if single_writer else CONCURRENCY,
+                                    max_overflow=0)
+    read_engine = create_db_engine(url, performance_profile, pool_size=config.DB_READ_POOL_SIZE, max_overflow=0,
+                                   read_only=True)
+    await init_db(write_engine)
+
+    write_factory = async_sessionmaker(bind=write_engine, class_=AsyncSession, expire_on_commit=False)
+    read_factory = async_sessionmaker(bind=read_engine, class_=AsyncSession, expire_on_commit=False)
+    # db_service отправляет изменения через модульного писателя; подменяем его на писателя этой базы
+    writer = DbWriter(write_factory) if single_writer else DirectWriter(write_factory)
+    db_service.db_writer = writer
+    user_writer.writer = writer
+    user_id_cache._items.clear()
+    timings, errors = defaultdict(list), []
+
+    async def arrive(telegram_id: int) -> None:
+        await asyncio.sleep((telegram_id - 1) / rate)
+        await user_session(read_factory, telegram_id, timings, errors)
+
+    started = time.perf_counter()
+    if rate is None:
+        for first in range(1, USERS + 1, CONCURRENCY):
+            await asyncio.gather(*(
+                user_session(read_factory, telegram_id, timings, errors)
+                for telegram_id in range(first, min(first + CONCURRENCY, USERS + 1))
+            ))
+    else:
+        await asyncio.gather(*(arrive(telegram_id) for telegram_id in range(1, USERS + 1)))
+    elapsed = time.perf_counter() - started
+    await writer.close()
+    await read_engine.dispose()
+    await close_db(write_engine)
+    return elapsed, timings, errors
+
+
+def _percentile(values: list[float], share: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+async def main() -> None:
+    loads = [(f'предельная нагрузка, {CONCURRENCY} пользователей одновременно', None)]
+    loads += [(f'одинаковая нагрузка, {rate} новых пользователей в секунду', rate) for rate in RATES]
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for load, rate in loads:
+            for name, single_writer in WRITE_MODES:
+                url = f'sqlite+aiosqlite:///{os.path.join(tmp, f"{rate}-{single_writer}.sqlite")}'
+                results[load, f'Запись: {name}'] = await run(url, single_writer, rate)
+        load = 'Профиль SQLite, предельная нагрузка, единственный писатель'
+        for name, profile in PROFILES:
+            url = f'sqlite+aiosqlite:///{os.path.join(tmp, f"profile-{profile}.sqlite")}'
+            results[load, name] = await run(url, True, performance_profile=profile)
+
+    # clear_all_favourites печатает сообщение на каждого пользователя
+    print()
+    print(f'Пользователей: {USERS}')
+    for (load, name), (elapsed, timings, errors) in results.items():
+        values = [value for operation_values in timings.values() for value in operation_values]
+        print(f'\n{load}. {name}: {len(values) / elapsed:,.0f} операций/с, всего {elapsed:.2f} с, '
+              f'средняя задержка {statistics.mean(values) * 1000:.2f} мс, ошибок: {len(errors)}')
+        for operation, operation_values in timings.items():
+            print(f'  {operation:32} медиана {_percentile(operation_values, 0.5) * 1000:6.2f} мс, '
+                  f'p95 {_percentile(operation_values, 0.95) * 1000:6.2f} мс')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
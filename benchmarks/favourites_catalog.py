@@ -0,0 +1,148 @@
+"""
+Перенос избранного в общий каталог фильмов: объём базы и чтение страницы до и после.
+
+Создаётся база в прежней схеме, где название, год, жанры и страны копируются в каждую запись избранного:
+USERS пользователей по FAVOURITES_PER_USER фильмов из MOVIES популярных. Затем init_db переносит данные
+в каталог movies со справочниками жанров и стран. Замеряются размер файла (после VACUUM), время миграции
+и время чтения страницы избранного; проверяется, что страницы до и после совпадают.
+
+Запуск из корня проекта: python -m benchmarks.favourites_catalog
+"""
+import asyncio
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from config_data import config
+from db import close_db, create_db_engine, init_db
+from db.db_service import get_favourites_page
+
+USERS = 2000
+FAVOURITES_PER_USER = 50
+MOVIES = 3000
+REPEATS = 200
+
+GENRES = ['драма', 'комедия', 'боевик', 'триллер', 'фантастика', 'мелодрама', 'криминал', 'приключения',
+          'детектив', 'ужасы', 'мультфильм', 'семейный', 'биография', 'история', 'военный']
+COUNTRIES = ['США', 'Россия', 'Великобритания', 'Франция', 'Германия', 'Япония', 'Южная Корея', 'Италия',
+             'Испания', 'Канада']
+
+OLD_SCHEMA = '''
+CREATE TABLE users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, telegram_id INTEGER NOT NULL UNIQUE, username VARCHAR,
+    first_name VARCHAR, last_name VARCHAR, create_at VARCHAR NOT NULL, update_at VARCHAR
+);
+CREATE TABLE favorites_movie (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, movie_id INTEGER NOT NULL,
+    movie_name VARCHAR NOT NULL, genres VARCHAR, release_year INTEGER, country VARCHAR, create_at VARCHAR NOT NULL,
+    CONSTRAINT unique_user_movie UNIQUE (user_id, movie_id),
+    FOREIGN KEY(user_id) REFERENCES users (id) ON DELETE CASCADE
+);
+CREATE INDEX ix_favorites_movie_user_created ON favorites_movie (user_id, create_at);
+'''
+
+OLD_PAGE = '''
+SELECT id, create_at, movie_name, release_year, genres, country FROM favorites_movie
+WHERE user_id = ? ORDER BY create_at, id LIMIT ?
+'''
+
+# Тот же запрос, что строит get_favourites_page
+NEW_PAGE = '''
+SELECT f.id, f.create_at, m.name, m.release_year,
+    (SELECT group_concat(name, ', ') FROM (SELECT g.name FROM movie_genres mg JOIN genres g ON g.id = mg.genre_id
+        WHERE mg.movie_id = m.id ORDER BY mg.position)),
+    (SELECT group_concat(name, ', ') FROM (SELECT c.name FROM movie_countries mc JOIN countries c ON c.id = mc.country_id
+        WHERE mc.movie_id = m.id ORDER BY mc.position))
+FROM favorites_movie f JOIN movies m ON m.id = f.movie_id
+WHERE f.user_id = ? ORDER BY f.create_at, f.id LIMIT ?
+'''
+
+
+def create_old_database(path: str) -> None:
+    rng = random.Random(1)
+    movies = {
+        movie_id: (f'Фильм номер {movie_id}', 1950 + movie_id % 75,
+                   ', '.join(rng.sample(GENRES, rng.randint(1, 4))), ', '.join(rng.sample(COUNTRIES, rng.randint(1, 3))))
+        for movie_id in range(1, MOVIES + 1)
+    }
+    # Популярные фильмы добавляют в избранное чаще
+    weights = [1 / movie_id for movie_id in movies]
+    connection = sqlite3.connect(path)
+    connection.executescript(OLD_SCHEMA)
+    connection.executemany('INSERT INTO users (id, telegram_id, create_at) VALUES (?, ?, ?)',
+                           [(user_id, user_id, '2024-01-01 00:00:00') for user_id in range(1, USERS + 1)])
+    rows = []
+    for user_id in range(1, USERS + 1):
+        chosen = set()
+        while len(chosen) < FAVOURITES_PER_USER:
+            chosen.update(rng.choices(list(movies), weights, k=FAVOURITES_PER_USER - len(chosen)))
+        for number, movie_id in enumerate(chosen):
+            rows.append((user_id, movie_id, *movies[movie_id], f'2024-01-01 00:{number // 60:02d}:{number % 60:02d}'))
+    connection.executemany(
+        'INSERT INTO favorites_movie (user_id, movie_id, movie_name, release_year, genres, country, create_at) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?)', rows
+    )
+    connection.commit()
+    connection.close()
+
+
+def vacuumed_size(path: str) -> int:
+    connection = sqlite3.connect(path)
+    connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    connection.execute('VACUUM')
+    connection.close()
+    return os.path.getsize(path)
+
+
+def read_pages(path: str, query: str, user_ids: list[int]) -> tuple[float, list]:
+    connection = sqlite3.connect(path)
+    started = time.perf_counter()
+    pages = [connection.execute(query, (user_id, config.FAVOURITES_PAGE_SIZE + 1)).fetchall()
+             for user_id in user_ids]
+    elapsed = (time.perf_counter() - started) / len(user_ids) * 1000
+    connection.close()
+    return elapsed, pages
+
+
+async def main() -> None:
+    user_ids = [random.Random(2).randint(1, USERS) for _ in range(REPEATS)]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'favourites.sqlite')
+        create_old_database(path)
+        size_before = vacuumed_size(path)
+        old_time, old_pages = read_pages(path, OLD_PAGE, user_ids)
+
+        engine = create_db_engine(f'sqlite+aiosqlite:///{path}', pool_size=1, max_overflow=0)
+        started = time.perf_counter()
+        await init_db(engine)
+        migration_time = time.perf_counter() - started
+
+        session_factory = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+        pages = []
+        async with session_factory() as session:
+            started = time.perf_counter()
+            for user_id in user_ids:
+                pages.append(await get_favourites_page(session, user_id))
+            new_time = (time.perf_counter() - started) / len(user_ids) * 1000
+        await close_db(engine)
+        size_after = vacuumed_size(path)
+        join_time, join_pages = read_pages(path, NEW_PAGE, user_ids)
+
+    same = all(
+        [tuple(row) for row in old[:config.FAVOURITES_PAGE_SIZE]] == [tuple(row) for row in page.movies]
+        for old, page in zip(old_pages, pages)
+    ) and old_pages == join_pages
+    print(f'Избранное: {USERS} пользователей по {FAVOURITES_PER_USER} фильмов из {MOVIES}')
+    print(f'Размер базы: {size_before / 2 ** 20:.1f} МБ -> {size_after / 2 ** 20:.1f} МБ')
+    print(f'Миграция: {migration_time:.2f} с')
+    print(f'Запрос страницы избранного (sqlite3): {old_time:.3f} мс -> {join_time:.3f} мс с соединением с каталогом')
+    print(f'get_favourites_page: {new_time:.2f} мс')
+    print(f'Страницы совпадают: {"OK" if same else "ОШИБКА"}')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
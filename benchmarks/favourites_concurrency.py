@@ -0,0 +1,104 @@
+"""
+Проверка атомарности добавления в избранное при параллельных нажатиях.
+
+Первый сценарий: пользователь одновременно добавляет PARALLEL_ADDS разных фильмов. В избранном
+должно оказаться ровно LIMIT фильмов, остальные запросы должны получить «достигнут лимит».
+
+Второй сценарий: двойное нажатие — PARALLEL_DUPLICATES одновременных добавлений одного фильма.
+Фильм должен добавиться один раз, остальные запросы должны получить «уже в избранном».
+
+Оба сценария выполняются через единственного писателя бота и с отдельной транзакцией на своём
+соединении для каждого запроса — так одновременно пишут несколько процессов-воркеров.
+
+Если хотя бы одна гарантия нарушена, скрипт завершается с ненулевым кодом.
+
+Запуск из корня проекта: python -m benchmarks.favourites_concurrency
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from benchmarks.db_service import DirectWriter
+from db import Base, create_db_engine, db_service
+from db.db_service import AddFavouriteResult, add_movie_to_favourites_in_db
+from db.models import FavoritesMovie, Users
+from db.writer import DbWriter
+
+PARALLEL_ADDS = 100
+PARALLEL_DUPLICATES = 50
+LIMIT = 10  # Лимит избранного в проверке: меньше PARALLEL_ADDS
+
+
+async def add(user_id: int, movie_id: int) -> AddFavouriteResult:
+    return await add_movie_to_favourites_in_db(
+        user_id=user_id, movie_id=movie_id, movie_name=f'Фильм {movie_id}',
+        release_year=2000, genres=['драма'], countries=['Россия'], limit=LIMIT,
+    )
+
+
+async def run_parallel(user_id: int, movie_ids: list[int]) -> tuple[Counter, float]:
+    started = time.perf_counter()
+    results = await asyncio.gather(*(add(user_id, movie_id) for movie_id in movie_ids))
+    return Counter(result.value for result in results), time.perf_counter() - started
+
+
+async def count_favourites(session_factory: async_sessionmaker, user_id: int) -> int:
+    async with session_factory() as session:
+        return await session.scalar(select(func.count(FavoritesMovie.id)).where(FavoritesMovie.user_id == user_id))
+
+
+async def run(path: str, single_writer: bool) -> bool:
+    if single_writer:
+        engine = create_db_engine(f'sqlite+aiosqlite:///{path}', pool_size=1, max_overflow=0)
+    else:
+        # Каждый запрос на своём соединении; все одновременно ждут блокировку записи, поэтому ожидание
+        # увеличено, чтобы проверялась атомарность, а не таймаут блокировки
+        engine = create_async_engine(f'sqlite+aiosqlite:///{path}', connect_args={'timeout': 30})
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    async with session_factory() as session:
+        session.add_all([Users(id=1, telegram_id=1), Users(id=2, telegram_id=2)])
+        await session.commit()
+
+    # db_service отправляет изменения через модульного писателя; подменяем его на писателя этой базы
+    writer = DbWriter(session_factory) if single_writer else DirectWriter(session_factory)
+    db_service.db_writer = writer
+    limit_results, limit_time = await run_parallel(1, list(range(1, PARALLEL_ADDS + 1)))
+    duplicate_results, duplicate_time = await run_parallel(2, [1] * PARALLEL_DUPLICATES)
+    await writer.close()
+    limit_count = await count_favourites(session_factory, 1)
+    duplicate_count = await count_favourites(session_factory, 2)
+    await engine.dispose()
+
+    # Каждый запрос должен получить ожидаемый ответ, а не ошибку
+    limit_ok = limit_count == LIMIT and limit_results == Counter(added=LIMIT, limit_reached=PARALLEL_ADDS - LIMIT)
+    duplicate_ok = duplicate_count == 1 and duplicate_results == Counter(added=1, duplicate=PARALLEL_DUPLICATES - 1)
+
+    print(f'\n{"Единственный писатель" if single_writer else "Транзакция на своём соединении"}')
+    print(f'{PARALLEL_ADDS} параллельных добавлений разных фильмов за {limit_time * 1000:.0f} мс: '
+          f'{dict(limit_results)}')
+    print(f'В избранном {limit_count} фильмов при лимите {LIMIT}: {"OK" if limit_ok else "ОШИБКА"}')
+    print(f'{PARALLEL_DUPLICATES} параллельных добавлений одного фильма за {duplicate_time * 1000:.0f} мс: '
+          f'{dict(duplicate_results)}')
+    print(f'В избранном {duplicate_count} фильм(ов): {"OK" if duplicate_ok else "ОШИБКА"}')
+    return limit_ok and duplicate_ok
+
+
+async def main() -> bool:
+    passed = True
+    with tempfile.TemporaryDirectory() as tmp:
+        for single_writer in (True, False):
+            passed &= await run(os.path.join(tmp, f'favourites_{single_writer}.sqlite'), single_writer)
+    return passed
+
+
+if __name__ == '__main__':
+    if not asyncio.run(main()):
+        sys.exit('Гарантии лимита или защиты от дубликатов нарушены')
@@ -0,0 +1,86 @@
+"""
+Замер удаления фильмов из избранного: по одному объекту ORM против одного DELETE ... RETURNING.
+
+Для каждого из USERS пользователей удаляются DELETE_COUNT фильмов из FAVOURITES_COUNT, среди них
+одна запись, уже удалённая раньше (как при повторном удалении с той же страницы).
+
+Запуск из корня проекта: python -m benchmarks.favourites_delete
+"""
+import asyncio
+import os
+import tempfile
+import time
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from db import close_db, create_db_engine, init_db
+from db.db_service import _delete_by_ids
+from db.models import FavoritesMovie, Movie, Users
+
+USERS = 300
+FAVOURITES_COUNT = 30
+DELETE_COUNT = 10
+
+
+async def delete_per_object(session: AsyncSession, user_id: int, favourite_ids: list[int]) -> list[str]:
+    """Прежний способ: загрузка и удаление каждой записи через сессию (название фильма — из каталога)."""
+    deleted_movies = []
+    for favourite_id in favourite_ids:
+        movie_to_delete = await session.get(FavoritesMovie, favourite_id)
+        if movie_to_delete is None:
+            continue
+        await session.delete(movie_to_delete)
+        deleted_movies.append(await session.scalar(select(Movie.name).where(Movie.id == movie_to_delete.movie_id)))
+    await session.flush()
+    return deleted_movies
+
+
+async def run(path: str, delete) -> tuple[float, int]:
+    engine = create_db_engine(f'sqlite+aiosqlite:///{path}', pool_size=1, max_overflow=0)
+    await init_db(engine)
+    session_factory = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    async with session_factory() as session:
+        await session.execute(insert(Users), [{'id': user_id, 'telegram_id': user_id}
+                                              for user_id in range(1, USERS + 1)])
+        await session.execute(insert(Movie), [{'id': number, 'name': f'Фильм {number}', 'updated_at': 0}
+                                              for number in range(FAVOURITES_COUNT)])
+        await session.execute(insert(FavoritesMovie), [
+            {'user_id': user_id, 'movie_id': number}
+            for user_id in range(1, USERS + 1) for number in range(FAVOURITES_COUNT)
+        ])
+        await session.commit()
+        rows = (await session.execute(select(FavoritesMovie.user_id, FavoritesMovie.id))).all()
+    ids = {}
+    for user_id, favourite_id in rows:
+        ids.setdefault(user_id, []).append(favourite_id)
+
+    deleted = 0
+    started = time.perf_counter()
+    for user_id in range(1, USERS + 1):
+        async with session_factory() as session:
+            result = await delete(session, user_id, ids[user_id][:DELETE_COUNT])
+            await session.commit()
+        deleted += len(result)
+    elapsed = time.perf_counter() - started
+    await close_db(engine)
+    return elapsed, deleted
+
+
+async def main() -> None:
+    async def set_based(session, user_id, favourite_ids):
+        return list((await _delete_by_ids(session, user_id, favourite_ids)).values())
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, delete in (('по одному объекту ORM', delete_per_object), ('DELETE ... RETURNING', set_based)):
+            # Повторное удаление первой записи: сначала удаляем её отдельно
+            async def with_stale(session, user_id, favourite_ids, delete=delete):
+                await delete(session, user_id, favourite_ids[:1])
+                return await delete(session, user_id, favourite_ids)
+
+            elapsed, deleted = await run(os.path.join(tmp, f'{name[:6]}.sqlite'), with_stale)
+            print(f'{name:24} {elapsed / USERS * 1000:6.2f} мс на удаление, удалено при повторе: {deleted}')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,111 @@
+"""
+Замер чтения страницы избранного: курсор (create_at, id) против OFFSET и загрузки всего списка.
+
+У пользователя FAVOURITES_COUNTS фильмов, у остальных USERS пользователей — по OTHER_FAVOURITES.
+Для первой, средней и последней страниц замеряется время запроса страницы через get_favourites_page,
+тот же запрос (те же столбцы и соединения с каталогом) с OFFSET вместо курсора и прежняя загрузка
+всего избранного пользователя. Замер повторяется для избранного размером с лимит FAVOURITES_LIMIT
+и для избранного больше лимита — глубины, на которой видна разница между курсором и OFFSET.
+
+Запуск из корня проекта: python -m benchmarks.favourites_pages
+"""
+import asyncio
+import os
+import tempfile
+import time
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from config_data import config
+from db import close_db, create_db_engine, init_db
+from db.db_service import _favourites_select, get_favourites_page
+from db.models import FavoritesMovie, Movie, Users
+
+FAVOURITES_COUNTS = (config.FAVOURITES_LIMIT, 10_000)
+USERS = 200
+OTHER_FAVOURITES = 200
+REPEATS = 200
+
+
+def _create_at(number: int) -> str:
+    # Несколько фильмов за одну секунду: порядок внутри секунды задаёт id
+    return f'2024-01-01 {number // 3600 // 3 % 24:02d}:{number // 60 // 3 % 60:02d}:{number // 3 % 60:02d}'
+
+
+async def fill(session_factory: async_sessionmaker, favourites_count: int) -> None:
+    async with session_factory() as session:
+        await session.execute(insert(Users), [{'id': user_id, 'telegram_id': user_id} for user_id in range(1, USERS + 2)])
+        await session.execute(insert(Movie), [{'id': number, 'name': f'Фильм {number}', 'updated_at': 0}
+                                              for number in range(max(favourites_count, OTHER_FAVOURITES))])
+        rows = [{'user_id': 1, 'movie_id': number, 'create_at': _create_at(number)} for number in range(favourites_count)]
+        rows += [{'user_id': user_id, 'movie_id': number, 'create_at': _create_at(number)}
+                 for user_id in range(2, USERS + 2) for number in range(OTHER_FAVOURITES)]
+        await session.execute(insert(FavoritesMovie), rows)
+        await session.commit()
+
+
+async def timed(operation) -> float:
+    started = time.perf_counter()
+    for _ in range(REPEATS):
+        await operation()
+    return (time.perf_counter() - started) / REPEATS * 1000
+
+
+async def measure(tmp: str, favourites_count: int) -> None:
+    page_size = config.FAVOURITES_PAGE_SIZE
+    url = f'sqlite+aiosqlite:///{os.path.join(tmp, f"favourites-{favourites_count}.sqlite")}'
+    engine = create_db_engine(url, pool_size=1, max_overflow=0)
+    await init_db(engine)
+    session_factory = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    await fill(session_factory, favourites_count)
+
+    async with session_factory() as session:
+        ordered = (await session.execute(
+            select(FavoritesMovie.create_at, FavoritesMovie.id)
+            .where(FavoritesMovie.user_id == 1)
+            .order_by(FavoritesMovie.create_at, FavoritesMovie.id)
+        )).all()
+    pages = (favourites_count + page_size - 1) // page_size
+
+    print(f'\nИзбранное: {favourites_count} фильмов, страница: {page_size}, запросов на замер: {REPEATS}')
+    for page_number in (1, pages // 2, pages):
+        offset = (page_number - 1) * page_size
+        cursor = tuple(ordered[offset - 1]) if offset else None
+
+        async with session_factory() as session:
+            async def keyset():
+                page = await get_favourites_page(session, 1, cursor)
+                assert page.movies[0].id == ordered[offset][1]
+
+            async def with_offset():
+                async with session.begin():
+                    movies = (await session.execute(
+                        _favourites_select(1)
+                        .order_by(FavoritesMovie.create_at, FavoritesMovie.id)
+                        .limit(page_size + 1).offset(offset)
+                    )).all()
+                assert movies[0].id == ordered[offset][1]
+
+            async def full_list():
+                async with session.begin():
+                    movies = (await session.scalars(
+                        select(FavoritesMovie).where(FavoritesMovie.user_id == 1)
+                        .order_by(FavoritesMovie.create_at, FavoritesMovie.id)
+                    )).all()
+                    movies[offset:offset + page_size]
+
+            results = [await timed(keyset), await timed(with_offset), await timed(full_list)]
+        print(f'Страница {page_number:5}: курсор {results[0]:6.2f} мс, OFFSET {results[1]:6.2f} мс, '
+              f'весь список {results[2]:7.2f} мс')
+    await close_db(engine)
+
+
+async def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        for favourites_count in FAVOURITES_COUNTS:
+            await measure(tmp, favourites_count)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,122 @@
+"""
+Замер объёма данных FSM одной пользовательской сессии до и после перехода на хранение ID.
+
+Сессия: поиск 20 фильмов, детальная информация об актёре с фильмографией и фактами,
+просмотр 10 избранных фильмов. Документы API синтетические, но повторяют структуру ответов
+kinopoisk.dev. Размер считается как суммарный sys.getsizeof всех объектов, достижимых из
+данных состояния (так их держит MemoryStorage), и как размер JSON для внешних хранилищ.
+
+Запуск из корня проекта: python -m benchmarks.fsm_state_size
+"""
+import gc
+import json
+import sys
+import types
+
+from sqlalchemy.orm.state import InstanceState
+
+from db.models import FavoritesMovie
+from kinopoisk_API.models import MovieCard, PersonCard
+
+SEARCH_LIMIT = 20
+FILMOGRAPHY_SIZE = 300
+FACTS_COUNT = 20
+FAVOURITES_COUNT = 10
+
+
+def _is_shared(obj) -> bool:
+    """Объекты, общие для всего процесса: классы, модули, функции и служебные объекты SQLAlchemy."""
+    if obj is None or isinstance(obj, (type, types.ModuleType, types.FunctionType)):
+        return True
+    module = type(obj).__module__ or ''
+    return module.startswith('sqlalchemy') and not isinstance(obj, InstanceState)
+
+
+def deep_sizeof(obj) -> int:
+    """Суммарный размер объекта и всех достижимых из него объектов, кроме общих для процесса."""
+    seen = set()
+    stack = [obj]
+    total = 0
+    while stack:
+        current = stack.pop()
+        if id(current) in seen or _is_shared(current):
+            continue
+        seen.add(id(current))
+        total += sys.getsizeof(current)
+        stack.extend(gc.get_referents(current))
+    return total
+
+
+def movie_doc(i: int) -> dict:
+    return {
+        'id': 1000 + i, 'name': f'Фильм номер {i}', 'alternativeName': f'Movie number {i}', 'enName': None,
+        'type': 'movie', 'year': 1990 + i % 30, 'description': 'Описание фильма. ' * 20, 'shortDescription': 'Кратко.',
+        'movieLength': 120, 'isSeries': False, 'ticketsOnSale': False, 'totalSeriesLength': None, 'seriesLength': None,
+        'ratingMpaa': 'r', 'ageRating': 18, 'top10': None, 'top250': None, 'typeNumber': 1, 'status': None,
+        'names': [{'name': f'Фильм номер {i}'}, {'name': f'Movie number {i}', 'language': 'US', 'type': None}],
+        'externalId': {'imdb': f'tt{i:07d}', 'tmdb': i, 'kpHD': 'x' * 32},
+        'logo': {'url': 'https://example.org/logo.png'},
+        'poster': {'url': f'https://example.org/poster/{i}.jpg', 'previewUrl': f'https://example.org/preview/{i}.jpg'},
+        'backdrop': {'url': f'https://example.org/backdrop/{i}.jpg', 'previewUrl': None},
+        'rating': {'kp': 7.5, 'imdb': 7.1, 'filmCritics': 6.9, 'russianFilmCritics': 80.0, 'await': None},
+        'votes': {'kp': 100000, 'imdb': 50000, 'filmCritics': 100, 'russianFilmCritics': 10, 'await': 0},
+        'genres': [{'name': 'драма'}, {'name': 'триллер'}], 'countries': [{'name': 'США'}, {'name': 'Великобритания'}],
+        'releaseYears': [],
+    }
+
+
+def person_doc() -> dict:
+    return {
+        'id': 7836, 'name': 'Имя Фамилия', 'enName': 'Name Surname', 'photo': 'https://example.org/actor.jpg',
+        'sex': 'Мужской', 'growth': 186, 'birthday': '1964-09-02T00:00:00.000Z', 'death': None, 'age': 60,
+        'birthPlace': [{'value': 'Город'}, {'value': 'Страна'}], 'deathPlace': [],
+        'spouses': [{'id': 1, 'name': 'Супруга', 'divorced': True, 'divorcedReason': '', 'sex': 'Женский',
+                     'children': 1, 'relation': 'супруга'}],
+        'countAwards': 12, 'profession': [{'value': 'Актер'}, {'value': 'Продюсер'}],
+        'facts': [{'value': 'Интересный факт об актёре. ' * 8} for _ in range(FACTS_COUNT)],
+        'movies': [
+            {'id': 2000 + i, 'name': f'Фильм номер {i}', 'alternativeName': f'Movie number {i}', 'rating': 7.2,
+             'general': i % 3 == 0, 'description': 'Роль персонажа', 'enProfession': 'actor'}
+            for i in range(FILMOGRAPHY_SIZE)
+        ],
+    }
+
+
+def state_before() -> dict:
+    """Состояние в старом формате: список фильмов, полный ответ API об актёре и объекты ORM."""
+    docs = [movie_doc(i) for i in range(SEARCH_LIMIT)]
+    movies = [{'name': doc['name'], 'year': doc['year'], 'genres': ', '.join(g['name'] for g in doc['genres']),
+               'country': ', '.join(c['name'] for c in doc['countries']), 'id': doc['id']} for doc in docs]
+    favourites = [
+        FavoritesMovie(id=i, user_id=1, movie_id=1000 + i, create_at='2024-01-01 00:00:00')
+        for i in range(FAVOURITES_COUNT)
+    ]
+    return {'movie_name': 'фильм', 'limit_message_id': 1, 'movies': movies,
+            'actor_info': person_doc(), 'favourites': favourites}
+
+
+def state_after() -> dict:
+    """Состояние в новом формате: индекс фильмов по ID, ID актёра и ID записей избранного."""
+    cards = [MovieCard.from_api(movie_doc(i)) for i in range(SEARCH_LIMIT)]
+    movies = {str(card.id): {'name': card.name, 'year': card.year, 'genres': list(card.genres),
+                             'countries': list(card.countries)} for card in cards}
+    actor = PersonCard.from_api(person_doc())
+    return {'movie_name': 'фильм', 'limit_message_id': 1, 'movies': movies,
+            'actor_id': actor.id, 'favourites': list(range(FAVOURITES_COUNT))}
+
+
+def main() -> None:
+    before = state_before()
+    after = state_after()
+    before_json = len(json.dumps({k: v for k, v in before.items() if k != 'favourites'}, ensure_ascii=False).encode())
+    after_json = len(json.dumps(after, ensure_ascii=False).encode())
+
+    print(f'{"":<28}{"до":>12}{"после":>12}')
+    print(f'{"Память на сессию, байт":<28}{deep_sizeof(before):>12}{deep_sizeof(after):>12}')
+    print(f'{"JSON на сессию, байт":<28}{before_json:>12}{after_json:>12}'
+          f'   (до: без объектов ORM, они не сериализуются)')
+    print(f'Сессий на 1 ГБ: {2 ** 30 // deep_sizeof(before)} -> {2 ** 30 // deep_sizeof(after)}')
+
+
+if __name__ == '__main__':
+    main()
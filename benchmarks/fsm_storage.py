@@ -0,0 +1,95 @@
+"""
+Сравнение пропускной способности хранилищ FSM: MemoryStorage и SQLiteStorage.
+
+Нагрузка повторяет работу обработчиков: на каждое обновление чтение состояния и данных,
+затем set_state и update_data с небольшим индексом фильмов. Обновления идут от USERS
+пользователей по кругу. Для SQLiteStorage используется временная база; после нагрузки
+хранилище закрывается (последняя запись на диск входит в замер) и проверяется, что
+состояния читаются новым экземпляром хранилища.
+
+Запуск из корня проекта: python -m benchmarks.fsm_storage
+"""
+import asyncio
+import os
+import tempfile
+import time
+
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from db.fsm_storage import SQLiteStorage
+from db.models import FsmRecord
+from db.writer import DbWriter
+from utils import metrics
+
+USERS = 1000
+UPDATES = 50_000
+BOT_ID = 42
+
+MOVIES = {
+    str(movie_id): {'name': f'Фильм {movie_id}', 'year': 2000 + movie_id % 25,
+                    'genres': ['драма', 'комедия'], 'countries': ['Россия']}
+    for movie_id in range(1, 11)
+}
+
+
+def _key(user_id: int) -> StorageKey:
+    return StorageKey(bot_id=BOT_ID, chat_id=user_id, user_id=user_id)
+
+
+async def run_load(storage) -> float:
+    """
+    Прогоняет нагрузку через хранилище.
+
+    :return: Обновлений в секунду.
+    """
+    started = time.perf_counter()
+    for n in range(UPDATES):
+        key = _key(n % USERS)
+        await storage.get_state(key)
+        await storage.get_data(key)
+        await storage.set_state(key, 'UserState:waiting_for_favourites' if n % 2 else 'UserState:waiting_for_movie_name')
+        await storage.update_data(key, {'movies': MOVIES, 'step': n})
+        # Между обновлениями цикл событий обслуживает другие задачи, в том числе фоновую запись
+        await asyncio.sleep(0)
+    await storage.close()
+    return UPDATES / (time.perf_counter() - started)
+
+
+async def main() -> None:
+    memory_rate = await run_load(MemoryStorage())
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f'sqlite+aiosqlite:///{os.path.join(tmp, "fsm.sqlite")}')
+        async with engine.begin() as conn:
+            await conn.run_sync(FsmRecord.__table__.create)
+        session_factory = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+
+        writer = DbWriter(session_factory)
+
+        storage = SQLiteStorage(writer=writer, read_session_factory=session_factory)
+        await storage.start()
+        sqlite_rate = await run_load(storage)
+
+        reopened = SQLiteStorage(writer=writer, read_session_factory=session_factory)
+        await reopened.start()
+        rows = await reopened.count()
+        restored = await reopened.get_data(_key(USERS - 1))
+        await reopened.close()
+        await writer.close()
+        await engine.dispose()
+
+    flushes = metrics.counters['fsm_storage.flushes']
+    written = metrics.counters['fsm_storage.rows_written']
+    print(f'Обновлений: {UPDATES}, пользователей: {USERS}')
+    print(f'MemoryStorage: {memory_rate:,.0f} обновлений/с')
+    print(f'SQLiteStorage: {sqlite_rate:,.0f} обновлений/с ({sqlite_rate / memory_rate:.0%} от MemoryStorage)')
+    print(f'Записей на диск: {written} строк за {flushes} транзакций '
+          f'(на {UPDATES * 2} изменений состояния и данных)')
+    print(f'После перезапуска: строк {rows}, данные последнего пользователя восстановлены: '
+          f'{restored.get("step") == UPDATES - 1}')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,126 @@
+"""
+Локальный индекс фильмов (FTS5): доля поисков без обращения к API и задержка ответа.
+
+Синтетический каталог из MOVIES фильмов с названиями из одного-трёх слов и поток из QUERIES поисков:
+популярные фильмы ищут чаще (распределение Ципфа), запрос — полное название или его первые слова, лимит —
+один из вариантов клавиатуры бота. Если индекс не отвечает, поиск идёт в имитацию API (задержка API_LATENCY,
+фильмы, название которых начинается со слов запроса, по рейтингу), и её ответ добавляется в индекс.
+
+Запуск из корня проекта: python -m benchmarks.movie_index
+"""
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from db import close_db, create_db_engine, init_db
+from db.writer import DbWriter
+from kinopoisk_API.movie_index import MovieIndex, _words
+
+MOVIES = 5000
+VOCABULARY = 800
+QUERIES = 2000
+CONCURRENCY = int(os.getenv("CONCURRENCY", 20))
+API_LATENCY = float(os.getenv('API_LATENCY', 0.2))  # Задержка ответа API, сек
+LIMITS = [1, 3, 5, 10, 15, 20]
+
+
+def make_catalog(rng: random.Random) -> list[dict]:
+    syllables = ['ма', 'три', 'ца', 'ло', 'ви', 'на', 'ко', 'рот', 'сан', 'дер', 'ли', 'мон', 'та', 'бе', 'зу', 'пол']
+    words = sorted({''.join(rng.choices(syllables, k=rng.randint(2, 4))) for _ in range(VOCABULARY * 2)})[:VOCABULARY]
+    rng.shuffle(words)
+    word_weights = [1 / (rank + 1) for rank in range(len(words))]
+    return [{
+        'id': movie_id,
+        'name': ' '.join(rng.choices(words, word_weights, k=rng.randint(1, 3))).capitalize(),
+        'enName': None,
+        'alternativeName': None,
+        'year': 1950 + movie_id % 75,
+        'description': 'Описание фильма',
+        'genres': [{'name': 'драма'}],
+        'countries': [{'name': 'Россия'}],
+        'rating': {'kp': round(rng.uniform(4, 9), 1)},
+        'poster': {'url': f'https://example.org/{movie_id}.jpg'},
+    } for movie_id in range(1, MOVIES + 1)]
+
+
+def make_queries(rng: random.Random, catalog: list[dict]) -> list[tuple[str, int]]:
+    weights = [1 / (rank + 1) for rank in range(len(catalog))]
+    queries = []
+    for movie in rng.choices(catalog, weights, k=QUERIES):
+        words = movie['name'].split()
+        query = ' '.join(words if rng.random() < 0.7 else words[:rng.randint(1, len(words))])
+        queries.append((query, rng.choice(LIMITS)))
+    return queries
+
+
+def make_api(catalog: list[dict]):
+    """Имитация поиска API: фильмы, название которых начинается со слов запроса, по рейтингу."""
+    by_prefix = {}
+    for movie in sorted(catalog, key=lambda movie: -movie['rating']['kp']):
+        words = tuple(_words(movie['name']))
+        for length in range(1, len(words) + 1):
+            by_prefix.setdefault(words[:length], []).append(movie)
+
+    async def search(query: str, limit: int) -> list[dict]:
+        await asyncio.sleep(API_LATENCY)
+        return by_prefix.get(tuple(_words(query)), [])[:limit]
+
+    return search
+
+
+async def main() -> None:
+    rng = random.Random(1)
+    catalog = make_catalog(rng)
+    queries = make_queries(rng, catalog)
+    fake_api = make_api(catalog)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f'sqlite+aiosqlite:///{os.path.join(tmp, "index.sqlite")}'
+        write_engine = create_db_engine(url, pool_size=1, max_overflow=0)
+        read_engine = create_db_engine(url, pool_size=4, max_overflow=0, read_only=True)
+        await init_db(write_engine)
+        writer = DbWriter(async_sessionmaker(bind=write_engine, class_=AsyncSession, expire_on_commit=False))
+        index = MovieIndex(async_sessionmaker(bind=read_engine, class_=AsyncSession, expire_on_commit=False),
+                           writer, enabled=True)
+
+        hits, misses, hit_flags, by_limit = [], [], [], {}
+
+        async def search(query: str, limit: int) -> None:
+            started = time.perf_counter()
+            cards = await index.search(query, limit)
+            if cards is None:
+                await index.add(await fake_api(query, limit))
+                misses.append(time.perf_counter() - started)
+            else:
+                hits.append(time.perf_counter() - started)
+            hit_flags.append(cards is not None)
+            by_limit.setdefault(limit, []).append(cards is not None)
+
+        started = time.perf_counter()
+        for first in range(0, len(queries), CONCURRENCY):
+            await asyncio.gather(*(search(query, limit) for query, limit in queries[first:first + CONCURRENCY]))
+        elapsed = time.perf_counter() - started
+
+        await writer.close()
+        await read_engine.dispose()
+        await close_db(write_engine)
+
+    quarter = len(hit_flags) // 4
+    print(f'Каталог: {MOVIES} фильмов, поисков: {QUERIES}, задержка API: {API_LATENCY * 1000:.0f} мс, '
+          f'всего {elapsed:.1f} с')
+    print(f'Ответов из индекса: {len(hits) / len(hit_flags):.0%} '
+          f'(первая четверть потока {sum(hit_flags[:quarter]) / quarter:.0%}, '
+          f'последняя {sum(hit_flags[-quarter:]) / quarter:.0%})')
+    print('По лимиту: ' + ', '.join(f'{limit}: {sum(flags) / len(flags):.0%}'
+                                    for limit, flags in sorted(by_limit.items())))
+    print(f'Задержка: из индекса медиана {statistics.median(hits) * 1000:.2f} мс, '
+          f'через API медиана {statistics.median(misses) * 1000:.1f} мс')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,148 @@
+"""
+Исправление опечаток по триграммному индексу имён: время поиска, точность и пополнение индекса.
+
+Синтетический справочник из NAMES имён персон (имя и фамилия из слогов). Для QUERIES случайных имён
+запрос получает от одной до допустимого для такой длины числа опечаток (замена, пропуск, вставка или
+перестановка соседних букв). Опечатка исправима, если не меняет число слов и укладывается в правила
+для отдельных слов (см. TrigramIndex.correct); для исправимых исправление верно, если индекс вернул
+исходное имя, и ошибочно — если вернул другое. Неисправимые опечатки не должны исправляться в исходное
+имя. Отдельно замеряются запросы, которые совпадают с началом известного имени и не должны исправляться,
+продолжения с другим номером («имя 3» при известном «имя 2»), запись и загрузка снимка индекса,
+которым главный процесс делится с воркерами, и добавление ADDS новых имён в уже построенный индекс.
+
+Запуск из корня проекта: python -m benchmarks.name_matcher
+"""
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from kinopoisk_API.name_matcher import (TrigramIndex, _max_distance, _read_snapshot, _same_words, _write_snapshot,
+                                        normalize_name)
+
+NAMES = 300_000
+QUERIES = 2000
+ADDS = 10_000
+LETTERS = 'абвгдежзийклмнопрстуфхцчшщыэюя'
+
+
+def make_names(rng: random.Random, count: int) -> list[str]:
+    # Слоги из начала (согласная или сочетание согласных), гласной и необязательного конца; частые слоги
+    # встречаются чаще редких (распределение Ципфа), как в настоящих именах
+    onsets = list('бвгдзклмнпрстфхцчшж') + ['бр', 'гр', 'др', 'кр', 'пр', 'тр', 'ст', 'св', 'шт', 'вл', 'кл', 'пл']
+    syllables = [onset + vowel + coda for onset in onsets for vowel in 'аеиоуыяэю'
+                 for coda in ('', '', '', 'н', 'р', 'л', 'с', 'й', 'м', 'к')]
+    syllables = sorted(set(syllables))
+    rng.shuffle(syllables)
+    weights = [1 / (rank + 1) for rank in range(len(syllables))]
+    endings = ['', '', 'н', 'в', 'ов', 'ев', 'ин', 'ский', 'ович', 'енко', 'ман', 'сон']
+    names = set()
+    while len(names) < count:
+        first = ''.join(rng.choices(syllables, weights, k=rng.randint(2, 3)))
+        last = ''.join(rng.choices(syllables, weights, k=rng.randint(2, 3))) + rng.choice(endings)
+        names.add(f'{first} {last}'.title())
+    names = sorted(names)
+    rng.shuffle(names)
+    return names
+
+
+def misspell(rng: random.Random, name: str, typos: int) -> str:
+    for _ in range(typos):
+        position = rng.randrange(1, len(name) - 1)
+        kind = rng.choice(('replace', 'delete', 'insert', 'swap'))
+        if kind == 'replace':
+            name = name[:position] + rng.choice(LETTERS) + name[position + 1:]
+        elif kind == 'delete':
+            name = name[:position] + name[position + 1:]
+        elif kind == 'insert':
+            name = name[:position] + rng.choice(LETTERS) + name[position:]
+        else:
+            name = name[:position - 1] + name[position] + name[position - 1] + name[position + 1:]
+    return name
+
+
+def correctable(query: str, name: str) -> bool:
+    query_words, name_words = normalize_name(query).split(' '), normalize_name(name).split(' ')
+    return len(query_words) == len(name_words) and _same_words(query_words, name_words)
+
+
+def _percentile(values: list[float], share: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+def _report(title: str, timings: list[float]) -> None:
+    print(f'{title}: медиана {statistics.median(timings) * 1000:.3f} мс, '
+          f'p95 {_percentile(timings, 0.95) * 1000:.3f} мс, p99 {_percentile(timings, 0.99) * 1000:.3f} мс')
+
+
+def main() -> None:
+    rng = random.Random(25)
+    names = make_names(rng, NAMES + ADDS)
+    index = TrigramIndex()
+
+    started = time.perf_counter()
+    index.add(names[:NAMES])
+    print(f'Построение индекса из {len(index):,} имён: {time.perf_counter() - started:.1f} с')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'name_indexes.pickle')
+        started = time.perf_counter()
+        _write_snapshot(path, (index, TrigramIndex()))
+        written = time.perf_counter() - started
+        started = time.perf_counter()
+        _read_snapshot(path)
+        print(f'Снимок индекса: {os.path.getsize(path) / 2 ** 20:.0f} МиБ, запись {written:.1f} с, '
+              f'загрузка {time.perf_counter() - started:.1f} с')
+
+    correct = wrong = missed = uncorrectable = uncorrectable_fixed = 0
+    timings = []
+    for name in rng.sample(names[:NAMES], QUERIES):
+        query = misspell(rng, name, rng.randint(1, _max_distance(len(name))))
+        started = time.perf_counter()
+        corrected = index.correct(query)
+        timings.append(time.perf_counter() - started)
+        if not correctable(query, name):
+            uncorrectable += 1
+            uncorrectable_fixed += corrected == name.lower()
+        elif corrected == name.lower():
+            correct += 1
+        elif corrected is None:
+            missed += 1
+        else:
+            wrong += 1
+    _report(f'\n{QUERIES} запросов с опечатками', timings)
+    correctable_count = QUERIES - uncorrectable
+    print(f'Исправимых: {correctable_count}. Из них исправлено верно: {correct / correctable_count:.1%}, '
+          f'не исправлено: {missed / correctable_count:.1%}, исправлено ошибочно: {wrong / correctable_count:.1%}')
+    print(f'Неисправимых (опечатка меняет число слов, цифры, слово из одной-двух букв или слово сильнее '
+          f'допустимого): {uncorrectable}, исправлено в исходное имя: {uncorrectable_fixed}')
+
+    kept = 0
+    timings = []
+    for name in rng.sample(names[:NAMES], QUERIES):
+        query = name[:rng.randint(len(name) // 2, len(name))]
+        started = time.perf_counter()
+        kept += index.correct(query) is None
+        timings.append(time.perf_counter() - started)
+    _report(f'\n{QUERIES} запросов по началу известного имени', timings)
+    print(f'Оставлены без исправления: {kept / QUERIES:.1%}')
+
+    started = time.perf_counter()
+    for name in names[NAMES:]:
+        index.add([name])
+    elapsed = time.perf_counter() - started
+    found = sum(index.correct(misspell(rng, name, 1)) == name.lower() for name in names[NAMES:NAMES + 100])
+    print(f'\nДобавление {ADDS:,} имён по одному: {elapsed / ADDS * 1e6:.0f} мкс на имя; '
+          f'новые имена исправляются: {found}/100')
+
+    # Продолжения: известно «имя 2», пользователь ищет «имя 3» — другой фильм, а не опечатка
+    sequels = rng.sample(names[:NAMES], 100)
+    index.add(f'{name} 2' for name in sequels)
+    changed = sum(index.correct(f'{name} 3') is not None for name in sequels)
+    print(f'Запросов «имя 3» при известном «имя 2» исправлено: {changed}/100')
+
+
+if __name__ == '__main__':
+    main()
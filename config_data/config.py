@@ -10,15 +10,130 @@ TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
 # API ключ кинопоиска
 KINO_POISK_API_KEY = os.getenv('KINO_POISK_API_KEY')
 
+# Пул API ключей кинопоиска через запятую, у ключа можно указать вес: 'ключ1,ключ2:2'.
+# Вес умножает частоту запросов и суточную квоту ключа. Если пул не задан, используется один KINO_POISK_API_KEY
+KINO_POISK_API_KEYS = [
+    key.strip() for key in (os.getenv('KINO_POISK_API_KEYS') or KINO_POISK_API_KEY or '').split(',') if key.strip()
+]
+
 # Путь и название базы данных
 DATABASE_URL = 'sqlite+aiosqlite:///db/tg_bot_skillbox.sqlite'
 
+# Профиль производительности SQLite: прагмы при каждом подключении и пул соединений.
+# SQLITE_PERFORMANCE_PROFILE=false возвращает настройки SQLite и SQLAlchemy по умолчанию
+SQLITE_PERFORMANCE_PROFILE = os.getenv('SQLITE_PERFORMANCE_PROFILE', 'true').lower() in ('1', 'true', 'yes')
+SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')  # Журнал: читатели не блокируют писателя
+SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')  # В режиме WAL fsync только при checkpoint
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))  # Отображение файла базы в память, байт
+SQLITE_CACHE_SIZE = int(os.getenv('SQLITE_CACHE_SIZE', -64 * 1024))  # Кэш страниц; отрицательное значение — в КиБ
+SQLITE_BUSY_TIMEOUT = int(os.getenv('SQLITE_BUSY_TIMEOUT', 5000))  # Ожидание блокировки записи, мс
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))  # Постоянных соединений в пуле (по умолчанию для create_db_engine)
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 10))  # Дополнительных соединений при пиковой нагрузке
+DB_READ_POOL_SIZE = int(os.getenv('DB_READ_POOL_SIZE', 4))  # Соединений только для чтения
+DB_WRITE_BATCH = int(os.getenv('DB_WRITE_BATCH', 100))  # Сколько изменений фиксировать одной транзакцией
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 30))  # Ожидание свободного соединения, сек
+# Журнал SQL-запросов SQLAlchemy: INFO — запросы, DEBUG — запросы и результаты, иначе выключен
+SQL_LOG_LEVEL = os.getenv('SQL_LOG_LEVEL', 'WARNING').upper()
+
 # URL для запросов к API Кинопоиска
 KINOPOISK_MOVIE_URL = 'https://api.kinopoisk.dev/v1.4/movie/'
 KINOPOISK_PERSON_URL = 'https://api.kinopoisk.dev/v1.4/person/'
 
-# Заголовки для запросов к API Кинопоиска
-headers = {
-    'accept': 'application/json',
-    'X-API-KEY': KINO_POISK_API_KEY
-}
+# Настройки общего HTTP-клиента для API Кинопоиска
+KINOPOISK_POOL_LIMIT = int(os.getenv('KINOPOISK_POOL_LIMIT', 100))  # Всего соединений в пуле
+KINOPOISK_POOL_LIMIT_PER_HOST = int(os.getenv('KINOPOISK_POOL_LIMIT_PER_HOST', 20))  # Соединений на один хост
+KINOPOISK_DNS_CACHE_TTL = int(os.getenv('KINOPOISK_DNS_CACHE_TTL', 300))  # Время жизни DNS-кэша, сек
+KINOPOISK_KEEPALIVE_TIMEOUT = float(os.getenv('KINOPOISK_KEEPALIVE_TIMEOUT', 60))  # Простой keep-alive, сек
+KINOPOISK_CONNECT_TIMEOUT = float(os.getenv('KINOPOISK_CONNECT_TIMEOUT', 5))  # Таймаут соединения, сек
+KINOPOISK_READ_TIMEOUT = float(os.getenv('KINOPOISK_READ_TIMEOUT', 10))  # Таймаут чтения ответа, сек
+KINOPOISK_TOTAL_TIMEOUT = float(os.getenv('KINOPOISK_TOTAL_TIMEOUT', 15))  # Общий таймаут запроса, сек
+
+# Кэш ответов API Кинопоиска в памяти процесса
+KINOPOISK_CACHE_MAX_BYTES = int(os.getenv('KINOPOISK_CACHE_MAX_BYTES', 32 * 1024 * 1024))  # Предел памяти кэша
+KINOPOISK_MOVIE_SEARCH_TTL = int(os.getenv('KINOPOISK_MOVIE_SEARCH_TTL', 6 * 60 * 60))  # Поиск фильмов, сек
+KINOPOISK_PERSON_SEARCH_TTL = int(os.getenv('KINOPOISK_PERSON_SEARCH_TTL', 6 * 60 * 60))  # Поиск персон, сек
+KINOPOISK_PERSON_TTL = int(os.getenv('KINOPOISK_PERSON_TTL', 24 * 60 * 60))  # Информация о персоне, сек
+
+# Постоянный кэш ответов API Кинопоиска в базе данных
+KINOPOISK_CACHE_STALE_TTL = int(os.getenv('KINOPOISK_CACHE_STALE_TTL', 7 * 24 * 60 * 60))  # Сколько отдавать устаревшее, сек
+KINOPOISK_CACHE_COMPACT_INTERVAL = int(os.getenv('KINOPOISK_CACHE_COMPACT_INTERVAL', 60 * 60))  # Период очистки, сек
+
+# Локальный полнотекстовый индекс фильмов (SQLite FTS5) из всех документов, полученных от API.
+# Поиск отвечает из индекса, если в нём не меньше уверенных совпадений, чем запрошено
+MOVIE_INDEX_ENABLED = os.getenv('MOVIE_INDEX_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+MOVIE_INDEX_CANDIDATES = int(os.getenv('MOVIE_INDEX_CANDIDATES', 200))  # Сколько совпадений FTS5 проверять
+
+# Исправление опечаток в названиях фильмов и именах персон по именам, которые уже известны боту
+NAME_CORRECTION_ENABLED = os.getenv('NAME_CORRECTION_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+# Снимок индексов имён: с несколькими воркерами индексы строит главный процесс, а воркеры загружают снимок
+NAME_INDEX_SNAPSHOT = os.getenv('NAME_INDEX_SNAPSHOT', 'db/name_indexes.pickle')
+
+# Ограничения API Кинопоиска для одного ключа с весом 1: частота запросов и суточная квота
+KINOPOISK_RATE_LIMIT = float(os.getenv('KINOPOISK_RATE_LIMIT', 5))  # Запросов в секунду
+KINOPOISK_RATE_BURST = float(os.getenv('KINOPOISK_RATE_BURST', 5))  # Допустимый всплеск запросов
+KINOPOISK_DAILY_QUOTA = int(os.getenv('KINOPOISK_DAILY_QUOTA', 200))  # Запросов в сутки
+KINOPOISK_QUOTA_RESERVE = int(os.getenv('KINOPOISK_QUOTA_RESERVE', 20))  # Остаток квоты только для детальных запросов
+KINOPOISK_KEY_COOLDOWN = float(os.getenv('KINOPOISK_KEY_COOLDOWN', 60))  # Пауза ключа после 429 без Retry-After, сек
+
+# Устойчивость запросов к API Кинопоиска: дедлайн, повторы и автоматический выключатель
+KINOPOISK_DEADLINE = float(os.getenv('KINOPOISK_DEADLINE', 20))  # Дедлайн вызова с учётом повторов, сек
+KINOPOISK_MAX_RETRIES = int(os.getenv('KINOPOISK_MAX_RETRIES', 2))  # Повторов после ошибки 5xx/сети/429
+KINOPOISK_BACKOFF_BASE = float(os.getenv('KINOPOISK_BACKOFF_BASE', 0.5))  # Базовая задержка повтора, сек
+KINOPOISK_BACKOFF_CAP = float(os.getenv('KINOPOISK_BACKOFF_CAP', 8))  # Максимальная задержка повтора, сек
+KINOPOISK_BREAKER_THRESHOLD = int(os.getenv('KINOPOISK_BREAKER_THRESHOLD', 5))  # Ошибок подряд до размыкания
+KINOPOISK_BREAKER_RECOVERY = float(os.getenv('KINOPOISK_BREAKER_RECOVERY', 30))  # Пауза до пробного запроса, сек
+
+# Кэш соответствия Telegram ID пользователя и users.id
+USER_ID_CACHE_SIZE = int(os.getenv('USER_ID_CACHE_SIZE', 10000))  # Сколько пользователей держать в памяти
+USER_ID_CACHE_TTL = int(os.getenv('USER_ID_CACHE_TTL', 60 * 60))  # Время жизни записи, сек
+# Сколько фильмов можно добавить в избранное
+FAVOURITES_LIMIT = int(os.getenv('FAVOURITES_LIMIT', 1000))
+# Сколько избранных фильмов показывать на одной странице
+FAVOURITES_PAGE_SIZE = int(os.getenv('FAVOURITES_PAGE_SIZE', 10))
+# Через сколько обновлять карточку фильма в каталоге movies при добавлении в избранное, сек
+MOVIE_CATALOG_TTL = int(os.getenv('MOVIE_CATALOG_TTL', 24 * 60 * 60))
+
+# Отложенная запись профилей пользователей (/start)
+USER_FLUSH_INTERVAL = float(os.getenv('USER_FLUSH_INTERVAL', 1))  # Сколько копить обновления перед записью, сек
+USER_FLUSH_BATCH = int(os.getenv('USER_FLUSH_BATCH', 500))  # Профилей в одном запросе
+
+# Хранилище состояний FSM: 'sqlite' (в базе бота, переживает перезапуск) или 'memory'
+FSM_STORAGE = os.getenv('FSM_STORAGE', 'sqlite')
+FSM_FLUSH_INTERVAL = float(os.getenv('FSM_FLUSH_INTERVAL', 0.5))  # Период пакетной записи изменений, сек
+FSM_CACHE_SIZE = int(os.getenv('FSM_CACHE_SIZE', 10000))  # Сколько состояний держать в памяти
+FSM_STATE_TTL = int(os.getenv('FSM_STATE_TTL', 7 * 24 * 60 * 60))  # Через сколько удалять неактивные состояния, сек
+FSM_SWEEP_INTERVAL = int(os.getenv('FSM_SWEEP_INTERVAL', 60 * 60))  # Период удаления устаревших состояний, сек
+
+# Ограничения Bot API на исходящие сообщения
+TELEGRAM_GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', 30))  # Сообщений в секунду на всего бота
+TELEGRAM_CHAT_RATE = float(os.getenv('TELEGRAM_CHAT_RATE', 1))  # Сообщений в секунду в один чат
+TELEGRAM_CHAT_BURST = float(os.getenv('TELEGRAM_CHAT_BURST', 3))  # Сообщений в чат подряд без паузы
+TELEGRAM_SEND_RETRIES = int(os.getenv('TELEGRAM_SEND_RETRIES', 3))  # Повторов сообщения после 429
+
+# Как отправлять результаты поиска: 'album' — альбомами до 10 постеров и одной клавиатурой с номерами,
+# 'cards' — отдельной карточкой с кнопкой на каждый результат
+SEARCH_RESULTS_MODE = os.getenv('SEARCH_RESULTS_MODE', 'album')
+
+TELEGRAM_FILE_ID_CACHE_SIZE = int(os.getenv('TELEGRAM_FILE_ID_CACHE_SIZE', 50000))  # file_id постеров в памяти
+
+# Способ получения обновлений: 'polling' или 'webhook'
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+# Удалять ли обновления, накопившиеся в Telegram, пока бот был остановлен
+DROP_PENDING_UPDATES = os.getenv('DROP_PENDING_UPDATES', 'false').lower() in ('1', 'true', 'yes')
+
+# Режим вебхука: публичный адрес бота (например, https://bot.example.com) и параметры HTTP-сервера
+WEBHOOK_BASE_URL = os.getenv('WEBHOOK_BASE_URL', '')
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/webhook')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET')  # Если не задан, выводится из токена бота
+WEBHOOK_HOST = os.getenv('WEBHOOK_HOST', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', 8080))
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv('WEBHOOK_MAX_CONNECTIONS', 40))  # Соединений от Telegram одновременно
+WEBHOOK_MAX_CONCURRENT_UPDATES = int(os.getenv('WEBHOOK_MAX_CONCURRENT_UPDATES', 64))  # Обновлений в обработке
+
+# Число процессов-воркеров. При WORKERS > 1 главный процесс только принимает обновления и
+# распределяет их по воркерам по chat_id; 0 или 1 — всё в одном процессе
+WORKERS = int(os.getenv('WORKERS', 0))
+# Номер шарда и число шардов задаются главным процессом для воркеров. Лимиты, общие для всего бота
+# (частота и квота API Кинопоиска, общая частота сообщений Telegram), делятся между воркерами
+SHARD_INDEX = int(os.getenv('SHARD_INDEX', 0))
+SHARD_COUNT = int(os.getenv('SHARD_COUNT', 1))
@@ -1,12 +1,93 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
-from config_data.config import DATABASE_URL
+from config_data import config
 
 Base = declarative_base()
 
-# Создание асинхронного движка
-engine = create_async_engine(DATABASE_URL, echo=True)
+# Уровень журнала SQL-запросов -> значение echo для SQLAlchemy
+SQL_ECHO = {'DEBUG': 'debug', 'INFO': True}.get(config.SQL_LOG_LEVEL, False)
+
+
+def _apply_pragmas(dbapi_connection, connection_record) -> None:
+    """Настраивает каждое новое соединение SQLite по профилю производительности."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f'PRAGMA journal_mode={config.SQLITE_JOURNAL_MODE}')
+    cursor.execute(f'PRAGMA synchronous={config.SQLITE_SYNCHRONOUS}')
+    cursor.execute(f'PRAGMA mmap_size={config.SQLITE_MMAP_SIZE}')
+    cursor.execute(f'PRAGMA cache_size={config.SQLITE_CACHE_SIZE}')
+    cursor.execute(f'PRAGMA busy_timeout={config.SQLITE_BUSY_TIMEOUT}')
+    cursor.execute('PRAGMA temp_store=MEMORY')
+    cursor.close()
+
+
+def _disable_driver_transactions(dbapi_connection, connection_record) -> None:
+    # Драйвер sqlite3 сам начинает транзакцию только перед изменением данных, из-за чего не работают
+    # точки сохранения; транзакции начинает SQLAlchemy (см. _begin_immediate)
+    dbapi_connection.isolation_level = None
+
+
+def _begin_immediate(connection) -> None:
+    # Блокировка записи берётся в начале транзакции: транзакция не может упасть с «database is locked»
+    # посередине, когда между процессами нужно повысить блокировку чтения до записи
+    connection.exec_driver_sql('BEGIN IMMEDIATE')
+
+
+def _apply_read_only(dbapi_connection, connection_record) -> None:
+    """Запрещает изменения через соединение для чтения."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA query_only=ON')
+    cursor.close()
+
+
+def create_db_engine(url: str = config.DATABASE_URL,
+                     performance_profile: bool = config.SQLITE_PERFORMANCE_PROFILE,
+                     pool_size: int = config.DB_POOL_SIZE, max_overflow: int = config.DB_MAX_OVERFLOW,
+                     read_only: bool = False) -> AsyncEngine:
+    """
+    Создаёт асинхронный движок SQLite.
+
+    С профилем производительности соединения берутся из пула, а не открываются на каждую сессию,
+    и при подключении настраиваются прагмами (WAL, synchronous, mmap, кэш страниц, ожидание блокировки).
+
+    :param url: URL базы данных.
+    :param performance_profile: Применять ли профиль производительности.
+    :param pool_size: Постоянных соединений в пуле.
+    :param max_overflow: Дополнительных соединений при нагрузке.
+    :param read_only: Соединения только для чтения (PRAGMA query_only); иначе соединения для записи,
+        транзакции которых начинаются с BEGIN IMMEDIATE.
+    :return: Движок SQLAlchemy.
+    """
+    if not performance_profile:
+        return create_async_engine(url, echo=SQL_ECHO)
+
+    engine = create_async_engine(
+        url,
+        echo=SQL_ECHO,
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=config.DB_POOL_TIMEOUT,
+        connect_args={'timeout': config.SQLITE_BUSY_TIMEOUT / 1000},
+    )
+    event.listen(engine.sync_engine, 'connect', _apply_pragmas)
+    if read_only:
+        event.listen(engine.sync_engine, 'connect', _apply_read_only)
+    else:
+        event.listen(engine.sync_engine, 'connect', _disable_driver_transactions)
+        event.listen(engine.sync_engine, 'begin', _begin_immediate)
+    return engine
+
+
+# Движок для записи: одно соединение, поэтому изменения из этого процесса идут строго по очереди
+# и не соперничают за блокировку записи SQLite
+engine = create_db_engine(pool_size=1, max_overflow=0)
+
+# Движок для чтения: небольшой пул соединений только для чтения. В режиме WAL чтение не ждёт запись
+# и видит все изменения, зафиксированные до начала своей транзакции
+read_engine = create_db_engine(pool_size=config.DB_READ_POOL_SIZE, max_overflow=0, read_only=True)
 
 # Настройка асинхронной сессии
 AsyncSessionLocal = async_sessionmaker(
@@ -17,8 +98,42 @@ AsyncSessionLocal = async_sessionmaker(
     expire_on_commit=False
 )
 
+# Сессии только для чтения
+ReadSessionLocal = async_sessionmaker(
+    bind=read_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    autocommit=False,
+    expire_on_commit=False
+)
+
+
+def _create_schema(connection) -> None:
+    # Миграции используют модели, которые импортируют Base из этого модуля
+    from db.migrations import migrate_favourites_to_catalog
+
+    Base.metadata.create_all(connection)
+    migrate_favourites_to_catalog(connection)
+    # create_all не добавляет новые индексы в уже существующие таблицы
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+
+# Инициализация базы данных (для создания таблиц и индексов)
+async def init_db(db_engine: AsyncEngine = engine):
+    async with db_engine.begin() as conn:
+        await conn.run_sync(_create_schema)
+
 
-# Инициализация базы данных (для создания таблиц)
-async def init_db():
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+# Закрытие базы данных: обновление статистики планировщика запросов и закрытие соединений
+async def close_db(db_engine: AsyncEngine = engine):
+    try:
+        # В транзакции: соединение открывает её через BEGIN IMMEDIATE, и без фиксации статистика откатилась бы
+        async with db_engine.begin() as conn:
+            await conn.execute(text('PRAGMA optimize'))
+    except Exception as e:
+        print(f'Error in close_db: {e}')
+    await db_engine.dispose()
+    if db_engine is engine:
+        await read_engine.dispose()
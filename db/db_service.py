@@ -1,148 +1,276 @@
-from typing import List, Optional, Tuple
+import enum
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
 
-from sqlalchemy import exc, func, delete
+from sqlalchemy import Row, delete, exc, exists, func, insert, literal, tuple_, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
-from db import AsyncSessionLocal
-from db.models import Users, FavoritesMovie
+from config_data import config
+from db.models import Users, FavoritesMovie, Movie, Genre, Country, MovieGenre, MovieCountry
+from db.user_cache import user_id_cache
+from db.user_writer import UserWriteBehind
+from db.writer import db_writer
 
 
-# Получение пользователя по его Telegram ID
-async def get_user_by_telegram_id(user_telegram_id: int) -> Optional[Users]:
-    async with AsyncSessionLocal() as session:
-        try:
-            stmt = select(Users).filter(Users.telegram_id == user_telegram_id)
-            user = await session.scalar(stmt)
-            return user
-        except Exception as e:
-            print(f'Error in get_user_by_telegram_id: {e}')
-            return None
+# Чтение идёт через переданную сессию (соединение только для чтения), изменения — через единственного
+# писателя db_writer. Каждое чтение — отдельная короткая транзакция, чтобы соединение возвращалось
+# в пул сразу, а не держалось до конца обработки обновления
 
 
-# Добавление или обновление пользователя
-async def add_or_update_user(user_telegram_id: int, user_username: str, user_first_name: str,
-                             user_last_name: str) -> None:
-    async with AsyncSessionLocal() as session:
-        try:
-            # Получаем пользователя
-            user = await get_user_by_telegram_id(user_telegram_id)
-            if user:
-                # Обновление данных пользователя
-                user.username = user_username
-                user.first_name = user_first_name
-                user.last_name = user_last_name
-                session.add(user)  # Возможно, нужно добавить объект для отслеживания изменений
-            else:
-                # Создание нового пользователя
-                new_user = Users(
-                    telegram_id=user_telegram_id,
-                    username=user_username,
-                    first_name=user_first_name,
-                    last_name=user_last_name,
-                )
-                session.add(new_user)
-
-            await session.commit()
-
-        except exc.IntegrityError as e:
-            await session.rollback()
-            print(f'IntegrityError in add_or_update_user: {e}')
-        except Exception as e:
-            await session.rollback()
-            print(f'Error in add_or_update_user: {e}')
-
-
-# Проверка текущего количества избранных фильмов
-async def check_current_favorites_count(user_telegram_id: int) -> Tuple[int, Optional[int]]:
-    async with AsyncSessionLocal() as session:
-        try:
-            user = await get_user_by_telegram_id(user_telegram_id)
-            if user:
-                count_query = await session.execute(
-                    select(func.count(FavoritesMovie.id)).filter(FavoritesMovie.user_id == user.id)
-                )
-                current_favorites_count = count_query.scalar()
-                return current_favorites_count, user.id
-            return 0, None
-        except Exception as e:
-            print(f'Error in check_current_favorites_count: {e}')
-            return 0, None
-
-
-# Добавление фильма в избранное
-async def add_movie_to_favourites_in_db(user_id: int, movie_id: int, movie_name: str, release_year: int,
-                                        genres: List[str], country: str) -> bool:
-    async with AsyncSessionLocal() as session:
-        try:
-            new_favorite_movie = FavoritesMovie(
-                user_id=user_id,
-                movie_id=movie_id,
-                movie_name=movie_name,
-                release_year=release_year,
-                genres=genres,
-                country=country
-            )
-
-            session.add(new_favorite_movie)
-            await session.commit()
-            return True
-
-        except exc.IntegrityError:
-            await session.rollback()
-            print(f'IntegrityError in add_movie_to_favourites_in_db for movie: {movie_name}')
-            return False
-        except Exception as e:
-            await session.rollback()
-            print(f'Error in add_movie_to_favourites_in_db: {e}')
-            return False
-
-
-# Получение избранных фильмов
-async def get_favourites(user_telegram_id: int) -> Optional[List[FavoritesMovie]]:
-    async with AsyncSessionLocal() as session:
-        try:
-            user = await get_user_by_telegram_id(user_telegram_id)
-            if user:
-                favorites_stmt = select(FavoritesMovie).where(FavoritesMovie.user_id == user.id)
-                favorites = await session.execute(favorites_stmt)
-                return favorites.scalars().all()
-            return None
-        except Exception as e:
-            print(f'Error in get_favourites: {e}')
+# Получение users.id по Telegram ID: сначала из кэша, затем из базы
+async def get_user_id(session: AsyncSession, user_telegram_id: int) -> Optional[int]:
+    user_id = user_id_cache.get(user_telegram_id)
+    if user_id is not None:
+        return user_id
+    if user_writer.is_pending(user_telegram_id):
+        # Пользователь только что отправил /start: записываем очередь, запись заполнит кэш
+        await user_writer.flush()
+        user_id = user_id_cache.get(user_telegram_id)
+        if user_id is not None:
+            return user_id
+    try:
+        async with session.begin():
+            user_id = await session.scalar(select(Users.id).filter(Users.telegram_id == user_telegram_id))
+        if user_id is not None:
+            user_id_cache.set(user_telegram_id, user_id)
+        return user_id
+    except Exception as e:
+        print(f'Error in get_user_id: {e}')
+        return None
+
+
+# Добавление или обновление пачки пользователей одним запросом (выполняется писателем).
+# Возвращает users.id по Telegram ID; кэш заполняется после фиксации транзакции
+async def upsert_users(session: AsyncSession, users: List[dict]) -> Dict[int, int]:
+    stmt = sqlite_insert(Users).values(users)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Users.telegram_id],
+        set_={
+            'username': stmt.excluded.username,
+            'first_name': stmt.excluded.first_name,
+            'last_name': stmt.excluded.last_name,
+            'update_at': stmt.excluded.update_at,
+        },
+    ).returning(Users.telegram_id, Users.id)
+    result = await session.execute(stmt)
+    return dict(result.all())
+
+
+class AddFavouriteResult(enum.Enum):
+    """Результат добавления фильма в избранное."""
+    ADDED = 'added'
+    DUPLICATE = 'duplicate'
+    LIMIT_REACHED = 'limit_reached'
+    ERROR = 'error'
+
+
+# ID названий в справочнике (жанры или страны); недостающие названия добавляются. Запись идёт в транзакции
+# писателя, которая начинается с BEGIN IMMEDIATE, поэтому между чтением и вставкой никто не добавит то же название
+async def _intern(session: AsyncSession, lookup: type[Genre] | type[Country], names: List[str]) -> Dict[str, int]:
+    ids = dict((await session.execute(select(lookup.name, lookup.id).where(lookup.name.in_(names)))).all())
+    missing = [name for name in names if name not in ids]
+    if missing:
+        result = await session.execute(
+            insert(lookup).values([{'name': name} for name in missing]).returning(lookup.name, lookup.id)
+        )
+        ids.update(result.all())
+    return ids
+
+
+# Замена жанров или стран фильма: связи хранят ID из справочника и порядок в карточке
+async def _replace_links(session: AsyncSession, link: type[MovieGenre] | type[MovieCountry],
+                         lookup: type[Genre] | type[Country], column: str, movie_id: int, names: List[str],
+                         new_movie: bool) -> None:
+    if not new_movie:
+        await session.execute(delete(link).where(link.movie_id == movie_id))
+    names = list(dict.fromkeys(names))
+    if names:
+        ids = await _intern(session, lookup, names)
+        await session.execute(insert(link).values([
+            {'movie_id': movie_id, 'position': position, column: ids[name]} for position, name in enumerate(names)
+        ]))
+
+
+# Добавление или обновление фильма в общем каталоге (выполняется писателем). Свежая карточка
+# (моложе ttl) не перезаписывается, устаревшая обновляется вместе с жанрами и странами
+async def upsert_movie(session: AsyncSession, movie_id: int, name: str, release_year: Optional[int],
+                       genres: List[str], countries: List[str], ttl: float = config.MOVIE_CATALOG_TTL) -> None:
+    now = time.time()
+    updated_at = await session.scalar(select(Movie.updated_at).where(Movie.id == movie_id))
+    if updated_at is not None and now - updated_at < ttl:
+        return
+    values = {'name': name, 'release_year': release_year, 'updated_at': now}
+    if updated_at is None:
+        await session.execute(insert(Movie).values(id=movie_id, **values))
+    else:
+        await session.execute(update(Movie).where(Movie.id == movie_id).values(**values))
+    await _replace_links(session, MovieGenre, Genre, 'genre_id', movie_id, genres, updated_at is None)
+    await _replace_links(session, MovieCountry, Country, 'country_id', movie_id, countries, updated_at is None)
+
+
+# Добавление фильма в избранное одним условным INSERT ... SELECT: строка вставляется, только если
+# у пользователя меньше limit фильмов и этого фильма ещё нет в избранном. Проверка и вставка идут
+# одним запросом в транзакции писателя, поэтому параллельные нажатия не превышают лимит; повтор из
+# другого процесса отсекает уникальный индекс (user_id, movie_id). Если фильм не добавлен, причина
+# уточняется в той же транзакции. Запрос без ON CONFLICT, чтобы SQLAlchemy кэшировал его компиляцию
+async def _insert_favourite(session: AsyncSession, user_id: int, movie_id: int, limit: int) -> AddFavouriteResult:
+    favourites_count = (
+        select(func.count(FavoritesMovie.id)).where(FavoritesMovie.user_id == user_id).scalar_subquery()
+    )
+    already_added = exists().where(FavoritesMovie.user_id == user_id, FavoritesMovie.movie_id == movie_id)
+    source = select(literal(user_id), literal(movie_id)).where(favourites_count < limit, ~already_added)
+    stmt = (
+        insert(FavoritesMovie.__table__)
+        .from_select(['user_id', 'movie_id'], source)
+        .returning(FavoritesMovie.id)
+    )
+    if (await session.execute(stmt)).first() is not None:
+        return AddFavouriteResult.ADDED
+
+    duplicate = await session.scalar(select(already_added))
+    return AddFavouriteResult.DUPLICATE if duplicate else AddFavouriteResult.LIMIT_REACHED
+
+
+async def _add_favourite(session: AsyncSession, user_id: int, movie_id: int, movie_name: str,
+                         release_year: Optional[int], genres: List[str], countries: List[str],
+                         limit: int) -> AddFavouriteResult:
+    await upsert_movie(session, movie_id, movie_name, release_year, genres, countries)
+    return await _insert_favourite(session, user_id, movie_id, limit)
+
+
+# Добавление фильма в избранное: карточка фильма попадает в общий каталог, в избранное — только ссылка на неё
+async def add_movie_to_favourites_in_db(user_id: int, movie_id: int, movie_name: str, release_year: Optional[int],
+                                        genres: List[str], countries: List[str],
+                                        limit: int = config.FAVOURITES_LIMIT) -> AddFavouriteResult:
+    try:
+        return await db_writer.submit(lambda session: _add_favourite(
+            session, user_id, movie_id, movie_name, release_year, genres, countries, limit
+        ))
+    except exc.IntegrityError:
+        # Тот же фильм одновременно добавлен из другого процесса
+        return AddFavouriteResult.DUPLICATE
+    except Exception as e:
+        print(f'Error in add_movie_to_favourites_in_db: {e}')
+        return AddFavouriteResult.ERROR
+
+
+def _joined_names(link: type[MovieGenre] | type[MovieCountry], lookup: type[Genre] | type[Country],
+                  column: str):
+    """Названия жанров или стран фильма из каталога одной строкой через запятую, в порядке карточки."""
+    names = (
+        select(lookup.name)
+        .select_from(link)
+        .join(lookup, lookup.id == getattr(link, column))
+        .where(link.movie_id == Movie.id)
+        .order_by(link.position)
+        .correlate(Movie)
+        .subquery()
+    )
+    return select(func.group_concat(names.c.name, ', ')).scalar_subquery()
+
+
+@dataclass(slots=True, frozen=True)
+class FavouritesPage:
+    """
+    Страница избранного: фильмы в порядке добавления и есть ли ещё фильмы дальше в направлении запроса.
+
+    Строка фильма: id и create_at записи избранного, movie_name, release_year, genres и country из каталога.
+    """
+    movies: List[Row]
+    has_more: bool
+
+
+# Строки избранного пользователя для страницы: запись избранного и карточка фильма из каталога
+def _favourites_select(user_id: int):
+    return (
+        select(
+            FavoritesMovie.id, FavoritesMovie.create_at,
+            Movie.name.label('movie_name'), Movie.release_year,
+            _joined_names(MovieGenre, Genre, 'genre_id').label('genres'),
+            _joined_names(MovieCountry, Country, 'country_id').label('country'),
+        )
+        .join(Movie, Movie.id == FavoritesMovie.movie_id)
+        .where(FavoritesMovie.user_id == user_id)
+    )
+
+
+# Получение страницы избранного по курсору (create_at, id) — последней показанной строке при движении
+# вперёд или первой при движении назад. Каждая страница читается отдельным запросом по индексу
+# (user_id, create_at) без OFFSET и без загрузки всего списка; лишняя строка показывает, есть ли продолжение.
+# Название, год, жанры и страны берутся из каталога movies
+async def get_favourites_page(session: AsyncSession, user_telegram_id: int,
+                              cursor: Optional[Tuple[str, int]] = None, backward: bool = False,
+                              page_size: int = config.FAVOURITES_PAGE_SIZE) -> Optional[FavouritesPage]:
+    try:
+        user_id = await get_user_id(session, user_telegram_id)
+        if not user_id:
             return None
+        stmt = _favourites_select(user_id)
+        position = tuple_(FavoritesMovie.create_at, FavoritesMovie.id)
+        if backward:
+            if cursor is not None:
+                stmt = stmt.where(position < tuple_(*cursor))
+            stmt = stmt.order_by(FavoritesMovie.create_at.desc(), FavoritesMovie.id.desc())
+        else:
+            if cursor is not None:
+                stmt = stmt.where(position > tuple_(*cursor))
+            stmt = stmt.order_by(FavoritesMovie.create_at, FavoritesMovie.id)
+        async with session.begin():
+            movies = list((await session.execute(stmt.limit(page_size + 1))).all())
+        has_more = len(movies) > page_size
+        movies = movies[:page_size]
+        if backward:
+            movies.reverse()
+        return FavouritesPage(movies, has_more)
+    except Exception as e:
+        print(f'Error in get_favourites_page: {e}')
+        return None
 
 
-# Удаление фильмов из избранного
-async def delete_movies(favourites: List[FavoritesMovie], movie_numbers: List[int]) -> List[str]:
-    async with AsyncSessionLocal() as session:
-        try:
-            deleted_movies = []
-            for movie_number in movie_numbers:
-                movie_to_delete = favourites[movie_number - 1]
-                await session.delete(movie_to_delete)
-                deleted_movies.append(movie_to_delete.movie_name)
-
-            await session.commit()
-            return deleted_movies
-        except Exception as e:
-            await session.rollback()
-            print(f'Error in delete_movies: {e}')
+# Удаление записей избранного одним запросом DELETE ... RETURNING (выполняется писателем). Условие по user_id
+# не даёт удалить чужие записи; уже удалённые записи просто не попадают в результат. Название фильма
+# возвращается подзапросом к каталогу
+async def _delete_by_ids(session: AsyncSession, user_id: int, favourite_ids: List[int]) -> Dict[int, str]:
+    stmt = (
+        delete(FavoritesMovie)
+        .where(FavoritesMovie.user_id == user_id, FavoritesMovie.id.in_(favourite_ids))
+        .returning(FavoritesMovie.id,
+                   select(Movie.name).where(Movie.id == FavoritesMovie.movie_id).scalar_subquery())
+    )
+    result = await session.execute(stmt)
+    return dict(result.all())
+
+
+# Удаление фильмов из избранного по ID записей. Возвращает названия удалённых фильмов в порядке ID
+async def delete_movies(session: AsyncSession, user_telegram_id: int, favourite_ids: List[int]) -> List[str]:
+    try:
+        user_id = await get_user_id(session, user_telegram_id)
+        if not user_id or not favourite_ids:
             return []
+        deleted = await db_writer.submit(lambda write_session: _delete_by_ids(write_session, user_id, favourite_ids))
+        return [deleted[favourite_id] for favourite_id in favourite_ids if favourite_id in deleted]
+    except Exception as e:
+        print(f'Error in delete_movies: {e}')
+        return []
+
+
+async def clear_all_favourites(session: AsyncSession, user_telegram_id: int) -> None:
+    try:
+        user_id = await get_user_id(session, user_telegram_id)
+        if user_id:
+            # Удаляем все фильмы из избранного пользователя
+            await db_writer.submit(lambda write_session: write_session.execute(
+                delete(FavoritesMovie).where(FavoritesMovie.user_id == user_id)
+            ))
+            print(f'Все избранные фильмы для пользователя {user_telegram_id} были успешно удалены.')
+        else:
+            print(f'Пользователь с Telegram ID {user_telegram_id} не найден.')
+    except Exception as e:
+        print(f'Error in clear_favourites: {e}')
 
 
-async def clear_all_favourites(user_telegram_id: int) -> None:
-    async with AsyncSessionLocal() as session:
-        try:
-            user = await get_user_by_telegram_id(user_telegram_id)
-            if user:
-                # Удаляем все фильмы из избранного пользователя
-                await session.execute(
-                    delete(FavoritesMovie).where(FavoritesMovie.user_id == user.id)
-                )
-                await session.commit()
-                print(f'Все избранные фильмы для пользователя {user_telegram_id} были успешно удалены.')
-            else:
-                print(f'Пользователь с Telegram ID {user_telegram_id} не найден.')
-        except Exception as e:
-            await session.rollback()
-            print(f'Error in clear_favourites: {e}')
+# Очередь отложенной записи профилей пользователей
+user_writer = UserWriteBehind(upsert_users)
@@ -0,0 +1,285 @@
+import asyncio
+import json
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from config_data import config
+from db import ReadSessionLocal
+from db.models import FsmRecord
+from db.writer import DbWriter, db_writer
+from utils import metrics
+
+# Данные длиннее этого порога сжимаются zlib
+COMPRESS_THRESHOLD = 512
+
+
+def encode_data(data: Dict[str, Any]) -> bytes:
+    """
+    Сериализует данные состояния в компактный вид: JSON без пробелов, длинные данные сжимаются.
+
+    :param data: Данные состояния.
+    :return: Пустая строка для пустых данных, иначе маркер формата (b'j' или b'z') и содержимое.
+    """
+    if not data:
+        return b''
+    raw = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode()
+    if len(raw) > COMPRESS_THRESHOLD:
+        return b'z' + zlib.compress(raw)
+    return b'j' + raw
+
+
+def decode_data(blob: bytes | None) -> Dict[str, Any]:
+    """
+    Восстанавливает данные состояния, сохранённые encode_data.
+
+    :param blob: Сериализованные данные.
+    """
+    if not blob:
+        return {}
+    body = blob[1:]
+    if blob[:1] == b'z':
+        body = zlib.decompress(body)
+    return json.loads(body)
+
+
+class _Record:
+    """Состояние одного ключа в памяти хранилища."""
+    __slots__ = ('state', 'data', 'updated_at')
+
+    def __init__(self, state: Optional[str] = None, data: Dict[str, Any] | None = None, updated_at: float = 0.0):
+        self.state = state
+        self.data = data or {}
+        self.updated_at = updated_at
+
+
+class SQLiteStorage(BaseStorage):
+    """
+    Хранилище состояний FSM в базе бота, переживающее перезапуск.
+
+    Чтение и запись идут через память: изменения копятся в наборе «грязных» ключей,
+    и фоновая задача раз в flush_interval сериализует и записывает их одной транзакцией,
+    так что несколько изменений состояния одного пользователя между записями дают одну строку.
+    Неактивные дольше state_ttl состояния периодически удаляются.
+    """
+
+    def __init__(
+            self,
+            writer: DbWriter = db_writer,
+            read_session_factory: async_sessionmaker = ReadSessionLocal,
+            flush_interval: float = config.FSM_FLUSH_INTERVAL,
+            cache_size: int = config.FSM_CACHE_SIZE,
+            state_ttl: float = config.FSM_STATE_TTL,
+            sweep_interval: float = config.FSM_SWEEP_INTERVAL,
+            key_builder: KeyBuilder | None = None,
+    ):
+        """
+        :param writer: Писатель базы, через которого идут запись и удаление состояний.
+        :param read_session_factory: Фабрика сессий для чтения.
+        :param flush_interval: Период записи накопленных изменений в секундах.
+        :param cache_size: Сколько состояний держать в памяти (несохранённые не вытесняются).
+        :param state_ttl: Через сколько секунд без изменений состояние удаляется.
+        :param sweep_interval: Период удаления устаревших состояний в секундах.
+        :param key_builder: Построитель ключей; по умолчанию учитывает бота и destiny.
+        """
+        self.writer = writer
+        self.read_session_factory = read_session_factory
+        self.flush_interval = flush_interval
+        self.cache_size = cache_size
+        self.state_ttl = state_ttl
+        self.sweep_interval = sweep_interval
+        self.key_builder = key_builder or DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+        # Записи хранятся по StorageKey; строковый ключ базы строится только при чтении и записи на диск
+        self._records: OrderedDict[StorageKey, _Record] = OrderedDict()
+        self._dirty: set[StorageKey] = set()
+        # Ключи, сохранённые в базе; для остальных чтение с диска не нужно. None — ещё не загружены
+        self._known: set[str] | None = None
+        self._writer: asyncio.Task | None = None
+        self._flush_lock = asyncio.Lock()
+
+    async def start(self) -> None:
+        """Загружает список сохранённых ключей, чтобы не обращаться к базе за состояниями новых пользователей."""
+        async with self.read_session_factory() as session:
+            try:
+                result = await session.execute(select(FsmRecord.key))
+                self._known = set(result.scalars())
+            except Exception as e:
+                print(f'Error in SQLiteStorage.start: {e}')
+
+    def _ensure_writer(self) -> None:
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.ensure_future(self._run_writer())
+
+    async def _run_writer(self) -> None:
+        """Фоновая запись изменений и периодическое удаление устаревших состояний."""
+        last_sweep = time.monotonic()
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+            if time.monotonic() - last_sweep >= self.sweep_interval:
+                last_sweep = time.monotonic()
+                removed = await self.sweep()
+                if removed:
+                    print(f'Хранилище FSM: удалено устаревших состояний: {removed}')
+
+    async def _record(self, key: StorageKey) -> _Record:
+        """
+        Возвращает запись ключа из памяти, при необходимости загружая её из базы.
+
+        :param key: Ключ хранилища aiogram.
+        """
+        record = self._records.get(key)
+        if record is not None:
+            self._records.move_to_end(key)
+            return record
+
+        row = None
+        storage_key = self.key_builder.build(key)
+        if self._known is None or storage_key in self._known:
+            metrics.inc('fsm_storage.loads')
+            async with self.read_session_factory() as session:
+                try:
+                    row = await session.get(FsmRecord, storage_key)
+                except Exception as e:
+                    print(f'Error in SQLiteStorage._record: {e}')
+
+        # Пока шло чтение, запись могла появиться в памяти — она новее базы
+        record = self._records.get(key)
+        if record is None:
+            record = _Record(row.state, decode_data(row.data), row.updated_at) if row is not None else _Record()
+            self._records[key] = record
+            self._evict()
+        return record
+
+    def _evict(self) -> None:
+        """Вытесняет из памяти давно не используемые сохранённые записи."""
+        excess = len(self._records) - self.cache_size
+        if excess <= 0:
+            return
+        for key in list(self._records):
+            if excess <= 0:
+                break
+            if key not in self._dirty:
+                del self._records[key]
+                excess -= 1
+
+    def _touch(self, key: StorageKey, record: _Record) -> None:
+        record.updated_at = time.time()
+        self._dirty.add(key)
+        self._ensure_writer()
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        record = await self._record(key)
+        record.state = state.state if isinstance(state, State) else state
+        self._touch(key, record)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        record = await self._record(key)
+        return record.state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        record = await self._record(key)
+        record.data = data.copy()
+        self._touch(key, record)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        record = await self._record(key)
+        return record.data.copy()
+
+    async def flush(self) -> int:
+        """
+        Записывает накопленные изменения в базу одной транзакцией.
+
+        Пустые состояния (без состояния и данных) удаляются из базы. Если запись не удалась,
+        ключи остаются несохранёнными и попадут в следующую запись.
+
+        :return: Количество записанных ключей.
+        """
+        async with self._flush_lock:
+            if not self._dirty:
+                return 0
+            keys, self._dirty = self._dirty, set()
+
+            rows, empty = [], []
+            for key in keys:
+                record = self._records[key]
+                storage_key = self.key_builder.build(key)
+                if record.state is None and not record.data:
+                    empty.append(storage_key)
+                else:
+                    rows.append({'key': storage_key, 'state': record.state, 'data': encode_data(record.data),
+                                 'updated_at': record.updated_at})
+
+            async def write(session: AsyncSession) -> None:
+                if rows:
+                    stmt = insert(FsmRecord)
+                    stmt = stmt.on_conflict_do_update(
+                        index_elements=[FsmRecord.key],
+                        set_={'state': stmt.excluded.state, 'data': stmt.excluded.data,
+                              'updated_at': stmt.excluded.updated_at},
+                    )
+                    await session.execute(stmt, rows)
+                if empty:
+                    await session.execute(delete(FsmRecord).where(FsmRecord.key.in_(empty)))
+
+            try:
+                await self.writer.submit(write)
+            except Exception as e:
+                self._dirty |= keys
+                print(f'Error in SQLiteStorage.flush: {e}')
+                return 0
+
+            if self._known is not None:
+                self._known.update(row['key'] for row in rows)
+                self._known.difference_update(empty)
+            metrics.inc('fsm_storage.flushes')
+            metrics.inc('fsm_storage.rows_written', len(keys))
+            self._evict()
+            return len(keys)
+
+    async def sweep(self) -> int:
+        """
+        Удаляет состояния, которые не менялись дольше state_ttl, из памяти и из базы.
+
+        :return: Количество удалённых из базы записей.
+        """
+        threshold = time.time() - self.state_ttl
+        for key, record in list(self._records.items()):
+            if record.updated_at < threshold and key not in self._dirty:
+                del self._records[key]
+
+        async def delete_expired(session: AsyncSession) -> list[str]:
+            result = await session.execute(
+                delete(FsmRecord).where(FsmRecord.updated_at < threshold).returning(FsmRecord.key)
+            )
+            return result.scalars().all()
+
+        try:
+            removed = await self.writer.submit(delete_expired)
+        except Exception as e:
+            print(f'Error in SQLiteStorage.sweep: {e}')
+            return 0
+
+        if self._known is not None:
+            self._known.difference_update(removed)
+        return len(removed)
+
+    async def count(self) -> int:
+        """Количество сохранённых в базе состояний (для диагностики и замеров)."""
+        async with self.read_session_factory() as session:
+            return await session.scalar(select(func.count()).select_from(FsmRecord))
+
+    async def close(self) -> None:
+        """Останавливает фоновую запись и сохраняет оставшиеся изменения."""
+        if self._writer is not None:
+            self._writer.cancel()
+            await asyncio.gather(self._writer, return_exceptions=True)
+            self._writer = None
+        await self.flush()
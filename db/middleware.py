@@ -0,0 +1,34 @@
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from db import ReadSessionLocal
+
+
+class DbSessionMiddleware(BaseMiddleware):
+    """
+    Открывает одну сессию базы данных на обновление и передаёт её обработчикам в аргументе session.
+
+    Все чтения при обработке обновления идут через эту сессию (соединения только для чтения),
+    а не открывают по сессии на каждый вызов db_service. Изменения db_service передаёт
+    единственному писателю базы.
+    """
+
+    def __init__(self, session_factory: async_sessionmaker = ReadSessionLocal):
+        """
+        :param session_factory: Фабрика асинхронных сессий SQLAlchemy.
+        """
+        self.session_factory = session_factory
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any],
+    ) -> Any:
+        # Сессия не занимает соединение, пока обработчик не выполнит первый запрос
+        async with self.session_factory() as session:
+            data['session'] = session
+            return await handler(event, data)
@@ -0,0 +1,69 @@
+from itertools import chain
+from typing import Dict, List, Optional
+
+from sqlalchemy import Connection, inspect, insert, select, text
+
+from db.models import Country, FavoritesMovie, Genre, Movie, MovieCountry, MovieGenre
+
+
+def _split_names(names: Optional[str]) -> List[str]:
+    """Названия из строки через запятую (так жанры и страны хранились в избранном), без повторов."""
+    return list(dict.fromkeys(name.strip() for name in (names or '').split(',') if name.strip()))
+
+
+def _intern(connection: Connection, lookup: type[Genre] | type[Country], names: List[str]) -> Dict[str, int]:
+    """ID названий в справочнике; недостающие названия добавляются."""
+    ids = dict(connection.execute(select(lookup.name, lookup.id)).all())
+    missing = [name for name in dict.fromkeys(names) if name not in ids]
+    if missing:
+        connection.execute(insert(lookup), [{'name': name} for name in missing])
+        ids = dict(connection.execute(select(lookup.name, lookup.id)).all())
+    return ids
+
+
+# Перенос избранного из прежней схемы, где название, год, жанры и страны копировались в каждую запись,
+# в общий каталог movies со справочниками жанров и стран. Таблица favorites_movie пересоздаётся
+# с колонками (id, user_id, movie_id, create_at); ID записей и порядок добавления сохраняются
+def migrate_favourites_to_catalog(connection: Connection) -> None:
+    columns = {column['name'] for column in inspect(connection).get_columns('favorites_movie')}
+    if 'movie_name' not in columns:
+        return
+
+    # Для каждого фильма в каталог попадает самая поздняя запись
+    rows = connection.execute(text(
+        'SELECT movie_id, movie_name, release_year, genres, country FROM favorites_movie ORDER BY id'
+    )).all()
+    movies = {row.movie_id: row for row in rows}
+    existing = set(connection.scalars(select(Movie.id)))
+    movies = {movie_id: row for movie_id, row in movies.items() if movie_id not in existing}
+
+    genres = {movie_id: _split_names(row.genres) for movie_id, row in movies.items()}
+    countries = {movie_id: _split_names(row.country) for movie_id, row in movies.items()}
+    genre_ids = _intern(connection, Genre, list(chain.from_iterable(genres.values())))
+    country_ids = _intern(connection, Country, list(chain.from_iterable(countries.values())))
+
+    if movies:
+        # updated_at = 0: карточка обновится из API при следующем добавлении фильма в избранное
+        connection.execute(insert(Movie), [
+            {'id': movie_id, 'name': row.movie_name, 'release_year': row.release_year, 'updated_at': 0}
+            for movie_id, row in movies.items()
+        ])
+    genre_links = [{'movie_id': movie_id, 'position': position, 'genre_id': genre_ids[name]}
+                   for movie_id, names in genres.items() for position, name in enumerate(names)]
+    if genre_links:
+        connection.execute(insert(MovieGenre), genre_links)
+    country_links = [{'movie_id': movie_id, 'position': position, 'country_id': country_ids[name]}
+                     for movie_id, names in countries.items() for position, name in enumerate(names)]
+    if country_links:
+        connection.execute(insert(MovieCountry), country_links)
+
+    # Индекс с тем же именем создаётся для новой таблицы, поэтому старый удаляется до переименования
+    connection.execute(text('DROP INDEX IF EXISTS ix_favorites_movie_user_created'))
+    connection.execute(text('ALTER TABLE favorites_movie RENAME TO favorites_movie_old'))
+    FavoritesMovie.__table__.create(connection)
+    connection.execute(text(
+        'INSERT INTO favorites_movie (id, user_id, movie_id, create_at) '
+        'SELECT id, user_id, movie_id, create_at FROM favorites_movie_old'
+    ))
+    connection.execute(text('DROP TABLE favorites_movie_old'))
+    print(f'Избранное перенесено в каталог фильмов: {len(rows)} записей, {len(movies)} фильмов.')
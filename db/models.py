@@ -1,7 +1,7 @@
 import datetime
 from typing import Annotated, Optional
 
-from sqlalchemy import ForeignKey, UniqueConstraint
+from sqlalchemy import DDL, ForeignKey, Index, LargeBinary, UniqueConstraint, event
 from sqlalchemy.orm import Mapped, mapped_column
 
 from db import Base
@@ -26,18 +26,107 @@ class Users(Base):
     update_at: Mapped[update_at]
 
 
+class Movie(Base):
+    __tablename__ = 'movies'
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)  # ID фильма на Кинопоиске
+    name: Mapped[str] = mapped_column(nullable=False)
+    release_year: Mapped[Optional[int]]
+    updated_at: Mapped[float] = mapped_column(nullable=False)  # Время обновления карточки, unix time
+
+
+class Genre(Base):
+    __tablename__ = 'genres'
+
+    id: Mapped[intpk]
+    name: Mapped[str] = mapped_column(unique=True, nullable=False)
+
+
+class Country(Base):
+    __tablename__ = 'countries'
+
+    id: Mapped[intpk]
+    name: Mapped[str] = mapped_column(unique=True, nullable=False)
+
+
+class MovieGenre(Base):
+    __tablename__ = 'movie_genres'
+
+    movie_id: Mapped[int] = mapped_column(ForeignKey('movies.id', ondelete='CASCADE'), primary_key=True)
+    position: Mapped[int] = mapped_column(primary_key=True)  # Порядок жанра в карточке фильма
+    genre_id: Mapped[int] = mapped_column(ForeignKey('genres.id'), nullable=False)
+
+
+class MovieCountry(Base):
+    __tablename__ = 'movie_countries'
+
+    movie_id: Mapped[int] = mapped_column(ForeignKey('movies.id', ondelete='CASCADE'), primary_key=True)
+    position: Mapped[int] = mapped_column(primary_key=True)  # Порядок страны в карточке фильма
+    country_id: Mapped[int] = mapped_column(ForeignKey('countries.id'), nullable=False)
+
+
 class FavoritesMovie(Base):
     __tablename__ = 'favorites_movie'
 
     id: Mapped[intpk]
     user_id: Mapped[int] = mapped_column(ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
-    movie_id: Mapped[int] = mapped_column(nullable=False)
-    movie_name: Mapped[str] = mapped_column(nullable=False)
-    genres: Mapped[Optional[str]]
-    release_year: Mapped[Optional[int]]
-    country: Mapped[Optional[str]]
+    movie_id: Mapped[int] = mapped_column(ForeignKey('movies.id'), nullable=False)  # Фильм в каталоге movies
     create_at: Mapped[create_at]
 
     __table_args__ = (
+        # Уникальный индекс (user_id, movie_id) обслуживает и подсчёт, и удаление избранного пользователя
         UniqueConstraint('user_id', 'movie_id', name='unique_user_movie'),
+        # Список избранного в порядке добавления читается по индексу без сортировки
+        Index('ix_favorites_movie_user_created', 'user_id', 'create_at'),
     )
+
+
+class KinopoiskCache(Base):
+    __tablename__ = 'kinopoisk_cache'
+
+    key: Mapped[str] = mapped_column(primary_key=True)
+    payload: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)  # Ответ API, JSON сжатый zlib
+    search_limit: Mapped[Optional[int]]  # Лимит, с которым выполнялся поиск (для поиска)
+    fetched_at: Mapped[float] = mapped_column(nullable=False, index=True)  # Время получения, unix time
+
+
+class MovieDocument(Base):
+    __tablename__ = 'movie_documents'
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)  # ID фильма на Кинопоиске
+    payload: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)  # Документ поиска API, JSON сжатый zlib
+    rating: Mapped[Optional[float]]  # Рейтинг Кинопоиска: порядок равноценных совпадений локального поиска
+    updated_at: Mapped[float] = mapped_column(nullable=False)  # Время получения документа, unix time
+
+
+# Полнотекстовый индекс FTS5 по названиям фильмов из movie_documents (rowid — ID фильма). Названия хранятся
+# нормализованными; префиксные индексы ускоряют поиск по началу слова
+event.listen(MovieDocument.__table__, 'after_create', DDL(
+    "CREATE VIRTUAL TABLE IF NOT EXISTS movie_names USING fts5("
+    "name, en_name, alternative_name, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+))
+
+
+class KinopoiskQuota(Base):
+    __tablename__ = 'kinopoisk_quota'
+
+    day: Mapped[str] = mapped_column(primary_key=True)  # Сутки по московскому времени, YYYY-MM-DD
+    key_name: Mapped[str] = mapped_column(primary_key=True)  # Имя счётчика (API-ключа)
+    used: Mapped[int] = mapped_column(default=0, nullable=False)
+
+
+class FsmRecord(Base):
+    __tablename__ = 'fsm_state'
+
+    key: Mapped[str] = mapped_column(primary_key=True)  # Ключ хранилища aiogram (бот, чат, пользователь)
+    state: Mapped[Optional[str]]
+    data: Mapped[Optional[bytes]] = mapped_column(LargeBinary)  # Данные состояния в компактном формате
+    updated_at: Mapped[float] = mapped_column(nullable=False, index=True)  # Время изменения, unix time
+
+
+class TelegramFileId(Base):
+    __tablename__ = 'telegram_file_ids'
+
+    url: Mapped[str] = mapped_column(primary_key=True)  # URL постера или фото на Кинопоиске
+    file_id: Mapped[str] = mapped_column(nullable=False)  # file_id, который Telegram вернул при первой отправке
+    updated_at: Mapped[float] = mapped_column(nullable=False, index=True)  # Время сохранения, unix time
@@ -0,0 +1,68 @@
+import time
+from collections import OrderedDict
+
+from config_data import config
+from utils import metrics
+
+
+class UserIdCache:
+    """
+    Кэш соответствия Telegram ID пользователя и его users.id.
+
+    users.id пользователя не меняется, поэтому операции с избранным берут его из памяти,
+    а не запрашивают таблицу users каждый раз. Размер кэша ограничен (вытесняются давно
+    не использовавшиеся записи), время жизни записи — на случай пересоздания базы.
+    """
+
+    def __init__(self, max_size: int = config.USER_ID_CACHE_SIZE, ttl: float = config.USER_ID_CACHE_TTL):
+        """
+        :param max_size: Сколько пользователей держать в памяти.
+        :param ttl: Время жизни записи в секундах.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._items: OrderedDict[int, tuple[float, int]] = OrderedDict()  # telegram_id -> (expires_at, users.id)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, telegram_id: int) -> int | None:
+        """
+        Возвращает users.id пользователя.
+
+        :param telegram_id: Telegram ID пользователя.
+        :return: users.id или None, если пользователя нет в кэше или запись устарела.
+        """
+        entry = self._items.get(telegram_id)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._items[telegram_id]
+            metrics.inc('user_id_cache.misses')
+            return None
+        self._items.move_to_end(telegram_id)
+        metrics.inc('user_id_cache.hits')
+        return entry[1]
+
+    def set(self, telegram_id: int, user_id: int) -> None:
+        """
+        Запоминает users.id пользователя.
+
+        :param telegram_id: Telegram ID пользователя.
+        :param user_id: users.id.
+        """
+        self._items[telegram_id] = (time.monotonic() + self.ttl, user_id)
+        self._items.move_to_end(telegram_id)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+    def evict(self, telegram_id: int) -> None:
+        """
+        Забывает пользователя.
+
+        :param telegram_id: Telegram ID пользователя.
+        """
+        self._items.pop(telegram_id, None)
+
+
+# Общий кэш users.id для db_service
+user_id_cache = UserIdCache()
@@ -0,0 +1,117 @@
+import asyncio
+from typing import Awaitable, Callable, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config_data import config
+from db.user_cache import user_id_cache
+from db.writer import DbWriter, db_writer
+from utils import metrics
+
+# Функция записи пачки профилей: (сессия, список строк users) -> users.id по Telegram ID
+UpsertUsers = Callable[[AsyncSession, list[dict]], Awaitable[dict[int, int]]]
+
+
+class UserWriteBehind:
+    """
+    Отложенная запись профилей пользователей (команда /start).
+
+    Обработчик только ставит профиль в очередь и сразу отвечает пользователю. Повторные
+    обновления одного пользователя до записи объединяются (остаётся последнее), а очередь
+    записывается в базу пачками через писателя базы, а не транзакцией на каждый /start.
+    """
+
+    def __init__(self, upsert: UpsertUsers, writer: DbWriter = db_writer,
+                 flush_interval: float = config.USER_FLUSH_INTERVAL, batch_size: int = config.USER_FLUSH_BATCH):
+        """
+        :param upsert: Функция, записывающая пачку профилей одним запросом.
+        :param writer: Писатель базы.
+        :param flush_interval: Сколько секунд копить обновления перед записью.
+        :param batch_size: Сколько профилей записывать одним запросом.
+        """
+        self.upsert = upsert
+        self.writer = writer
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._pending: dict[int, dict] = {}  # Telegram ID -> строка users, ожидающая записи
+        self._writing: dict[int, dict] = {}  # Профили, которые записываются прямо сейчас
+        self._lock = asyncio.Lock()
+        self._flush_task: asyncio.Task | None = None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def register(self, telegram_id: int, username: Optional[str], first_name: Optional[str],
+                 last_name: Optional[str]) -> None:
+        """
+        Ставит профиль пользователя в очередь на запись.
+
+        :param telegram_id: Telegram ID пользователя.
+        :param username: Имя пользователя в Telegram.
+        :param first_name: Имя.
+        :param last_name: Фамилия.
+        """
+        if telegram_id in self._pending:
+            metrics.inc('user_writer.merged')
+        self._pending[telegram_id] = {
+            'telegram_id': telegram_id,
+            'username': username,
+            'first_name': first_name,
+            'last_name': last_name,
+        }
+        self._schedule_flush()
+
+    def is_pending(self, telegram_id: int) -> bool:
+        """
+        Проверяет, что профиль пользователя ещё не записан в базу.
+
+        :param telegram_id: Telegram ID пользователя.
+        """
+        return telegram_id in self._pending or telegram_id in self._writing
+
+    async def flush(self) -> None:
+        """Записывает накопленные профили в базу пачками."""
+        async with self._lock:
+            if not self._pending:
+                return
+            self._writing, self._pending = self._pending, {}
+            rows = list(self._writing.values())
+
+            try:
+                user_ids = await self.writer.submit(lambda session: self._upsert_batches(session, rows))
+            except Exception as e:
+                # Более новые профили тех же пользователей, пришедшие во время записи, важнее
+                self._pending = {**self._writing, **self._pending}
+                print(f'Error in UserWriteBehind.flush: {e}')
+                return
+            finally:
+                self._writing = {}
+
+            for telegram_id, user_id in user_ids.items():
+                user_id_cache.set(telegram_id, user_id)
+            metrics.inc('user_writer.flushed', len(rows))
+
+    async def _upsert_batches(self, session: AsyncSession, rows: list[dict]) -> dict[int, int]:
+        user_ids = {}
+        for start in range(0, len(rows), self.batch_size):
+            user_ids.update(await self.upsert(session, rows[start:start + self.batch_size]))
+        return user_ids
+
+    def _schedule_flush(self) -> None:
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.ensure_future(self._delayed_flush())
+
+    async def _delayed_flush(self) -> None:
+        await asyncio.sleep(self.flush_interval)
+        await self.flush()
+        if self._pending:
+            # Профили, пришедшие во время записи или не записанные из-за ошибки, уйдут следующей пачкой
+            self._flush_task = asyncio.ensure_future(self._delayed_flush())
+
+    async def close(self) -> None:
+        """Записывает оставшиеся профили."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+        await self.flush()
@@ -0,0 +1,124 @@
+import asyncio
+from typing import Awaitable, Callable, TypeVar
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from config_data import config
+from db import AsyncSessionLocal
+from utils import metrics
+
+T = TypeVar('T')
+
+# Изменение базы: получает сессию писателя, выполняет запросы без commit и возвращает результат
+WriteJob = Callable[[AsyncSession], Awaitable[T]]
+
+
+class _Job:
+    """Изменение в очереди писателя и future с его результатом."""
+    __slots__ = ('run', 'future')
+
+    def __init__(self, run: WriteJob, future: asyncio.Future):
+        self.run = run
+        self.future = future
+
+
+class DbWriter:
+    """
+    Единственный писатель в базу: выполняет изменения из очереди по одному и фиксирует их группами.
+
+    Изменения, накопившиеся в очереди, пока шла предыдущая транзакция, выполняются в одной
+    транзакции (до batch_size штук) и фиксируются одним commit — одна синхронизация журнала и
+    одно взятие блокировки записи на группу вместо одного на изменение. Если одно из изменений
+    группы завершилось ошибкой, группа откатывается и изменения повторяются по одному, так что
+    ошибка одного не отменяет остальные. Результат изменения возвращается вызывающему только
+    после фиксации его транзакции.
+    """
+
+    def __init__(self, session_factory: async_sessionmaker = AsyncSessionLocal,
+                 batch_size: int = config.DB_WRITE_BATCH):
+        """
+        :param session_factory: Фабрика сессий движка для записи.
+        :param batch_size: Сколько изменений фиксировать одной транзакцией.
+        """
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self._queue: asyncio.Queue[_Job | None] | None = None  # None — сигнал остановки
+        self._task: asyncio.Task | None = None
+
+    async def submit(self, run: WriteJob) -> T:
+        """
+        Ставит изменение в очередь и ждёт его фиксации.
+
+        :param run: Функция изменения; commit и rollback выполняет писатель.
+        :return: Результат функции изменения.
+        :raises Exception: Ошибка изменения или фиксации транзакции.
+        """
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(_Job(run, future))
+        return await future
+
+    async def _run(self) -> None:
+        while True:
+            job = await self._queue.get()
+            if job is None:
+                return
+            batch = [job]
+            stop = False
+            while len(batch) < self.batch_size and not self._queue.empty():
+                job = self._queue.get_nowait()
+                if job is None:
+                    stop = True
+                    break
+                batch.append(job)
+            await self._commit(batch)
+            if stop:
+                return
+
+    async def _commit(self, batch: list[_Job]) -> None:
+        """Выполняет группу изменений в одной транзакции."""
+        results = []
+        async with self.session_factory() as session:
+            try:
+                for job in batch:
+                    results.append(await job.run(session))
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                error = e
+            else:
+                error = None
+
+        if error is None:
+            metrics.inc('db_writer.commits')
+            metrics.inc('db_writer.jobs', len(batch))
+            for job, result in zip(batch, results):
+                if not job.future.done():
+                    job.future.set_result(result)
+            return
+
+        if len(batch) > 1:
+            # Ошибка одного изменения не должна отменять остальные: повторяем группу по одному
+            metrics.inc('db_writer.split_batches')
+            for job in batch:
+                await self._commit([job])
+            return
+
+        job = batch[0]
+        if not job.future.done():
+            job.future.set_exception(error)
+
+    async def close(self) -> None:
+        """Выполняет изменения, оставшиеся в очереди, и останавливает писателя."""
+        if self._task is None or self._task.done():
+            return
+        self._queue.put_nowait(None)
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+
+# Общий писатель для всех изменений пользовательских данных
+db_writer = DbWriter()
@@ -1,16 +1,20 @@
-import asyncio
 import re
 
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
 from aiogram.types import CallbackQuery, Message
 
+from config_data import config
 from keyboards.inline.create_inline_keyboard import (
     main_menu_inline_keyboard,
     create_limit_search_keyboard,
-    actor_details_keyboard
+    actor_details_keyboard,
+    numbered_results_keyboard
 )
 from kinopoisk_API.actor_name_API import search_actor_api
+from kinopoisk_API.name_matcher import correct_query, person_names
+from utils.album import album_batch
+from utils.send_scheduler import send_scheduler
 
 
 class ActorSearchStatesName(StatesGroup):
@@ -89,24 +93,32 @@ async def process_actor_search(callback_query: CallbackQuery, state: FSMContext)
     # Выполняем запрос к API с учетом выбранного лимита
     actor_data = await search_actor_api(actor_name, limit=limit)
 
+    # Опечатку исправляем по уже известным боту именам, только если по запросу как есть ничего не нашлось
+    corrected_actor_name = None
+    if actor_data == []:
+        corrected_actor_name = await correct_query(person_names, actor_name)
+        if corrected_actor_name:
+            actor_data = await search_actor_api(corrected_actor_name, limit=limit)
+
     # Удаляем сообщение о начале поиска
     await searching_message.delete()
 
-    # Получаем текущий список сообщений из состояния
-    sent_messages = data.get('sent_messages', [])
-
     # Обрабатываем ответ от API
-    if actor_data and 'docs' in actor_data and actor_data['docs']:
-
-        for actor_info in actor_data['docs']:
-            _actor_id = actor_info.get('id')  # ID актера
-            poster_url = actor_info.get('photo')  # URL постера
-            actor_birthday = actor_info.get('birthday')  # Дата рождения актера
+    if actor_data:
+        # Сообщения с результатами отправляет планировщик с допустимой скоростью, обработчик их не ждёт
+        batch = []
+        # В режиме альбома результаты нумеруются, а кнопки с номерами приходят одним сообщением
+        album = config.SEARCH_RESULTS_MODE == 'album'
+        album_items = []
+
+        for number, actor_info in enumerate(actor_data, start=1):
+            poster_url = actor_info.photo  # URL постера
+            actor_birthday = actor_info.birthday  # Дата рождения актера
             formatted_birthday = actor_birthday.split('T')[
                 0] if actor_birthday else 'Не указано'  # Форматируем дату рождения
 
             # Определяем возраст и его правильное склонение
-            age = actor_info.get('age', None)
+            age = actor_info.age
             if age is not None:
                 if age % 10 == 1 and age % 100 != 11:
                     age_suffix = 'год'
@@ -118,34 +130,42 @@ async def process_actor_search(callback_query: CallbackQuery, state: FSMContext)
                 age_suffix = 'Не указано'
 
             # Формируем текстовое сообщение об актере
+            number_prefix = f'<b>{number}.</b> ' if album else ''
             actor_caption = (
-                f'<i><b>Имя:</b></i> {actor_info.get('name', 'Не указано')}\n'
-                f'<i><b>Английское имя:</b></i> {actor_info.get('enName', 'Не указано')}\n'
-                f'<i><b>Пол:</b></i> {actor_info.get('sex', 'Не указано')}\n'
-                f'<i><b>Рост:</b></i> {actor_info.get('growth', 'Не указано')} см\n'
+                f'{number_prefix}<i><b>Имя:</b></i> {actor_info.name or 'Не указано'}\n'
+                f'<i><b>Английское имя:</b></i> {actor_info.en_name or 'Не указано'}\n'
+                f'<i><b>Пол:</b></i> {actor_info.sex or 'Не указано'}\n'
+                f'<i><b>Рост:</b></i> {actor_info.growth or 'Не указано'} см\n'
                 f'<i><b>Дата рождения:</b></i> {formatted_birthday}\n'
                 f'<i><b>Возраст:</b></i> {age} {age_suffix}\n'
             )
 
             # Отправляем постер и описание
-            if poster_url:
-                message_sent = await callback_query.message.answer_photo(photo=poster_url, caption=actor_caption,
-                                                                         parse_mode='HTML',
-                                                                         reply_markup=actor_details_keyboard(
-                                                                             actor_info))
+            if album:
+                album_items.append((poster_url, actor_caption))
+            elif poster_url:
+                batch.append(callback_query.message.answer_photo(photo=poster_url, caption=actor_caption,
+                                                                 parse_mode='HTML',
+                                                                 reply_markup=actor_details_keyboard(actor_info.id)))
             else:
-                message_sent = await callback_query.message.answer(actor_caption, parse_mode='HTML',
-                                                                   reply_markup=actor_details_keyboard(
-                                                                       actor_info))
-
-            # Сохраняем отправленное сообщение в список
-            sent_messages.append(message_sent)
-
-            await asyncio.sleep(1)  # Задержка в 1 секунду
-
-        # Отправляем сообщение с основным меню
-        await callback_query.message.answer('Все актеры отправлены. Выберите действие:',
-                                            reply_markup=main_menu_inline_keyboard())
+                batch.append(callback_query.message.answer(actor_caption, parse_mode='HTML',
+                                                           reply_markup=actor_details_keyboard(actor_info.id)))
+
+        # Сообщение с основным меню уходит последним в той же пачке
+        if album:
+            batch = album_batch(callback_query.message, album_items)
+            batch.append(callback_query.message.answer(
+                'Все актеры отправлены. Нажмите номер, чтобы получить детальную информацию:',
+                reply_markup=numbered_results_keyboard('actor_details', [actor.id for actor in actor_data], '📜')
+            ))
+        else:
+            batch.append(callback_query.message.answer('Все актеры отправлены. Выберите действие:',
+                                                       reply_markup=main_menu_inline_keyboard()))
+        if corrected_actor_name:
+            batch.insert(0, callback_query.message.answer(
+                f'По запросу «{actor_name}» ничего не найдено, показываю результаты для «{corrected_actor_name}».'
+            ))
+        send_scheduler.enqueue(batch)
 
     else:
         await callback_query.message.answer(f'Не удалось найти информацию о человеке\n"<i><b>{actor_name}</b></i>".',
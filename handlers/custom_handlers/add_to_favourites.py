@@ -1,60 +1,72 @@
 from aiogram import types
 from aiogram.fsm.context import FSMContext
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from db.db_service import add_movie_to_favourites_in_db, check_current_favorites_count
+from config_data import config
+from db.db_service import AddFavouriteResult, add_movie_to_favourites_in_db, get_user_id
+from keyboards.inline.create_inline_keyboard import without_button
 
 
-async def add_movie_to_favourites(callback_query: types.CallbackQuery, state: FSMContext) -> None:
+async def add_movie_to_favourites(callback_query: types.CallbackQuery, state: FSMContext,
+                                  session: AsyncSession) -> None:
     """
     Обработчик для добавления фильма в избранное.
 
-    Извлекает movie_id из callback_data, проверяет, есть ли фильм в списке
+    Извлекает movie_id из callback_data, находит фильм в индексе результатов поиска
     и добавляет его в избранное пользователя, если это возможно.
 
     :param callback_query: Объект CallbackQuery от Aiogram.
     :param state: Объект состояния FSMContext для хранения данных.
+    :param session: Сессия базы данных, открытая для этого обновления.
     """
     # Извлечение movie_id из callback_data
     movie_callback_id = callback_query.data.split(':')[1]
 
     state_data = await state.get_data()
-    movies_list = state_data.get('movies', [])
+    movies_index = state_data.get('movies', {})
 
     # Находим выбранный фильм по ID
-    selected_movie = next((movie for movie in movies_list if str(movie['id']) == movie_callback_id), None)
+    selected_movie = movies_index.get(movie_callback_id)
 
     if selected_movie:
         movie_name = selected_movie['name']
-        movie_id = selected_movie['id']
+        movie_id = int(movie_callback_id)
         genres = selected_movie['genres']
         release_year = selected_movie['year']
-        country = selected_movie['country']
+        countries = selected_movie['countries']
         telegram_id = callback_query.from_user.id
 
-        # Проверяем текущее количество избранных фильмов
-        current_favorites_count, user_id = await check_current_favorites_count(telegram_id)
-
+        user_id = await get_user_id(session, telegram_id)
         if user_id is None:
             await callback_query.answer('Ошибка: пользователь не найден.')
             return
 
-        if current_favorites_count >= 10:
-            await callback_query.answer('Вы не можете добавить больше 10 фильмов в избранное.')
+        # Проверка лимита и добавление выполняются одним запросом
+        result = await add_movie_to_favourites_in_db(
+            user_id=user_id,
+            movie_name=movie_name,
+            movie_id=movie_id,
+            release_year=release_year,
+            genres=genres,
+            countries=countries
+        )
+        if result is AddFavouriteResult.ADDED:
+            await callback_query.answer(f'Фильм "{movie_name}" добавлен в избранное!')
+        elif result is AddFavouriteResult.DUPLICATE:
+            await callback_query.answer(f'Фильм "{movie_name}" уже находится в избранном.')
+        elif result is AddFavouriteResult.LIMIT_REACHED:
+            await callback_query.answer(f'Вы не можете добавить больше {config.FAVOURITES_LIMIT} фильмов в избранное.')
         else:
-            # Добавляем фильм в избранное
-            if await add_movie_to_favourites_in_db(
-                    user_id=user_id,
-                    movie_name=movie_name,
-                    movie_id=movie_id,
-                    release_year=release_year,
-                    genres=genres,
-                    country=country
-            ):
-                await callback_query.answer(f'Фильм "{movie_name}" добавлен в избранное!')
-            else:
-                await callback_query.answer(f'Фильм "{movie_name}" уже находится в избранном.')
+            await callback_query.answer('Ошибка: не удалось добавить фильм, попробуйте позже.')
     else:
         await callback_query.answer('Ошибка: не удалось найти фильм.')
 
+    # Кнопка из клавиатуры с номерами (режим альбома): убираем только её, остальные фильмы остаются доступны
+    if callback_query.data.count(':') > 1:
+        await callback_query.message.edit_reply_markup(
+            reply_markup=without_button(callback_query.message.reply_markup, callback_query.data)
+        )
+        return
+
     # Удаляем клавиатуру
     await callback_query.message.edit_reply_markup()
@@ -1,5 +1,6 @@
 from aiogram.fsm.context import FSMContext
 from aiogram.types import CallbackQuery, Message
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from db.db_service import delete_movies, clear_all_favourites
 from handlers.custom_handlers.view_favorites import FavoritesStates
@@ -10,8 +11,8 @@ async def delete_movie_callback_handler(callback_query: CallbackQuery, state: FS
     """
     Хендлер для удаления фильма из избранного.
 
-    Отправляет пользователю сообщение с просьбой ввести номер(а) фильма(ов),
-    который(е) он хочет удалить из избранного.
+    Отправляет пользователю сообщение с просьбой ввести номер(а) фильма(ов) с показанной
+    страницы избранного, который(е) он хочет удалить.
 
     :param callback_query: Объект CallbackQuery от Aiogram, содержащий данные о событии.
     :param state: Контекст состояния для хранения временных данных.
@@ -19,14 +20,15 @@ async def delete_movie_callback_handler(callback_query: CallbackQuery, state: FS
     await callback_query.answer()
 
     await callback_query.message.answer(
-        'Введите номер фильма или несколько номеров через запятую, '
+        'Введите номер фильма с этой страницы или несколько номеров через запятую, '
         'которые вы хотите удалить из избранного:',
         reply_markup=clear_all_favorites_keyboard()
     )
     await state.set_state(FavoritesStates.waiting_for_movie_number)
 
 
-async def clear_favorites_callback_handler(callback_query: CallbackQuery, state: FSMContext) -> None:
+async def clear_favorites_callback_handler(callback_query: CallbackQuery, state: FSMContext,
+                                           session: AsyncSession) -> None:
     """
     Обработчик для очистки всех избранных фильмов.
 
@@ -34,12 +36,13 @@ async def clear_favorites_callback_handler(callback_query: CallbackQuery, state:
 
     :param callback_query: Объект CallbackQuery от Aiogram, содержащий данные о событии.
     :param state: Контекст состояния для хранения временных данных.
+    :param session: Сессия базы данных, открытая для этого обновления.
     """
     await callback_query.answer()
 
     # Получаем идентификатор пользователя
     telegram_id = callback_query.from_user.id
-    await clear_all_favourites(telegram_id)
+    await clear_all_favourites(session, telegram_id)
 
     await callback_query.message.edit_text(
         'Ваши избранные фильмы успешно очищены.',
@@ -62,7 +65,7 @@ async def cancel_deletion_callback_handler(callback_query: CallbackQuery, state:
     await state.clear()
 
 
-async def delete_movie_by_number(message: Message, state: FSMContext) -> None:
+async def delete_movie_by_number(message: Message, state: FSMContext, session: AsyncSession) -> None:
     """
     Обработчик для удаления фильмов по номерам.
 
@@ -70,6 +73,7 @@ async def delete_movie_by_number(message: Message, state: FSMContext) -> None:
 
     :param message: Объект Message от Aiogram, содержащий текст сообщения пользователя.
     :param state: Контекст состояния для хранения временных данных.
+    :param session: Сессия базы данных, открытая для этого обновления.
     """
     movie_numbers_str = message.text
 
@@ -83,24 +87,31 @@ async def delete_movie_by_number(message: Message, state: FSMContext) -> None:
         )
         return
 
+    # ID записей избранного на показанной странице и номер первой из них
     data = await state.get_data()
-    favourites = data.get('favourites', [])
+    favourite_ids = data.get('favourites', [])
+    first_number = data.get('favourites_first', 1)
 
     # Проверяем на наличие некорректных номеров фильмов
-    invalid_numbers = [num for num in movie_numbers if num < 1 or num > len(favourites)]
+    invalid_numbers = [num for num in movie_numbers
+                       if num < first_number or num >= first_number + len(favourite_ids)]
     if invalid_numbers:
         await message.answer(
-            f'Фильмы с номерами {", ".join(map(str, invalid_numbers))} не найдены.',
+            f'Фильмы с номерами {", ".join(map(str, invalid_numbers))} не найдены на этой странице.',
             reply_markup=main_menu_inline_keyboard()
         )
         return
 
-    # Удаляем фильмы из избранного
-    deleted_movies = await delete_movies(favourites, movie_numbers)
+    # Удаляем фильмы из избранного по ID записей (повторы номеров отбрасываем)
+    selected_ids = list(dict.fromkeys(favourite_ids[num - first_number] for num in movie_numbers))
+    deleted_movies = await delete_movies(session, message.from_user.id, selected_ids)
 
-    deleted_movies_list = ', '.join(deleted_movies)
-    await message.answer(
-        f'Фильмы "{deleted_movies_list}" успешно удалены из избранного.',
-        reply_markup=main_menu_inline_keyboard()
-    )
+    if not deleted_movies:
+        await message.answer('Эти фильмы уже удалены из избранного.', reply_markup=main_menu_inline_keyboard())
+    else:
+        deleted_movies_list = ', '.join(deleted_movies)
+        await message.answer(
+            f'Фильмы "{deleted_movies_list}" успешно удалены из избранного.',
+            reply_markup=main_menu_inline_keyboard()
+        )
     await state.clear()
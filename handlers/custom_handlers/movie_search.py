@@ -1,4 +1,3 @@
-import asyncio
 import re
 from typing import Optional
 
@@ -6,12 +5,17 @@ from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
 from aiogram.types import CallbackQuery, Message
 
+from config_data import config
 from keyboards.inline.create_inline_keyboard import (
     main_menu_inline_keyboard,
     move_favourites_keyboard,
-    create_limit_search_keyboard
+    create_limit_search_keyboard,
+    numbered_results_keyboard
 )
 from kinopoisk_API.movie_API import search_movie_api
+from kinopoisk_API.name_matcher import correct_query, movie_names
+from utils.album import album_batch
+from utils.send_scheduler import send_scheduler
 
 
 class MovieSearchStates(StatesGroup):
@@ -85,58 +89,83 @@ async def process_movie_limit(callback_query: CallbackQuery, state: FSMContext)
     # Выполняем запрос к API с учетом выбранного лимита
     movie_data = await search_movie_api(movie_name, limit=limit)  # Передаем лимит в API
 
-    await searching_message.delete()
-
-    if movie_data and movie_data['docs']:
-        # Инициализируем список для сохранения данных о фильмах
-        movies = []
-
-        for movie_info in movie_data['docs']:
-            poster_url = movie_info['poster']['url'] if movie_info['poster'] else None
-            description = movie_info['description']
-            genres = ', '.join(genre['name'] for genre in movie_info['genres'])
-            country = ', '.join(country['name'] for country in movie_info['countries'])
+    # Опечатку исправляем по уже известным боту именам, только если по запросу как есть ничего не нашлось
+    corrected_movie_name = None
+    if movie_data == []:
+        corrected_movie_name = await correct_query(movie_names, movie_name)
+        if corrected_movie_name:
+            movie_data = await search_movie_api(corrected_movie_name, limit=limit)
 
-            # Добавляем информацию о фильме в список
-            movies.append({'name': movie_info['name'], 'year': movie_info['year'], 'genres': genres,
-                           'country': country, 'id': movie_info['id']})
+    await searching_message.delete()
 
+    if movie_data:
+        # Индекс найденных фильмов по ID: только поля, нужные для добавления в избранное
+        movies = {}
+        # Сообщения с результатами отправляет планировщик с допустимой скоростью, обработчик их не ждёт
+        batch = []
+        # В режиме альбома результаты нумеруются, а кнопки с номерами приходят одним сообщением
+        album = config.SEARCH_RESULTS_MODE == 'album'
+        album_items = []
+
+        for number, movie_info in enumerate(movie_data, start=1):
+            poster_url = movie_info.poster_url
+            description = movie_info.description
+            genres = ', '.join(movie_info.genres)
+            country = ', '.join(movie_info.countries)
+
+            # Добавляем информацию о фильме в индекс (ключ — строка, чтобы состояние сериализовалось в JSON)
+            movies[str(movie_info.id)] = {'name': movie_info.name, 'year': movie_info.year,
+                                          'genres': list(movie_info.genres), 'countries': list(movie_info.countries)}
+
+            number_prefix = f'<b>{number}.</b> ' if album else ''
             caption = (
-                f'🎬 <i><b>Название:</b></i> {movie_info['name']}\n'
-                f'📅 <i><b>Год:</b></i> {movie_info['year']}\n'
+                f'{number_prefix}🎬 <i><b>Название:</b></i> {movie_info.name}\n'
+                f'📅 <i><b>Год:</b></i> {movie_info.year}\n'
                 f'📝 <i><b>Описание:</b></i> {description}\n'
                 f'🎭 <i><b>Жанры:</b></i> {genres}\n'
                 f'🌍 <i><b>Страна:</b></i> {country}\n'
                 f'<i><b>Рейтинг:</b></i>\n'
-                f'⭐<i><b>Кп:</b></i> {movie_info['rating']['kp']} '
-                f'⭐<i><b>imdb:</b></i> {movie_info['rating']['imdb']} '
-                f'⭐<i><b>FC:</b></i> {movie_info['rating']['filmCritics']} '
-                f'⭐<i><b>RFC:</b></i> {movie_info['rating']['russianFilmCritics']}'
+                f'⭐<i><b>Кп:</b></i> {movie_info.rating_kp} '
+                f'⭐<i><b>imdb:</b></i> {movie_info.rating_imdb} '
+                f'⭐<i><b>FC:</b></i> {movie_info.rating_film_critics} '
+                f'⭐<i><b>RFC:</b></i> {movie_info.rating_russian_film_critics}'
             )
 
             # Проверяем длину caption и обрезаем description при необходимости
             _max_caption_length = 1024
             if len(caption) > _max_caption_length:
-                excess_length = len(caption) - _max_caption_length
+                excess_length = len(caption) - _max_caption_length + len('...')
                 description = description[:-excess_length].rstrip() + '...'  # Обрезаем и добавляем многоточие
-                caption = caption.replace(movie_info['description'], description)
+                caption = caption.replace(movie_info.description, description)
 
             # Отправляем постер и описание
-            if poster_url:
-                await callback_query.message.answer_photo(photo=poster_url, caption=caption, parse_mode='HTML',
-                                                          reply_markup=move_favourites_keyboard(movie_info))
+            if album:
+                album_items.append((poster_url, caption))
+            elif poster_url:
+                batch.append(callback_query.message.answer_photo(photo=poster_url, caption=caption, parse_mode='HTML',
+                                                                 reply_markup=move_favourites_keyboard(movie_info.id)))
             else:
-                await callback_query.message.answer(caption, parse_mode='HTML',
-                                                    reply_markup=move_favourites_keyboard(movie_info))
-
-            await asyncio.sleep(1)  # Задержка в 1 секунду
+                batch.append(callback_query.message.answer(caption, parse_mode='HTML',
+                                                           reply_markup=move_favourites_keyboard(movie_info.id)))
 
-        # Сохраняем список фильмов в FSMContext
+        # Сохраняем индекс фильмов в FSMContext
         await state.update_data(movies=movies)
 
-        # Отправляем сообщение с основным меню
-        await callback_query.message.answer('Все фильмы отправлены. Выберите действие:',
-                                            reply_markup=main_menu_inline_keyboard())
+        # Сообщение с основным меню уходит последним в той же пачке
+        if album:
+            batch = album_batch(callback_query.message, album_items)
+            batch.append(callback_query.message.answer(
+                'Все фильмы отправлены. Нажмите номер фильма, чтобы добавить его в избранное:',
+                reply_markup=numbered_results_keyboard('add_to_favourites', [movie.id for movie in movie_data], '⭐')
+            ))
+        else:
+            batch.append(callback_query.message.answer('Все фильмы отправлены. Выберите действие:',
+                                                       reply_markup=main_menu_inline_keyboard()))
+        if corrected_movie_name:
+            batch.insert(0, callback_query.message.answer(
+                f'По запросу «{movie_name}» ничего не найдено, показываю результаты для «{corrected_movie_name}».'
+            ))
+        send_scheduler.enqueue(batch)
 
     else:
         await callback_query.message.answer(f'Не удалось найти информацию о фильме\n"<i><b>{movie_name}</b></i>".',
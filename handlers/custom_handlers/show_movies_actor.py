@@ -2,6 +2,8 @@ from aiogram.fsm.context import FSMContext
 from aiogram.types import CallbackQuery
 
 from keyboards.inline.create_inline_keyboard import main_menu_inline_keyboard
+from kinopoisk_API.actor_id_API import get_actor_info
+from utils.send_scheduler import send_scheduler
 
 
 async def handle_show_movies_actor(callback_query: CallbackQuery, state: FSMContext) -> None:
@@ -13,12 +15,15 @@ async def handle_show_movies_actor(callback_query: CallbackQuery, state: FSMCont
     """
     await callback_query.answer()
     data = await state.get_data()
-    actor_info = data.get('actor_info')
+    actor_id = data.get('actor_id')
 
-    if actor_info and 'movies' in actor_info:
+    # Информация об актёре берётся из кэша ответов API (при необходимости запрашивается заново)
+    actor_info = await get_actor_info(actor_id) if actor_id else None
+
+    if actor_info and actor_info.movies:
         movies_list = '\n'.join(
-            f'<code>{movie['name']}</code> (⭐{movie.get('rating', 'Нет данных')})'
-            for movie in actor_info['movies'] if movie.get('name')
+            f'<code>{movie.name}</code> (⭐{movie.rating if movie.rating is not None else 'Нет данных'})'
+            for movie in actor_info.movies if movie.name
         )
         # Считаем количество символов и разделяем на несколько сообщений
         _max_length = 4096  # Максимальная длина сообщения в телеграмм
@@ -36,13 +41,13 @@ async def handle_show_movies_actor(callback_query: CallbackQuery, state: FSMCont
             if current_part:
                 parts.append(current_part)
 
-            await callback_query.message.answer(f'Найденные фильмы для: {actor_info['name']}:',
-                                                parse_mode='HTML')
+            batch = [callback_query.message.answer(f'Найденные фильмы для: {actor_info.name}:', parse_mode='HTML')]
             for part in parts:
-                await callback_query.message.answer(part.strip(), parse_mode='HTML',
-                                                    reply_markup=main_menu_inline_keyboard())
+                batch.append(callback_query.message.answer(part.strip(), parse_mode='HTML',
+                                                           reply_markup=main_menu_inline_keyboard()))
+            send_scheduler.enqueue(batch)
         else:
-            await callback_query.message.answer(f'Найденные фильмы для: {actor_info['name']}:\n{movies_list}',
+            await callback_query.message.answer(f'Найденные фильмы для: {actor_info.name}:\n{movies_list}',
                                                 parse_mode='HTML', reply_markup=main_menu_inline_keyboard())
     else:
         await callback_query.message.answer('Не удалось найти фильмы для актёра.',
@@ -1,39 +1,101 @@
+from typing import Optional, Tuple
+
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
 from aiogram.types import CallbackQuery
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from db.db_service import get_favourites
-from keyboards.inline.create_inline_keyboard import main_menu_inline_keyboard, viewing_and_deleting_favorites
+from config_data import config
+from db.db_service import get_favourites_page
+from keyboards.inline.create_inline_keyboard import (main_menu_inline_keyboard, viewing_and_deleting_favorites,
+                                                     FavouritesPageCallback)
 
 
 class FavoritesStates(StatesGroup):
     waiting_for_movie_number = State()
 
 
+async def show_favourites_page(callback_query: CallbackQuery, state: FSMContext, session: AsyncSession,
+                               page_number: int = 1, cursor: Optional[Tuple[str, int]] = None,
+                               backward: bool = False, edit: bool = False) -> bool:
+    """
+    Показывает одну страницу избранного с кнопками перехода на соседние страницы.
+
+    :param callback_query: Объект CallbackQuery, содержащий информацию о запросе.
+    :param state: Контекст состояния для хранения данных о пользователе.
+    :param session: Сессия базы данных, открытая для этого обновления.
+    :param page_number: Номер показываемой страницы, с 1.
+    :param cursor: Курсор (create_at, id) соседней страницы; None — первая страница.
+    :param backward: Страница идёт перед курсором.
+    :param edit: Заменить страницу в том же сообщении, а не отправлять новое.
+    :return: False, если избранное пусто.
+    """
+    telegram_id = callback_query.from_user.id
+    page = await get_favourites_page(session, telegram_id, cursor, backward)
+
+    if cursor is not None and (not page or not page.movies or (backward and not page.has_more)):
+        # Перед курсором не осталось целой страницы или фильмы страницы удалены: показываем первую страницу
+        return await show_favourites_page(callback_query, state, session, edit=edit)
+    if not page or not page.movies:
+        return False
+
+    first_number = (page_number - 1) * config.FAVOURITES_PAGE_SIZE + 1
+    first, last = page.movies[0], page.movies[-1]
+    previous_page = next_page = None
+    if page_number > 1:
+        previous_page = FavouritesPageCallback.from_cursor(first.create_at, first.id, page_number - 1, backward=True)
+    if page.has_more or backward:
+        next_page = FavouritesPageCallback.from_cursor(last.create_at, last.id, page_number + 1, backward=False)
+
+    message_text = f'Ваши избранные фильмы (страница {page_number}):\n'
+    number = first_number
+    for number, movie in enumerate(page.movies, first_number):
+        message_text += (f'{number}. <code>{movie.movie_name}</code> - ({movie.release_year}), '
+                         f'Жанр: <i>{movie.genres}</i>, Страна: {movie.country}\n')
+
+    reply_markup = viewing_and_deleting_favorites(number, previous_page, next_page)
+    if edit:
+        await callback_query.message.edit_text(message_text, reply_markup=reply_markup)
+    else:
+        await callback_query.message.answer(message_text, reply_markup=reply_markup)
+    # Для удаления по номеру храним только ID записей показанной страницы и номер первой из них
+    await state.update_data(favourites=[movie.id for movie in page.movies], favourites_first=first_number)
+    return True
+
+
 # Хендлер для показа избранных фильмов
-async def favourites_callback_handler(callback_query: CallbackQuery, state: FSMContext) -> None:
+async def favourites_callback_handler(callback_query: CallbackQuery, state: FSMContext, session: AsyncSession) -> None:
     """
     Обрабатывает запрос на отображение избранных фильмов пользователя.
 
     :param callback_query: Объект CallbackQuery, содержащий информацию о запросе.
     :param state: Контекст состояния для хранения данных о пользователе.
+    :param session: Сессия базы данных, открытая для этого обновления.
     """
     await state.clear()  # Очищаем предыдущее состояние
-    telegram_id = callback_query.from_user.id
-
-    # Получаем избранные фильмы через DataBaseManager
-    favourites = await get_favourites(telegram_id)
 
-    if not favourites:
+    if not await show_favourites_page(callback_query, state, session):
         await callback_query.answer('Ваше избранное пусто!', reply_markup=main_menu_inline_keyboard())
         return
 
     await callback_query.answer('Ваше избранное')
-    message_text = 'Ваши избранные фильмы:\n'
-    movie_id = None
-    for movie_id, movie in enumerate(favourites, 1):
-        message_text += (f'{movie_id}. <code>{movie.movie_name}</code> - ({movie.release_year}), '
-                         f'Жанр: <i>{movie.genres}</i>, Страна: {movie.country}\n')
 
-    await callback_query.message.answer(message_text, reply_markup=viewing_and_deleting_favorites(movie_id))
-    await state.update_data(favourites=favourites)
+
+# Хендлер для переключения страниц избранного
+async def favourites_page_callback_handler(callback_query: CallbackQuery, callback_data: FavouritesPageCallback,
+                                           state: FSMContext, session: AsyncSession) -> None:
+    """
+    Показывает соседнюю страницу избранного в том же сообщении.
+
+    :param callback_query: Объект CallbackQuery, содержащий информацию о запросе.
+    :param callback_data: Курсор и номер страницы из нажатой кнопки.
+    :param state: Контекст состояния для хранения данных о пользователе.
+    :param session: Сессия базы данных, открытая для этого обновления.
+    """
+    if not await show_favourites_page(callback_query, state, session, callback_data.page, callback_data.cursor,
+                                      callback_data.backward, edit=True):
+        await callback_query.answer('Ваше избранное пусто!')
+        await callback_query.message.edit_text('Ваше избранное пусто!', reply_markup=main_menu_inline_keyboard())
+        return
+
+    await callback_query.answer()
@@ -1,6 +1,6 @@
 from aiogram import types
 
-from db.db_service import add_or_update_user
+from db.db_service import user_writer
 from keyboards.inline.create_inline_keyboard import main_menu_inline_keyboard
 
 
@@ -36,4 +36,5 @@ async def start_command(message: types.Message) -> None:
         reply_markup=main_menu_inline_keyboard()
     )
 
-    await add_or_update_user(user.id, username, first_name, last_name)
+    # Профиль записывается в базу в фоне, пачкой вместе с другими пользователями
+    user_writer.register(user.id, username, first_name, last_name)
@@ -24,7 +24,8 @@ from handlers.custom_handlers.movie_search import (
     MovieSearchStates
 )
 from handlers.custom_handlers.show_movies_actor import handle_show_movies_actor
-from handlers.custom_handlers.view_favorites import favourites_callback_handler
+from handlers.custom_handlers.view_favorites import favourites_callback_handler, favourites_page_callback_handler
+from keyboards.inline.create_inline_keyboard import FavouritesPageCallback
 
 
 class HandlerRegistry:
@@ -85,8 +86,9 @@ class HandlerRegistry:
                                         MovieSearchStates.waiting_for_movie_limit)
 
     def register_view_favorites_handlers(self):
-        """Регистрирует обработчик для просмотра избранных фильмов."""
+        """Регистрирует обработчики для просмотра избранных фильмов и переключения страниц."""
         self.dp.callback_query.register(favourites_callback_handler, lambda c: c.data == 'favourites')
+        self.dp.callback_query.register(favourites_page_callback_handler, FavouritesPageCallback.filter())
 
     @classmethod
     def register_all_handlers(cls, dp: Dispatcher) -> None:
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from aiogram import types
 from aiogram.filters.callback_data import CallbackData
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
@@ -9,6 +11,38 @@ class DeleteMovieCallback(CallbackData, prefix='delete_movie'):
     movie_id: int
 
 
+class FavouritesPageCallback(CallbackData, prefix='favourites_page'):
+    """
+    Переход на соседнюю страницу избранного.
+
+    Курсор — (create_at, id) последнего фильма показанной страницы при переходе вперёд или первого при
+    переходе назад. В callback_data нельзя использовать двоеточие, поэтому create_at хранится без разделителей.
+    """
+    backward: bool
+    at: str
+    id: int
+    page: int  # Номер страницы, на которую выполняется переход, с 1
+
+    @classmethod
+    def from_cursor(cls, create_at: str, favourite_id: int, page: int, backward: bool) -> 'FavouritesPageCallback':
+        """
+        :param create_at: Время добавления фильма-курсора в формате YYYY-MM-DD HH:MM:SS.
+        :param favourite_id: ID записи избранного фильма-курсора.
+        :param page: Номер страницы, на которую выполняется переход.
+        :param backward: Переход назад.
+        :return: Данные кнопки перехода.
+        """
+        at = ''.join(char for char in create_at if char.isdigit())
+        return cls(backward=backward, at=at, id=favourite_id, page=page)
+
+    @property
+    def cursor(self) -> tuple[str, int]:
+        """Курсор (create_at, id) для запроса страницы."""
+        at = self.at
+        create_at = f'{at[0:4]}-{at[4:6]}-{at[6:8]} {at[8:10]}:{at[10:12]}:{at[12:14]}'
+        return create_at, self.id
+
+
 def main_menu_inline_keyboard() -> types.InlineKeyboardMarkup:
     """
     Создает клавиатуру главного меню с основными функциями.
@@ -60,53 +94,63 @@ def create_limit_search_keyboard() -> InlineKeyboardMarkup:
     return builder.as_markup()  # Возвращаем объект InlineKeyboardMarkup
 
 
-def move_favourites_keyboard(movie_info: dict) -> types.InlineKeyboardMarkup:
+def move_favourites_keyboard(movie_id: int) -> types.InlineKeyboardMarkup:
     """
     Создает клавиатуру с возможностью добавить фильм в избранное.
 
-    :param movie_info: Информация о фильме в виде словаря.
+    :param movie_id: ID фильма на Кинопоиске.
     :return: InlineKeyboardMarkup для добавления фильма в избранное.
     """
     inline_keyboard = types.InlineKeyboardMarkup(inline_keyboard=[
         [
             types.InlineKeyboardButton(text='⭐ Добавить в избранное',
-                                       callback_data=f'add_to_favourites:{str(movie_info['id'])}')
+                                       callback_data=f'add_to_favourites:{movie_id}')
         ],
         # [back_to_main_menu_keyboard()],
     ])
     return inline_keyboard
 
 
-def actor_details_keyboard(actor_info: dict) -> types.InlineKeyboardMarkup:
+def actor_details_keyboard(actor_id: int) -> types.InlineKeyboardMarkup:
     """
     Создает клавиатуру для отображения деталей актера.
 
-    :param actor_info: Информация об актере в виде словаря.
+    :param actor_id: ID актера на Кинопоиске.
     :return: InlineKeyboardMarkup для получения детальной информации об актере.
     """
     inline_keyboard = types.InlineKeyboardMarkup(inline_keyboard=[
         [
             types.InlineKeyboardButton(text='📜 Детальная информация',
-                                       callback_data=f'actor_details:{str(actor_info['id'])}')
+                                       callback_data=f'actor_details:{actor_id}')
         ],
     ])
     return inline_keyboard
 
 
-def viewing_and_deleting_favorites(idx: int) -> types.InlineKeyboardMarkup:
+def viewing_and_deleting_favorites(idx: int, previous_page: Optional[FavouritesPageCallback] = None,
+                                   next_page: Optional[FavouritesPageCallback] = None) -> types.InlineKeyboardMarkup:
     """
     Создает клавиатуру для просмотра и удаления избранных фильмов.
 
     :param idx: Индекс фильма в списке избранных.
-    :return: InlineKeyboardMarkup для удаления фильма из избранного.
-    """
-    inline_keyboard = types.InlineKeyboardMarkup(inline_keyboard=[
+    :param previous_page: Переход на предыдущую страницу, если она есть.
+    :param next_page: Переход на следующую страницу, если она есть.
+    :return: InlineKeyboardMarkup с переключением страниц и удалением фильма из избранного.
+    """
+    pager = []
+    if previous_page is not None:
+        pager.append(types.InlineKeyboardButton(text='⬅️ Назад', callback_data=previous_page.pack()))
+    if next_page is not None:
+        pager.append(types.InlineKeyboardButton(text='Вперёд ➡️', callback_data=next_page.pack()))
+
+    inline_keyboard = types.InlineKeyboardMarkup(inline_keyboard=[row for row in [
+        pager,
         [
             types.InlineKeyboardButton(text='❌ Удалить из избранного',
                                        callback_data=DeleteMovieCallback(movie_id=str(idx)).pack())
         ],
         [back_to_main_menu_keyboard()],
-    ])
+    ] if row])
     return inline_keyboard
 
 
@@ -138,3 +182,40 @@ def clear_all_favorites_keyboard() -> types.InlineKeyboardMarkup:
         ]
     ])
     return inline_keyboard
+
+
+def numbered_results_keyboard(action: str, item_ids: list[int], text: str) -> types.InlineKeyboardMarkup:
+    """
+    Создает клавиатуру с номерами результатов поиска, отправленных альбомом.
+
+    Кнопка с номером N относится к результату N в подписях альбома. В callback_data
+    после ID добавляется номер, по нему обработчики отличают кнопки этой клавиатуры.
+
+    :param action: Префикс callback_data (например, 'add_to_favourites' или 'actor_details').
+    :param item_ids: ID результатов на Кинопоиске в порядке нумерации.
+    :param text: Значок перед номером на кнопке.
+    :return: InlineKeyboardMarkup с номерами результатов и кнопкой главного меню.
+    """
+    builder = InlineKeyboardBuilder()
+    for number, item_id in enumerate(item_ids, start=1):
+        builder.button(text=f'{text} {number}', callback_data=f'{action}:{item_id}:{number}')
+
+    # Не больше 5 номеров в строке
+    builder.adjust(5)
+    builder.row(back_to_main_menu_keyboard())
+    return builder.as_markup()
+
+
+def without_button(markup: types.InlineKeyboardMarkup, callback_data: str) -> types.InlineKeyboardMarkup:
+    """
+    Возвращает копию клавиатуры без кнопки с указанной callback_data.
+
+    :param markup: Исходная клавиатура.
+    :param callback_data: callback_data кнопки, которую нужно убрать.
+    :return: InlineKeyboardMarkup без этой кнопки (пустые строки тоже убираются).
+    """
+    rows = [
+        [button for button in row if button.callback_data != callback_data]
+        for row in markup.inline_keyboard
+    ]
+    return types.InlineKeyboardMarkup(inline_keyboard=[row for row in rows if row])
@@ -1,3 +1,12 @@
+from . import models
+from . import cache
+from . import quota
+from . import key_pool
+from . import resilience
+from . import client
+from . import scheduler
+from . import persistent_cache
+from . import fetch
 from . import actor_id_API
 from . import actor_name_API
 from . import movie_API
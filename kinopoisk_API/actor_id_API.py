@@ -1,31 +1,43 @@
-import aiohttp
-
 from config_data import config
+from kinopoisk_API.client import kinopoisk_client
+from kinopoisk_API.fetch import fetch_cached
+from kinopoisk_API.models import PersonCard
+from kinopoisk_API.quota import PRIORITY_DETAIL
+
+
+async def _fetch_actor_info(actor_id: int) -> dict | None:
+    """
+    Запрашивает у API только те поля персоны, которые показывает бот.
+
+    Запрос по ID (person/{id}) не поддерживает выбор полей и отдаёт всю запись,
+    поэтому используется универсальный поиск person с фильтром по id и selectFields.
+
+    :param actor_id: Идентификатор актёра на Кинопоиске.
+    :return: Документ персоны или None, если он не найден или запрос не удался.
+    """
+    params = [('id', actor_id), ('page', 1), ('limit', 1)]
+    params += [('selectFields', field) for field in PersonCard.DETAIL_FIELDS]
+
+    # Детальная информация запрошена пользователем явно, поэтому идёт раньше поисковых запросов
+    search_results = await kinopoisk_client.get_json(config.KINOPOISK_PERSON_URL.rstrip('/'), params=params,
+                                                     priority=PRIORITY_DETAIL)
+    if not search_results or not search_results.get('docs'):
+        return None
+    return search_results['docs'][0]
 
 
-async def get_actor_info(actor_id: int) -> dict | None:
+async def get_actor_info(actor_id: int) -> PersonCard | None:
     """
     Асинхронная функция для получения информации об актёре с использованием API Кинопоиска.
+    Повторные запросы одного и того же актёра отдаются из кэша.
 
     :param actor_id: Идентификатор актёра на Кинопоиске.
-    :return: Словарь с информацией об актёре, если запрос успешен, или None в случае ошибки.
+    :return: Карточка актёра, если запрос успешен, или None в случае ошибки.
     """
-    # Формируем URL для запроса к API Кинопоиска
-    actor_info_url = f'{config.KINOPOISK_PERSON_URL}{actor_id}'
-
-    # Заголовки, необходимые для аутентификации или идентификации в API
-    request_headers = config.headers
-
-    # Открываем асинхронную сессию для выполнения HTTP-запроса
-    async with aiohttp.ClientSession() as session:
-        # Отправляем GET-запрос с заголовками
-        async with session.get(actor_info_url, headers=request_headers) as response:
-            # Проверяем успешность запроса
-            if response.status == 200:
-                # Возвращаем данные в виде словаря
-                actor_data = await response.json()
-                return actor_data
-            else:
-                # Выводим сообщение об ошибке, если запрос не успешен
-                print(f'Ошибка: {response.status}')
-                return None
+    # Выполняем запрос через кэш и общий пул соединений
+    actor_info = await fetch_cached(
+        ('person', int(actor_id)),
+        lambda _: _fetch_actor_info(actor_id),
+        ttl=config.KINOPOISK_PERSON_TTL
+    )
+    return PersonCard.from_api(actor_info) if actor_info else None
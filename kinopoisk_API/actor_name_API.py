@@ -1,31 +1,45 @@
-import aiohttp
-
 from config_data import config
+from kinopoisk_API.cache import normalize_query
+from kinopoisk_API.client import kinopoisk_client
+from kinopoisk_API.fetch import fetch_cached
+from kinopoisk_API.models import PersonCard, project_search
+from kinopoisk_API.name_matcher import person_names
 
 
-async def search_actor_api(actor_name: str, limit: int) -> dict | None:
+async def _fetch_actors(actor_name: str, limit: int) -> dict | None:
     """
-    Асинхронная функция для поиска актёров по имени через API Кинопоиска.
+    Выполняет поиск персон и оставляет в ответе только поля, которые показывает бот.
 
     :param actor_name: Имя или часть имени актёра для поиска.
-    :param limit: Лимит на количество результатов, которые должны быть возвращены.
-    :return: Словарь с результатами поиска актёров или None в случае ошибки.
+    :param limit: Лимит на количество результатов.
+    :return: Сокращённый ответ API или None в случае ошибки.
     """
-    # Формируем URL для поиска с учётом лимита и запроса имени актёра
-    search_url = f'{config.KINOPOISK_PERSON_URL}search?page=1&limit={limit}&query={actor_name}'
+    # Формируем URL и параметры поиска с учётом лимита и запроса имени актёра
+    search_url = f'{config.KINOPOISK_PERSON_URL}search'
+    params = {'page': 1, 'limit': limit, 'query': actor_name}
+
+    search_results = await kinopoisk_client.get_json(search_url, params=params)
+    return project_search(search_results, PersonCard.SEARCH_FIELDS) if search_results else None
+
 
-    # Заголовки для запроса, которые могут включать токены и ключи API
-    request_headers = config.headers
+async def search_actor_api(actor_name: str, limit: int) -> list[PersonCard] | None:
+    """
+    Асинхронная функция для поиска актёров по имени через API Кинопоиска.
+    Повторные запросы отдаются из кэша, в том числе из результата с большим лимитом.
 
-    # Открываем асинхронную сессию для выполнения HTTP-запроса
-    async with aiohttp.ClientSession() as session:
-        # Выполняем GET-запрос с переданными заголовками
-        async with session.get(search_url, headers=request_headers) as response:
-            # Если запрос успешен (статус 200), возвращаем результат поиска в виде словаря
-            if response.status == 200:
-                search_results = await response.json()
-                return search_results
-            else:
-                # В случае ошибки выводим статус и возвращаем None
-                print(f'Ошибка: {response.status}')
-                return None
+    :param actor_name: Имя или часть имени актёра для поиска.
+    :param limit: Лимит на количество результатов, которые должны быть возвращены.
+    :return: Список карточек найденных актёров или None в случае ошибки.
+    """
+    # Выполняем запрос через кэш и общий пул соединений
+    search_results = await fetch_cached(
+        ('person_search', normalize_query(actor_name)),
+        lambda search_limit: _fetch_actors(actor_name, search_limit),
+        ttl=config.KINOPOISK_PERSON_SEARCH_TTL,
+        limit=limit
+    )
+    if search_results is None:
+        return None
+    # Имена найденных персон участвуют в исправлении опечаток следующих запросов
+    person_names.add(name for doc in search_results['docs'] for name in (doc.get('name'), doc.get('enName')))
+    return [PersonCard.from_api(doc) for doc in search_results['docs']]
@@ -0,0 +1,194 @@
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+from config_data import config
+from utils import metrics
+
+
+def normalize_query(query: str) -> str:
+    """
+    Приводит поисковый запрос к единому виду для ключа кэша:
+    нижний регистр, «ё» как «е», одиночные пробелы.
+
+    :param query: Исходный запрос пользователя.
+    :return: Нормализованная строка запроса.
+    """
+    return ' '.join(query.casefold().replace('ё', 'е').split())
+
+
+def estimate_size(value: Any) -> int:
+    """
+    Оценивает объём значения в байтах по размеру его JSON-представления.
+
+    :param value: Значение для оценки.
+    :return: Примерный размер в байтах.
+    """
+    return len(json.dumps(value, ensure_ascii=False).encode())
+
+
+def covers_limit(cached_limit: int, payload: dict, limit: int) -> bool:
+    """
+    Проверяет, можно ли ответить на поиск с лимитом limit результатом, полученным с лимитом cached_limit.
+
+    Подходит результат с не меньшим лимитом или полный результат, в котором документов
+    меньше, чем позволял его лимит.
+
+    :param cached_limit: Лимит сохранённого результата.
+    :param payload: Сохранённый ответ API.
+    :param limit: Запрошенный лимит.
+    """
+    return cached_limit >= limit or len(payload.get('docs') or []) < cached_limit
+
+
+def slice_search(payload: dict, limit: int) -> dict:
+    """
+    Возвращает копию результата поиска с первыми limit документами.
+
+    :param payload: Ответ API на поиск.
+    :param limit: Запрошенное количество результатов.
+    """
+    return {**payload, 'docs': (payload.get('docs') or [])[:limit], 'limit': limit}
+
+
+class TTLCache:
+    """
+    LRU-кэш с ограничением по памяти и временем жизни для каждой записи.
+
+    Записи с истёкшим TTL удаляются при обращении, а при превышении лимита памяти
+    вытесняются давно не использовавшиеся записи.
+    """
+
+    def __init__(self, name: str, max_bytes: int):
+        """
+        :param name: Имя кэша, используется как префикс метрик.
+        :param max_bytes: Максимальный суммарный размер записей в байтах.
+        """
+        self.name = name
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # key -> (expires_at, size, value)
+        self._data: OrderedDict[Hashable, tuple[float, int, Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _lookup(self, key: Hashable) -> Any | None:
+        """Возвращает живую запись без учёта попаданий и промахов."""
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, size, value = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def _remove(self, key: Hashable) -> None:
+        _, size, _ = self._data.pop(key)
+        self.current_bytes -= size
+
+    def _record(self, hit: bool) -> None:
+        if hit:
+            self.hits += 1
+            metrics.inc(f'{self.name}.hits')
+        else:
+            self.misses += 1
+            metrics.inc(f'{self.name}.misses')
+
+    def get(self, key: Hashable) -> Any | None:
+        """
+        Возвращает значение по ключу или None, если его нет или срок жизни истёк.
+
+        :param key: Ключ записи.
+        """
+        value = self._lookup(key)
+        self._record(value is not None)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float, size: int | None = None) -> None:
+        """
+        Сохраняет значение и вытесняет старые записи, если превышен лимит памяти.
+
+        :param key: Ключ записи.
+        :param value: Сохраняемое значение.
+        :param ttl: Время жизни записи в секундах.
+        :param size: Размер значения в байтах; если не указан, оценивается автоматически.
+        """
+        if size is None:
+            size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+
+        if key in self._data:
+            self._remove(key)
+        self._data[key] = (time.monotonic() + ttl, size, value)
+        self.current_bytes += size
+
+        while self.current_bytes > self.max_bytes:
+            oldest_key = next(iter(self._data))
+            self._remove(oldest_key)
+            self.evictions += 1
+            metrics.inc(f'{self.name}.evictions')
+
+    def get_search(self, key: Hashable, limit: int) -> dict | None:
+        """
+        Возвращает результат поиска для указанного лимита.
+
+        Если в кэше лежит результат с большим лимитом (или полный результат, в котором
+        документов меньше запрошенного лимита), из него отдаются первые limit документов.
+
+        :param key: Ключ поиска (эндпоинт и нормализованный запрос).
+        :param limit: Запрошенное количество результатов.
+        :return: Ответ API в виде словаря или None, если подходящего результата нет.
+        """
+        entry = self._lookup(key)
+        if entry is None:
+            self._record(False)
+            return None
+
+        cached_limit, payload = entry
+        if not covers_limit(cached_limit, payload, limit):
+            # В кэше меньше результатов, чем просят, и выдача при этом не полная
+            self._record(False)
+            return None
+
+        self._record(True)
+        return slice_search(payload, limit)
+
+    def set_search(self, key: Hashable, limit: int, payload: dict, ttl: float) -> None:
+        """
+        Сохраняет результат поиска, не заменяя более полный результат с большим лимитом.
+
+        :param key: Ключ поиска (эндпоинт и нормализованный запрос).
+        :param limit: Лимит, с которым выполнялся запрос.
+        :param payload: Ответ API.
+        :param ttl: Время жизни записи в секундах.
+        """
+        existing = self._lookup(key)
+        if existing is not None and existing[0] >= limit:
+            return
+        self.set(key, (limit, payload), ttl, size=estimate_size(payload))
+
+    def stats(self) -> dict:
+        """
+        Возвращает статистику работы кэша.
+
+        :return: Словарь с количеством записей, объёмом, попаданиями, промахами и вытеснениями.
+        """
+        return {
+            'entries': len(self._data),
+            'bytes': self.current_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+
+# Общий кэш ответов API Кинопоиска для всех модулей kinopoisk_API
+response_cache = TTLCache('kinopoisk_cache', config.KINOPOISK_CACHE_MAX_BYTES)
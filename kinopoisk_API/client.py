@@ -0,0 +1,183 @@
+import asyncio
+
+import aiohttp
+
+from config_data import config
+from kinopoisk_API.key_pool import key_pool
+from kinopoisk_API.quota import PRIORITY_SEARCH
+from kinopoisk_API.resilience import STATE_HALF_OPEN, CircuitOpen, backoff_delay, circuit_breaker
+from kinopoisk_API.scheduler import request_scheduler
+from utils import metrics
+
+# Ответы, после которых ключ выводится из ротации, а запрос сразу повторяется с другим ключом
+KEY_FAILOVER_STATUSES = (401, 403)
+
+# Ответы, после которых запрос повторяется с задержкой (кроме 5xx)
+RETRY_STATUSES = (408, 429)
+
+
+def _retry_after(response: aiohttp.ClientResponse) -> float | None:
+    """
+    Возвращает задержку из заголовка Retry-After в секундах.
+
+    :param response: Ответ API.
+    :return: Задержка или None, если заголовка нет или он не число.
+    """
+    try:
+        return max(0.0, float(response.headers['Retry-After']))
+    except (KeyError, ValueError):
+        return None
+
+
+class KinopoiskClient:
+    """
+    Долгоживущий HTTP-клиент для API Кинопоиска.
+
+    Держит одну aiohttp.ClientSession с пулом keep-alive соединений, поэтому запросы
+    переиспользуют уже открытые TCP+TLS соединения вместо нового рукопожатия на каждый поиск.
+    Сессия создаётся в main() при старте бота и закрывается при его остановке.
+    """
+
+    def __init__(self,
+                 pool_limit: int = config.KINOPOISK_POOL_LIMIT,
+                 pool_limit_per_host: int = config.KINOPOISK_POOL_LIMIT_PER_HOST,
+                 dns_cache_ttl: int = config.KINOPOISK_DNS_CACHE_TTL,
+                 keepalive_timeout: float = config.KINOPOISK_KEEPALIVE_TIMEOUT,
+                 connect_timeout: float = config.KINOPOISK_CONNECT_TIMEOUT,
+                 read_timeout: float = config.KINOPOISK_READ_TIMEOUT,
+                 total_timeout: float = config.KINOPOISK_TOTAL_TIMEOUT,
+                 deadline: float = config.KINOPOISK_DEADLINE,
+                 max_retries: int = config.KINOPOISK_MAX_RETRIES):
+        """
+        Инициализация клиента. Сама сессия открывается позже, в start().
+
+        :param pool_limit: Максимальное количество соединений в пуле.
+        :param pool_limit_per_host: Максимальное количество соединений к одному хосту.
+        :param dns_cache_ttl: Время жизни записей DNS-кэша в секундах.
+        :param keepalive_timeout: Сколько секунд держать простаивающее соединение открытым.
+        :param connect_timeout: Таймаут установки соединения в секундах.
+        :param read_timeout: Таймаут чтения ответа в секундах.
+        :param total_timeout: Общий таймаут одной попытки запроса в секундах.
+        :param deadline: Дедлайн всего вызова с ожиданием в очереди и повторами, в секундах.
+        :param max_retries: Максимальное количество повторов после временной ошибки.
+        """
+        self.pool_limit = pool_limit
+        self.pool_limit_per_host = pool_limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = aiohttp.ClientTimeout(total=total_timeout, connect=connect_timeout, sock_read=read_timeout)
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self._session: aiohttp.ClientSession | None = None
+
+    async def start(self) -> None:
+        """Открывает сессию с пулом соединений, если она ещё не открыта."""
+        if self._session is not None and not self._session.closed:
+            return
+
+        connector = aiohttp.TCPConnector(
+            limit=self.pool_limit,
+            limit_per_host=self.pool_limit_per_host,
+            ttl_dns_cache=self.dns_cache_ttl,
+            keepalive_timeout=self.keepalive_timeout,
+            enable_cleanup_closed=True
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=self.timeout,
+            headers={'accept': 'application/json'}
+        )
+
+    async def close(self) -> None:
+        """Закрывает сессию и все соединения пула."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def get_json(self, url: str, params: dict | list | None = None,
+                       priority: int = PRIORITY_SEARCH) -> dict | None:
+        """
+        Выполняет GET-запрос к API Кинопоиска через общий пул соединений.
+
+        Запрос ждёт своей очереди в планировщике с учётом приоритета и лимитов API
+        и выполняется с выданным планировщиком ключом. Если ключ отклонён (401/403),
+        запрос повторяется с другим ключом пула. Ошибки сети, 5xx и 429 повторяются
+        с экспоненциальной задержкой (или по Retry-After). Весь вызов вместе с повторами
+        ограничен дедлайном, а при серии ошибок выключатель отклоняет запросы сразу.
+
+        :param url: Адрес запроса.
+        :param params: Параметры строки запроса: словарь или список пар для повторяющихся параметров.
+        :param priority: Приоритет запроса в планировщике.
+        :return: Ответ API в виде словаря или None в случае ошибки.
+        :raises QuotaExhausted: Если ни у одного ключа не осталось квоты на запрос.
+        :raises CircuitOpen: Если выключатель разомкнут и API считается недоступным.
+        """
+        # Подстраховка на случай вызова до main(), например из скриптов
+        await self.start()
+
+        if not circuit_breaker.allow():
+            raise CircuitOpen('API Кинопоиска временно недоступно')
+        probe = circuit_breaker.state == STATE_HALF_OPEN
+
+        try:
+            async with asyncio.timeout(self.deadline):
+                return await self._get_with_retries(url, params, priority)
+        except TimeoutError:
+            circuit_breaker.record_failure()
+            metrics.inc('kinopoisk_client.deadline_exceeded')
+            print(f'Ошибка: запрос к API Кинопоиска не уложился в {self.deadline} с')
+            return None
+        finally:
+            # Пробный запрос, завершившийся без ответа API (QuotaExhausted, отмена), не должен занимать место навсегда
+            if probe:
+                circuit_breaker.release_probe()
+
+    async def _get_with_retries(self, url: str, params: dict | list | None, priority: int) -> dict | None:
+        """Выполняет запрос с переключением ключей и повторами, без учёта дедлайна."""
+        key_failovers = 0
+        attempt = 0
+
+        while True:
+            api_key = await request_scheduler.acquire(priority)
+            retry_after = None
+
+            try:
+                async with self._session.get(url, params=params, headers={'X-API-KEY': api_key.value}) as response:
+                    status = response.status
+                    retry_after = _retry_after(response)
+                    key_pool.report(api_key, status, retry_after)
+                    if status == 200:
+                        payload = await response.json()
+                        circuit_breaker.record_success()
+                        return payload
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                print(f'Ошибка запроса к API Кинопоиска: {e!r}')
+                status = None
+
+            if status is None or status >= 500:
+                circuit_breaker.record_failure()
+            else:
+                # API ответило, значит оно доступно, даже если запрос отклонён
+                circuit_breaker.record_success()
+
+            if status in KEY_FAILOVER_STATUSES:
+                # Проблема с ключом: сразу пробуем другой ключ пула
+                key_failovers += 1
+                if key_failovers < len(key_pool):
+                    continue
+            elif status is None or status in RETRY_STATUSES or status >= 500:
+                attempt += 1
+                if attempt <= self.max_retries and circuit_breaker.allow():
+                    metrics.inc('kinopoisk_client.retries')
+                    if status != 429:
+                        # После 429 паузу выдерживает планировщик: ключ уходит на Retry-After
+                        await asyncio.sleep(retry_after if retry_after is not None else backoff_delay(attempt))
+                    continue
+
+            # Выводим сообщение об ошибке, если запрос не успешен
+            print(f'Ошибка: {status}')
+            return None
+
+
+# Общий клиент для всех модулей kinopoisk_API, жизненным циклом управляет main()
+kinopoisk_client = KinopoiskClient()
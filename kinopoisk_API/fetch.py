@@ -0,0 +1,87 @@
+from typing import Awaitable, Callable
+
+from kinopoisk_API.cache import covers_limit, response_cache, slice_search
+from kinopoisk_API.persistent_cache import persistent_cache
+from kinopoisk_API.quota import QuotaExhausted
+from kinopoisk_API.resilience import CircuitOpen
+from kinopoisk_API.single_flight import SingleFlight
+from utils import metrics
+
+# Запрос к API: получает лимит поиска (None для запросов без лимита) и возвращает ответ
+Fetcher = Callable[[int | None], Awaitable[dict | None]]
+
+# Объединение одновременных одинаковых запросов к кэшу в базе и к API
+single_flight = SingleFlight('kinopoisk_single_flight')
+
+
+def _remember(key: tuple, payload: dict, ttl: float, limit: int | None) -> None:
+    """Кладёт ответ в кэш в памяти: поиск — вместе с лимитом, остальное — как есть."""
+    if limit is None:
+        response_cache.set(key, payload, ttl=ttl)
+    else:
+        response_cache.set_search(key, limit, payload, ttl=ttl)
+
+
+async def _fetch_and_store(key: tuple, fetch: Fetcher, ttl: float, limit: int | None) -> dict | None:
+    """Запрашивает данные у API и сохраняет успешный ответ в оба уровня кэша."""
+    payload = await fetch(limit)
+    if payload is not None:
+        _remember(key, payload, ttl, limit)
+        persistent_cache.set_later(key, payload, limit)
+    return payload
+
+
+async def fetch_cached(key: tuple, fetch: Fetcher, ttl: float, limit: int | None = None) -> dict | None:
+    """
+    Возвращает ответ API Кинопоиска, по возможности не обращаясь к API.
+
+    Порядок поиска: кэш в памяти, затем постоянный кэш в базе, затем само API.
+    Одновременные одинаковые запросы мимо кэша в памяти объединяются в один.
+    Свежая запись из базы поднимается в память. Устаревшая запись отдаётся сразу,
+    а в фоне запускается её обновление (stale-while-revalidate). Если квота API
+    на исходе или API недоступно, отдаётся любая сохранённая запись.
+
+    :param key: Ключ кэша, например ('person', 123) или ('movie_search', 'матрица').
+    :param fetch: Функция, выполняющая запрос к API с переданным ей лимитом.
+    :param ttl: Время, в течение которого ответ считается свежим, в секундах.
+    :param limit: Лимит поиска; для запросов без лимита — None.
+    :return: Ответ API в виде словаря или None в случае ошибки.
+    """
+    cached = response_cache.get(key) if limit is None else response_cache.get_search(key, limit)
+    if cached is not None:
+        return cached
+
+    # Одновременные запросы с тем же ключом и лимитом ждут один общий запрос
+    return await single_flight.do((key, limit), lambda: _load(key, fetch, ttl, limit))
+
+
+async def _load(key: tuple, fetch: Fetcher, ttl: float, limit: int | None) -> dict | None:
+    """Ищет ответ в постоянном кэше, а при его отсутствии запрашивает API."""
+    stored = await persistent_cache.get(key)
+    if stored is not None:
+        payload, stored_limit, age = stored
+        if limit is None or covers_limit(stored_limit, payload, limit):
+            if age < ttl:
+                _remember(key, payload, ttl - age, stored_limit)
+            else:
+                # Обновляем с лимитом сохранённой записи, чтобы не заменить её результатом поменьше
+                refresh_limit = None if limit is None else max(limit, stored_limit or limit)
+                persistent_cache.schedule_refresh(key, lambda: _fetch_and_store(key, fetch, ttl, refresh_limit))
+            return payload if limit is None else slice_search(payload, limit)
+
+    try:
+        return await _fetch_and_store(key, fetch, ttl, limit)
+    except (QuotaExhausted, CircuitOpen) as e:
+        # Квота почти израсходована или API недоступно: отвечаем тем, что есть в кэше, вместо ошибки
+        metrics.inc('kinopoisk_fetch.degraded')
+        print(f'API Кинопоиска недоступно ({e}), ответ только из кэша')
+        return await _cached_only(key, limit)
+
+
+async def _cached_only(key: tuple, limit: int | None) -> dict | None:
+    """Возвращает любую сохранённую запись независимо от возраста и лимита поиска."""
+    stored = await persistent_cache.get(key, max_age=float('inf'))
+    if stored is None:
+        return None
+    payload = stored[0]
+    return payload if limit is None else slice_search(payload, limit)
@@ -0,0 +1,178 @@
+import hashlib
+import time
+
+from config_data import config
+from kinopoisk_API.quota import DailyQuota
+from utils import metrics
+from utils.token_bucket import TokenBucket
+
+
+class ApiKey:
+    """
+    API-ключ Кинопоиска со своими ограничениями частоты и суточной квотой.
+    """
+
+    def __init__(self, value: str, weight: float = 1.0):
+        """
+        :param value: Значение ключа для заголовка X-API-KEY.
+        :param weight: Вес ключа: во сколько раз его частота и квота больше базовых из настроек.
+        """
+        self.value = value
+        self.weight = weight
+        # В базе и метриках ключ виден только по короткому хэшу
+        self.name = f'key-{hashlib.sha1(value.encode()).hexdigest()[:8]}'
+        # Если бот работает в нескольких воркерах, каждый получает свою долю частоты и квоты ключа
+        # и ведёт свой счётчик квоты
+        share = weight / config.SHARD_COUNT
+        if config.SHARD_COUNT > 1:
+            self.name = f'{self.name}-w{config.SHARD_INDEX}'
+        self.bucket = TokenBucket(config.KINOPOISK_RATE_LIMIT * share, max(1.0, config.KINOPOISK_RATE_BURST * share))
+        self.quota = DailyQuota(self.name, int(config.KINOPOISK_DAILY_QUOTA * share),
+                                int(config.KINOPOISK_QUOTA_RESERVE * share))
+        self.disabled = False  # Ключ отклонён API (401) и выведен из ротации до перезапуска
+        self.cooldown_until = 0.0  # До какого момента ключ не используется после 429
+        self.requests = 0
+        self.failures = 0
+
+    @classmethod
+    def parse(cls, spec: str) -> 'ApiKey':
+        """
+        Создаёт ключ из строки настроек вида 'ключ' или 'ключ:вес'.
+
+        :param spec: Строка с ключом и необязательным весом.
+        """
+        value, _, weight = spec.partition(':')
+        return cls(value, float(weight) if weight else 1.0)
+
+    def available(self, priority: int) -> bool:
+        """
+        Проверяет, можно ли использовать ключ для запроса с указанным приоритетом.
+
+        :param priority: Приоритет запроса.
+        """
+        return not self.disabled and time.monotonic() >= self.cooldown_until and self.quota.allows(priority)
+
+    @property
+    def load(self) -> float:
+        """Использованная сегодня квота с учётом веса: чем меньше, тем охотнее выбирается ключ."""
+        return self.quota.used / self.weight
+
+
+class KeyPool:
+    """
+    Пул API-ключей Кинопоиска с балансировкой нагрузки.
+
+    Для каждого запроса выбирается наименее загруженный с учётом веса ключ, у которого
+    есть свободный токен и квота. Ключи, получившие 401/403/429, выводятся из ротации,
+    и запросы уходят на оставшиеся.
+    """
+
+    def __init__(self, keys: list[ApiKey]):
+        """
+        :param keys: Ключи пула.
+        """
+        self.keys = keys
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    async def load(self) -> None:
+        """Загружает сохранённые суточные счётчики всех ключей."""
+        for key in self.keys:
+            await key.quota.load()
+
+    def allows(self, priority: int) -> bool:
+        """
+        Проверяет, есть ли ключ, который сможет выполнить запрос с этим приоритетом.
+
+        :param priority: Приоритет запроса.
+        """
+        return any(not key.disabled and key.quota.allows(priority) for key in self.keys)
+
+    def take(self, priority: int) -> ApiKey | None:
+        """
+        Выбирает наименее загруженный доступный ключ со свободным токеном и учитывает запрос.
+
+        :param priority: Приоритет запроса.
+        :return: Ключ или None, если сейчас ни у одного ключа нет свободного токена.
+        """
+        candidates = [key for key in self.keys if key.available(priority) and key.bucket.delay() == 0]
+        if not candidates:
+            return None
+
+        key = min(candidates, key=lambda k: k.load)
+        key.bucket.try_acquire()
+        key.quota.consume()
+        key.requests += 1
+        metrics.inc(f'kinopoisk_keys.{key.name}.requests')
+        return key
+
+    def delay(self, priority: int) -> float:
+        """
+        Возвращает, через сколько секунд освободится токен у какого-либо ключа.
+
+        :param priority: Приоритет запроса.
+        """
+        now = time.monotonic()
+        delays = [
+            max(key.bucket.delay(), key.cooldown_until - now)
+            for key in self.keys if not key.disabled and key.quota.allows(priority)
+        ]
+        return max(min(delays, default=1.0), 0.01)
+
+    def report(self, key: ApiKey, status: int, retry_after: float | None = None) -> None:
+        """
+        Учитывает ответ API для ключа и выводит ключ из ротации при отказе.
+
+        :param key: Использованный ключ.
+        :param status: HTTP-статус ответа.
+        :param retry_after: Значение заголовка Retry-After в секундах, если он был.
+        """
+        if status < 400:
+            key.failures = 0
+            return
+
+        key.failures += 1
+        metrics.inc(f'kinopoisk_keys.{key.name}.status_{status}')
+        if status == 401:
+            # Ключ недействителен: исключаем его до перезапуска
+            key.disabled = True
+            print(f'API-ключ {key.name} отклонён (401) и исключён из ротации')
+        elif status == 403:
+            # Кинопоиск отвечает 403, когда суточный лимит ключа израсходован
+            key.quota.exhaust()
+            print(f'API-ключ {key.name} исчерпал суточный лимит (403)')
+        elif status == 429:
+            # Превышена частота запросов: ключ отдыхает, остальные продолжают работать
+            cooldown = retry_after if retry_after is not None else config.KINOPOISK_KEY_COOLDOWN
+            key.cooldown_until = time.monotonic() + cooldown
+
+    async def flush(self) -> None:
+        """Сохраняет суточные счётчики всех ключей."""
+        for key in self.keys:
+            await key.quota.flush()
+
+    def stats(self) -> list[dict]:
+        """
+        Возвращает состояние каждого ключа пула.
+
+        :return: Список словарей с именем, весом, состоянием и использованием квоты ключа.
+        """
+        now = time.monotonic()
+        return [
+            {
+                'name': key.name,
+                'weight': key.weight,
+                'disabled': key.disabled,
+                'cooling_down': key.cooldown_until > now,
+                'used_today': key.quota.used,
+                'remaining_today': key.quota.remaining,
+                'requests': key.requests,
+                'failures': key.failures,
+            }
+            for key in self.keys
+        ]
+
+
+# Общий пул ключей для всех запросов к API Кинопоиска
+key_pool = KeyPool([ApiKey.parse(spec) for spec in config.KINO_POISK_API_KEYS])
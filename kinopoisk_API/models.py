@@ -0,0 +1,171 @@
+from dataclasses import dataclass
+from typing import ClassVar
+
+
+def _names(items: list | None, field: str = 'name') -> tuple[str, ...]:
+    """Достаёт значения поля из списка словарей API, пропуская пустые."""
+    return tuple(item[field] for item in items or () if item.get(field))
+
+
+@dataclass(slots=True, frozen=True)
+class MovieCard:
+    """
+    Компактная карточка фильма из результатов поиска.
+    """
+    # Поля документа API, которые нужны обработчикам
+    API_FIELDS: ClassVar[tuple[str, ...]] = (
+        'id', 'name', 'enName', 'alternativeName', 'year', 'description', 'genres', 'countries', 'rating', 'poster'
+    )
+
+    id: int
+    name: str | None
+    en_name: str | None
+    alternative_name: str | None
+    year: int | None
+    description: str | None
+    genres: tuple[str, ...]
+    countries: tuple[str, ...]
+    rating_kp: float | None
+    rating_imdb: float | None
+    rating_film_critics: float | None
+    rating_russian_film_critics: float | None
+    poster_url: str | None
+
+    @classmethod
+    def from_api(cls, doc: dict) -> 'MovieCard':
+        """
+        Создаёт карточку из документа API Кинопоиска.
+
+        :param doc: Документ фильма из ответа API.
+        """
+        rating = doc.get('rating') or {}
+        poster = doc.get('poster') or {}
+        return cls(
+            id=doc['id'],
+            name=doc.get('name'),
+            en_name=doc.get('enName'),
+            alternative_name=doc.get('alternativeName'),
+            year=doc.get('year'),
+            description=doc.get('description'),
+            genres=_names(doc.get('genres')),
+            countries=_names(doc.get('countries')),
+            rating_kp=rating.get('kp'),
+            rating_imdb=rating.get('imdb'),
+            rating_film_critics=rating.get('filmCritics'),
+            rating_russian_film_critics=rating.get('russianFilmCritics'),
+            poster_url=poster.get('url'),
+        )
+
+
+@dataclass(slots=True, frozen=True)
+class PersonFilmographyEntry:
+    """
+    Фильм из фильмографии персоны.
+    """
+    id: int | None
+    name: str | None
+    rating: float | None
+
+    @classmethod
+    def from_api(cls, doc: dict) -> 'PersonFilmographyEntry':
+        """
+        Создаёт запись фильмографии из элемента поля movies ответа API.
+
+        :param doc: Элемент фильмографии из ответа API.
+        """
+        return cls(id=doc.get('id'), name=doc.get('name'), rating=doc.get('rating'))
+
+
+@dataclass(slots=True, frozen=True)
+class Spouse:
+    """
+    Супруг(а) персоны.
+    """
+    relation: str | None
+    divorced: bool
+    children: int | None
+
+
+@dataclass(slots=True, frozen=True)
+class PersonCard:
+    """
+    Компактная карточка персоны.
+
+    Для результатов поиска заполнены только основные поля, детальные поля
+    (места рождения, супруги, факты, фильмография) приходят из запроса по ID.
+    """
+    # Поля персоны для результатов поиска
+    SEARCH_FIELDS: ClassVar[tuple[str, ...]] = (
+        'id', 'name', 'enName', 'photo', 'sex', 'growth', 'birthday', 'age'
+    )
+    # Поля персоны для детальной информации
+    DETAIL_FIELDS: ClassVar[tuple[str, ...]] = SEARCH_FIELDS + (
+        'death', 'birthPlace', 'spouses', 'countAwards', 'facts', 'movies'
+    )
+
+    id: int
+    name: str | None
+    en_name: str | None
+    photo: str | None
+    sex: str | None
+    growth: int | None
+    birthday: str | None
+    age: int | None
+    death: str | None = None
+    birth_places: tuple[str, ...] = ()
+    spouses: tuple[Spouse, ...] = ()
+    count_awards: int | None = None
+    facts: tuple[str, ...] = ()
+    movies: tuple[PersonFilmographyEntry, ...] = ()
+
+    @classmethod
+    def from_api(cls, doc: dict) -> 'PersonCard':
+        """
+        Создаёт карточку из документа персоны API Кинопоиска.
+
+        :param doc: Документ персоны из ответа API.
+        """
+        return cls(
+            id=doc['id'],
+            name=doc.get('name'),
+            en_name=doc.get('enName'),
+            photo=doc.get('photo'),
+            sex=doc.get('sex'),
+            growth=doc.get('growth'),
+            birthday=doc.get('birthday'),
+            age=doc.get('age'),
+            death=doc.get('death'),
+            birth_places=_names(doc.get('birthPlace'), 'value'),
+            spouses=tuple(
+                Spouse(relation=spouse.get('relation'), divorced=bool(spouse.get('divorced')),
+                       children=spouse.get('children'))
+                for spouse in doc.get('spouses') or ()
+            ),
+            count_awards=doc.get('countAwards'),
+            facts=_names(doc.get('facts'), 'value'),
+            movies=tuple(PersonFilmographyEntry.from_api(movie) for movie in doc.get('movies') or ()),
+        )
+
+
+def project(doc: dict, fields: tuple[str, ...]) -> dict:
+    """
+    Оставляет в документе API только нужные поля, чтобы не хранить в кэше лишнее.
+
+    :param doc: Документ из ответа API.
+    :param fields: Поля, которые нужно оставить.
+    """
+    return {field: doc[field] for field in fields if field in doc}
+
+
+def project_search(payload: dict, fields: tuple[str, ...]) -> dict:
+    """
+    Оставляет в ответе поиска только нужные поля документов и сведения о выдаче.
+
+    :param payload: Ответ API на поиск.
+    :param fields: Поля документов, которые нужно оставить.
+    """
+    return {
+        'docs': [project(doc, fields) for doc in payload.get('docs') or ()],
+        'total': payload.get('total'),
+        'limit': payload.get('limit'),
+    }
@@ -1,31 +1,53 @@
-import aiohttp
-
 from config_data import config
+from kinopoisk_API.cache import normalize_query
+from kinopoisk_API.client import kinopoisk_client
+from kinopoisk_API.fetch import fetch_cached
+from kinopoisk_API.models import MovieCard, project_search
+from kinopoisk_API.movie_index import movie_index
 
 
-async def search_movie_api(movie_name: str, limit: int) -> dict | None:
+async def _fetch_movies(movie_name: str, limit: int) -> dict | None:
+    """
+    Выполняет поиск фильмов и оставляет в ответе только поля, которые показывает бот.
+
+    :param movie_name: Название фильма или его часть для поиска.
+    :param limit: Лимит на количество результатов.
+    :return: Сокращённый ответ API или None в случае ошибки.
+    """
+    # Формирование URL и параметров для поиска фильмов с учетом лимита и запроса по названию
+    search_url = f'{config.KINOPOISK_MOVIE_URL}search'
+    params = {'page': 1, 'limit': limit, 'query': movie_name}
+
+    search_results = await kinopoisk_client.get_json(search_url, params=params)
+    if not search_results:
+        return None
+    search_results = project_search(search_results, MovieCard.API_FIELDS)
+    # Каждый полученный от API фильм попадает в локальный индекс
+    movie_index.add_later(search_results.get('docs') or [])
+    return search_results
+
+
+async def search_movie_api(movie_name: str, limit: int) -> list[MovieCard] | None:
     """
     Асинхронная функция для поиска фильмов по названию через API Кинопоиска.
+    Сначала поиск идёт по локальному индексу фильмов; если в нём недостаточно уверенных совпадений,
+    запрос уходит в API. Повторные запросы отдаются из кэша, в том числе из результата с большим лимитом.
 
     :param movie_name: Название фильма или его часть для поиска.
     :param limit: Лимит на количество возвращаемых результатов.
-    :return: Словарь с результатами поиска фильмов или None в случае ошибки.
+    :return: Список карточек найденных фильмов или None в случае ошибки.
     """
-    # Формирование URL для поиска фильмов с учетом лимита и запроса по названию
-    search_url = f'{config.KINOPOISK_MOVIE_URL}search?page=1&limit={limit}&query={movie_name}'
-
-    # Заголовки для запроса, которые могут включать токены или ключи API
-    request_headers = config.headers
-
-    # Асинхронная сессия для выполнения HTTP-запроса
-    async with aiohttp.ClientSession() as session:
-        # Выполняем GET-запрос с переданными заголовками
-        async with session.get(search_url, headers=request_headers) as response:
-            # Если запрос успешен (статус 200), возвращаем данные в виде словаря
-            if response.status == 200:
-                search_results = await response.json()
-                return search_results
-            else:
-                # В случае ошибки выводим статус и возвращаем None
-                print(f'Ошибка: {response.status}')
-                return None
+    local_results = await movie_index.search(movie_name, limit)
+    if local_results is not None:
+        return local_results
+
+    # Выполняем запрос через кэш и общий пул соединений
+    search_results = await fetch_cached(
+        ('movie_search', normalize_query(movie_name)),
+        lambda search_limit: _fetch_movies(movie_name, search_limit),
+        ttl=config.KINOPOISK_MOVIE_SEARCH_TTL,
+        limit=limit
+    )
+    if search_results is None:
+        return None
+    return [MovieCard.from_api(doc) for doc in search_results['docs']]
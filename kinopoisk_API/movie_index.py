@@ -0,0 +1,209 @@
+import asyncio
+import json
+import re
+import time
+import zlib
+
+from sqlalchemy import func, select, text
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from config_data import config
+from db import ReadSessionLocal
+from db.models import KinopoiskCache, MovieDocument
+from db.writer import DbWriter, db_writer
+from kinopoisk_API.cache import normalize_query
+from kinopoisk_API.models import MovieCard
+from kinopoisk_API.name_matcher import movie_names
+from utils import metrics
+
+_WORD = re.compile(r'\w+')
+
+# Кандидаты вместе с документами: названия, которые начинаются со слов запроса (последнее слово — как префикс);
+# лучшие по bm25 (короткие названия, точные совпадения) идут первыми
+_CANDIDATES_SQL = text(
+    'SELECT movie_names.rowid AS id, name, en_name, alternative_name, '
+    'movie_documents.rating AS rating, movie_documents.payload AS payload '
+    'FROM movie_names JOIN movie_documents ON movie_documents.id = movie_names.rowid '
+    'WHERE movie_names MATCH :match ORDER BY rank LIMIT :candidates'
+)
+_DELETE_NAMES_SQL = text('DELETE FROM movie_names WHERE rowid = :id')
+_INSERT_NAMES_SQL = text(
+    'INSERT INTO movie_names (rowid, name, en_name, alternative_name) '
+    'VALUES (:id, :name, :en_name, :alternative_name)'
+)
+
+
+def _words(value: str | None) -> list[str]:
+    """Слова нормализованной строки (нижний регистр, «ё» как «е»)."""
+    return _WORD.findall(normalize_query(value or ''))
+
+
+def _confidence(words: list[str], name: str | None) -> int:
+    """
+    Насколько название соответствует запросу.
+
+    :return: 2 — название совпадает с запросом, 1 — начинается со всех слов запроса целиком, 0 — иначе.
+    """
+    name_words = _words(name)
+    if name_words == words:
+        return 2
+    return 1 if name_words[:len(words)] == words else 0
+
+
+class MovieIndex:
+    """
+    Локальный полнотекстовый индекс фильмов по русскому, английскому и альтернативному названиям.
+
+    Документы поиска, полученные от API, сохраняются в movie_documents, а их названия — в таблицу FTS5
+    movie_names. Поиск выбирает кандидатов по началу слов запроса и считает уверенными совпадения,
+    в которых одно из названий начинается со всех слов запроса целиком. Если уверенных совпадений не
+    меньше запрошенного количества, поиск отвечает из индекса без обращения к API: сначала точные
+    совпадения названия, затем остальные по рейтингу Кинопоиска.
+    """
+
+    def __init__(self, read_session_factory: async_sessionmaker = ReadSessionLocal, writer: DbWriter = db_writer,
+                 candidates: int = config.MOVIE_INDEX_CANDIDATES, enabled: bool = config.MOVIE_INDEX_ENABLED):
+        """
+        :param read_session_factory: Фабрика сессий для чтения индекса.
+        :param writer: Писатель, через которого документы добавляются в индекс.
+        :param candidates: Сколько совпадений FTS5 проверять на уверенность.
+        :param enabled: Отвечать ли на поиск из индекса.
+        """
+        self.read_session_factory = read_session_factory
+        self.writer = writer
+        self.candidates = candidates
+        self.enabled = enabled
+        self._tasks: set[asyncio.Task] = set()  # Ссылки на фоновые записи, чтобы их не собрал GC
+
+    async def search(self, query: str, limit: int) -> list[MovieCard] | None:
+        """
+        Ищет фильмы в локальном индексе.
+
+        :param query: Поисковый запрос пользователя.
+        :param limit: Сколько фильмов нужно.
+        :return: Карточки фильмов или None, если уверенных совпадений меньше limit.
+        """
+        if not self.enabled:
+            return None
+        words = _words(query)
+        if not words:
+            return None
+        # ^ — фраза с начала названия, звёздочка — последнее слово как префикс; кавычки экранируют синтаксис FTS5
+        match = '{name en_name alternative_name} : ^"%s"*' % ' '.join(words)
+
+        try:
+            async with self.read_session_factory() as session:
+                rows = (await session.execute(_CANDIDATES_SQL, {'match': match,
+                                                                'candidates': self.candidates})).all()
+        except Exception as e:
+            print(f'Error in MovieIndex.search: {e}')
+            return None
+
+        ranked = []
+        for row in rows:
+            confidence = max(_confidence(words, name) for name in (row.name, row.en_name, row.alternative_name))
+            if confidence:
+                ranked.append((-confidence, -(row.rating or 0), row.id, row.payload))
+        if len(ranked) < limit:
+            metrics.inc('movie_index.misses')
+            return None
+
+        ranked.sort(key=lambda item: item[:3])
+        metrics.inc('movie_index.hits')
+        return [MovieCard.from_api(json.loads(zlib.decompress(payload))) for *_, payload in ranked[:limit]]
+
+    @staticmethod
+    async def _write(session: AsyncSession, documents: list[dict], names: list[dict]) -> None:
+        stmt = insert(MovieDocument)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[MovieDocument.id],
+            set_={'payload': stmt.excluded.payload, 'rating': stmt.excluded.rating,
+                  'updated_at': stmt.excluded.updated_at},
+        )
+        await session.execute(stmt, documents)
+        await session.execute(_DELETE_NAMES_SQL, [{'id': row['id']} for row in names])
+        await session.execute(_INSERT_NAMES_SQL, names)
+
+    async def add(self, docs: list[dict]) -> int:
+        """
+        Добавляет документы поиска в индекс или обновляет уже проиндексированные.
+
+        :param docs: Документы фильмов из ответа API (поля MovieCard.API_FIELDS).
+        :return: Количество добавленных документов.
+        """
+        now = time.time()
+        documents, names = [], []
+        for doc in {doc['id']: doc for doc in docs if doc.get('id') and (doc.get('name') or doc.get('enName'))}.values():
+            documents.append({
+                'id': doc['id'],
+                'payload': zlib.compress(json.dumps(doc, ensure_ascii=False).encode()),
+                'rating': (doc.get('rating') or {}).get('kp'),
+                'updated_at': now,
+            })
+            names.append({
+                'id': doc['id'],
+                'name': normalize_query(doc.get('name') or ''),
+                'en_name': normalize_query(doc.get('enName') or ''),
+                'alternative_name': normalize_query(doc.get('alternativeName') or ''),
+            })
+        if not documents:
+            return 0
+
+        try:
+            await self.writer.submit(lambda session: self._write(session, documents, names))
+        except Exception as e:
+            print(f'Error in MovieIndex.add: {e}')
+            return 0
+        metrics.inc('movie_index.documents', len(documents))
+        # Новые названия сразу участвуют в исправлении опечаток
+        movie_names.add(name for row in names for name in (row['name'], row['en_name'], row['alternative_name']))
+        return len(documents)
+
+    def add_later(self, docs: list[dict]) -> None:
+        """
+        Добавляет документы в индекс в фоне, чтобы запись не задерживала ответ пользователю.
+
+        :param docs: Документы фильмов из ответа API.
+        """
+        task = asyncio.ensure_future(self.add(docs))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def backfill(self, batch: int = 500) -> int:
+        """
+        Строит индекс из результатов поиска в постоянном кэше API, если индекс ещё пуст.
+
+        :param batch: Сколько документов записывать за одно изменение.
+        :return: Количество проиндексированных документов.
+        """
+        try:
+            async with self.read_session_factory() as session:
+                if await session.scalar(select(func.count()).select_from(MovieDocument)):
+                    return 0
+                payloads = (await session.scalars(
+                    select(KinopoiskCache.payload).where(KinopoiskCache.key.startswith('movie_search:'))
+                )).all()
+        except Exception as e:
+            print(f'Error in MovieIndex.backfill: {e}')
+            return 0
+
+        docs = {}
+        for payload in payloads:
+            for doc in json.loads(zlib.decompress(payload)).get('docs') or []:
+                docs[doc.get('id')] = doc
+        docs = list(docs.values())
+        added = 0
+        for start in range(0, len(docs), batch):
+            added += await self.add(docs[start:start + batch])
+        if added:
+            print(f'Локальный индекс фильмов: проиндексировано документов из кэша: {added}')
+        return added
+
+    async def close(self) -> None:
+        """Дожидается фоновых записей в индекс."""
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+# Общий локальный индекс фильмов
+movie_index = MovieIndex()
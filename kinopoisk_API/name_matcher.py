@@ -0,0 +1,455 @@
+import asyncio
+import json
+import os
+import pickle
+import re
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter
+from typing import Iterable
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from config_data import config
+from db import ReadSessionLocal
+from db.models import KinopoiskCache
+from kinopoisk_API.cache import normalize_query
+from utils import metrics
+
+_WORD = re.compile(r'\w+')
+
+# Сколько триграмм запроса может изменить одна опечатка (перестановка соседних букв — четыре)
+_TRIGRAMS_PER_TYPO = 4
+# Сколько выбранных триграмм запроса должно найтись в имени-кандидате
+_REQUIRED_TRIGRAMS = 3
+# Сколько номеров имён из списков триграмм подсчитывать за один поиск: списки частых триграмм
+# длинные и мало что отсеивают, поэтому считаются только самые короткие
+_MAX_POSTINGS = 1500
+# Сколько кандидатов с наибольшим числом общих с запросом триграмм сравнивать по расстоянию
+_MAX_CANDIDATES = 8
+# Сколько новых имён держать в отдельном списке по алфавиту, прежде чем слить его с основным
+_RECENT_LIMIT = 4096
+
+# Как часто воркер проверяет, появился ли снимок индексов от главного процесса, сек
+_SNAPSHOT_POLL_INTERVAL = 1
+
+_MOVIE_NAMES_SQL = text('SELECT name, en_name, alternative_name FROM movie_names')
+
+
+def normalize_name(name: str | None) -> str:
+    """Приводит имя к виду для сравнения: слова в нижнем регистре через один пробел, «ё» как «е»."""
+    return ' '.join(_WORD.findall(normalize_query(name or '')))
+
+
+def _trigrams(name: str) -> list[str]:
+    """
+    Триграммы имени с отступами по краям, чтобы начало и конец имени давали свои триграммы.
+
+    :return: Триграммы по порядку: индекс в списке — позиция триграммы в имени.
+    """
+    padded = f'  {name} '
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+def _max_distance(length: int) -> int:
+    """Сколько опечаток допускается в запросе такой длины: в коротких запросах не исправляются."""
+    if length <= 4:
+        return 0
+    return 1 if length <= 9 else 2
+
+
+def _max_word_distance(length: int) -> int:
+    """Сколько опечаток допускается в одном слове запроса: слова из одной-двух букв не исправляются."""
+    return max(1, _max_distance(length)) if length > 2 else 0
+
+
+def _same_words(query_words: list[str], name_words: list[str]) -> bool:
+    """Можно ли считать слова имени исправлением слов запроса, слово за словом."""
+    for query_word, name_word in zip(query_words, name_words):
+        if query_word == name_word:
+            continue
+        if any(char.isdigit() for char in query_word + name_word):
+            return False
+        limit = _max_word_distance(len(query_word))
+        if not limit or _distance(query_word, name_word, limit) > limit:
+            return False
+    return True
+
+
+def _distance(a: str, b: str, limit: int) -> int:
+    """
+    Расстояние между строками с отсечением: замена, пропуск, вставка или перестановка соседних букв
+    считаются одной опечаткой. Общее начало строк пропускается, а на первом расхождении перебираются
+    четыре вида опечатки, поэтому сравнение сводится к нескольким срезам строк.
+
+    :return: Расстояние или limit + 1, если оно больше limit.
+    """
+    if a == b:
+        return 0
+    if limit <= 0 or abs(len(a) - len(b)) > limit:
+        return limit + 1
+    i, end = 0, min(len(a), len(b))
+    while i < end and a[i] == b[i]:
+        i += 1
+    rests = [(a[i + 1:], b[i + 1:]), (a[i + 1:], b[i:]), (a[i:], b[i + 1:])]
+    if i + 1 < end and a[i] == b[i + 1] and a[i + 1] == b[i]:
+        rests.append((a[i + 2:], b[i + 2:]))
+    best = limit + 1
+    for rest_a, rest_b in rests:
+        best = min(best, 1 + _distance(rest_a, rest_b, min(best - 1, limit) - 1))
+        if best == 1:
+            break
+    return best
+
+
+class TrigramIndex:
+    """
+    Индекс имён в памяти для исправления опечаток в запросах.
+
+    Для каждой триграммы и длины имени хранится список имён, в которых она встречается, упорядоченный
+    по позиции триграммы в имени. Опечатка меняет не больше четырёх триграмм запроса и сдвигает
+    остальные не больше чем на одну позицию, поэтому имя в пределах d опечаток содержит все триграммы
+    запроса, кроме не более чем 4d, на расстоянии не больше d позиций от их места в запросе. Кандидаты
+    набираются подсчётом совпадений по срезам этих списков у самых редких триграмм, до _MAX_POSTINGS
+    номеров, и не больше _MAX_CANDIDATES самых похожих сравниваются по расстоянию с учётом перестановки
+    соседних букв. Сначала ищутся имена в одной опечатке. Имена добавляются по одному, без перестроения
+    индекса.
+
+    correct можно вызывать в другом потоке, пока add выполняется в цикле событий: имя попадает в
+    список имён раньше, чем его номер — в списки триграмм, а неточный срез списка, который сдвигается
+    во время чтения, только меняет набор кандидатов: каждый всё равно проверяется по расстоянию.
+    """
+
+    def __init__(self):
+        self._names: list[str] = []  # Нормализованные имена по номеру
+        self._ids: dict[str, int] = {}  # Имя -> номер
+        self._sorted: list[str] = []  # Имена по алфавиту для проверки начала имени
+        self._recent: list[str] = []  # Имена, добавленные после слияния с _sorted, по алфавиту
+        # Триграмма -> длина имени -> (номера имён, позиции триграммы в этих именах по возрастанию)
+        self._postings: dict[str, dict[int, tuple[array, array]]] = {}
+        self._frequency: dict[str, int] = {}  # Триграмма -> сколько раз встречается в именах
+        self.ready = False  # Заполнен ли индекс при запуске; до этого запросы не исправляются
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def add(self, names: Iterable[str | None]) -> int:
+        """
+        Добавляет имена в индекс; уже известные имена пропускаются.
+
+        :param names: Имена в любом регистре.
+        :return: Количество добавленных имён.
+        """
+        added = []
+        postings, frequency = self._postings, self._frequency
+        for name in names:
+            name = normalize_name(name)
+            if not name or name in self._ids:
+                continue
+            name_id = len(self._names)
+            self._names.append(name)
+            self._ids[name] = name_id
+            length = len(name)
+            for position, trigram in enumerate(_trigrams(name)):
+                frequency[trigram] = frequency.get(trigram, 0) + 1
+                by_length = postings.get(trigram)
+                if by_length is None:
+                    by_length = postings[trigram] = {}
+                entry = by_length.get(length)
+                if entry is None:
+                    entry = by_length[length] = array('I'), array('H')
+                name_ids, positions = entry
+                index = bisect_right(positions, position)
+                positions.insert(index, position)
+                name_ids.insert(index, name_id)
+            added.append(name)
+
+        # Новые имена вставляются в небольшой отдельный список; основной список пересортировывается,
+        # только когда новых имён накопилось много, и заменяется целиком
+        if len(self._recent) + len(added) > _RECENT_LIMIT:
+            self._sorted = sorted(self._sorted + self._recent + added)
+            self._recent = []
+        else:
+            for name in added:
+                insort(self._recent, name)
+        return len(added)
+
+    def absorb(self, built: 'TrigramIndex') -> None:
+        """
+        Заменяет содержимое индекса индексом, построенным при запуске, сохраняя имена, которые были
+        добавлены в этот индекс, пока тот строился.
+
+        :param built: Индекс, построенный в другом потоке или загруженный из снимка; дальше не используется.
+        """
+        built.add(self._names)
+        # Списки триграмм заменяются последними: поиск в другом потоке берёт их раньше списка имён,
+        # поэтому номер из списков триграмм всегда есть в списке имён, который поиск возьмёт следом
+        # (а найденное имя всё равно проверяется по расстоянию до запроса)
+        self._names, self._ids = built._names, built._ids
+        self._sorted, self._recent = built._sorted, built._recent
+        self._frequency = built._frequency
+        self._postings = built._postings
+        self.ready = True
+
+    def is_known(self, query: str) -> bool:
+        """Есть ли в индексе имя, которое совпадает с запросом или начинается с него."""
+        query = normalize_name(query)
+        # Отдельный список берётся первым: если его уже слили с основным, основной уже заменён
+        for names in (self._recent, self._sorted):
+            position = bisect_left(names, query)
+            if position < len(names) and names[position].startswith(query):
+                return True
+        return False
+
+    def correct(self, query: str) -> str | None:
+        """
+        Ищет имя, которое отличается от запроса несколькими опечатками.
+
+        Слова запроса сравниваются со словами имени по порядку: число слов должно совпадать, слова с
+        цифрами («2», «1917») и слова из одной-двух букв — совпадать точно, остальные слова — отличаться
+        не больше чем на допустимое для их длины число опечаток. Так «дюна 2» не превращается в «дюна 3».
+
+        :param query: Запрос пользователя.
+        :return: Нормализованное имя или None, если запрос уже совпадает с началом известного имени,
+            похожих имён нет или одинаково похожих имён несколько.
+        """
+        query = normalize_name(query)
+        max_distance = _max_distance(len(query))
+        if not max_distance or not self._names or self.is_known(query):
+            return None
+
+        # Индекс может смениться целиком (absorb), пока поиск идёт в другом потоке: берём его части один раз
+        postings, frequency = self._postings, self._frequency
+        names = self._names
+        trigrams = _trigrams(query)
+        # Позиции триграмм запроса, которые есть в индексе, от самых редких триграмм
+        order = sorted((position for position, trigram in enumerate(trigrams) if trigram in frequency),
+                       key=lambda position: frequency[trigrams[position]])
+        query_words = query.split(' ')
+        # Сначала ищутся имена в одной опечатке: срезы списков у них короче, кандидатов меньше,
+        # и обычно этого достаточно. Поиск на большем расстоянии нужен, только если таких имён нет
+        for distance in range(1, max_distance + 1):
+            found, best = self._closest(names, postings, query, trigrams, order, query_words, distance)
+            if found:
+                return best
+        return None
+
+    @staticmethod
+    def _closest(names: list[str], postings: dict[str, dict[int, tuple[array, array]]], query: str,
+                 trigrams: list[str], order: list[int], query_words: list[str],
+                 max_distance: int) -> tuple[bool, str | None]:
+        """
+        Ищет имена не дальше max_distance опечаток от запроса.
+
+        :return: Нашлись ли такие имена и ближайшее из них или None, если ближайших несколько.
+        """
+        # Для каждой подходящей длины имени — на сколько позиций может сдвинуться триграмма: пропуски и
+        # вставки до неё сдвигают её, а вместе с пропусками и вставками после неё их не больше max_distance
+        windows = []
+        for length in range(len(query) - max_distance, len(query) + max_distance + 1):
+            shift = length - len(query)
+            slack = (max_distance - abs(shift)) // 2
+            windows.append((length, min(shift, 0) - slack, max(shift, 0) + slack + 1))
+
+        # Срезы списков имён для самых редких триграмм запроса. Триграмм, которых нет ни в одном имени
+        # подходящей длины на подходящей позиции, нет и в исправлении: они расходуют допустимые изменения
+        selected, missing = [], len(trigrams) - len(order)
+        for position in order:
+            if len(selected) >= _TRIGRAMS_PER_TYPO * max_distance - missing + _REQUIRED_TRIGRAMS:
+                break
+            by_length = postings.get(trigrams[position], {})
+            slices, size = [], 0
+            for length, low, high in windows:
+                entry = by_length.get(length)
+                if entry is None:
+                    continue
+                name_ids, positions = entry
+                start, end = bisect_left(positions, position + low), bisect_left(positions, position + high)
+                if start < end:
+                    slices.append(name_ids[start:end])
+                    size += end - start
+            if slices:
+                selected.append((size, slices))
+            else:
+                missing += 1
+        budget = _TRIGRAMS_PER_TYPO * max_distance - missing
+        if budget < 0:
+            return False, None
+
+        # Имя в пределах max_distance опечаток есть хотя бы в counted - budget подсчитанных срезах
+        selected.sort(key=lambda item: item[0])
+        counts, counted, total = Counter(), 0, 0
+        for size, slices in selected:
+            if counted and total + size > _MAX_POSTINGS:
+                break
+            for name_ids in slices:
+                counts.update(name_ids)
+            counted += 1
+            total += size
+        required = max(counted - budget, 1)
+        candidates = [name_id for name_id, count in counts.items() if count >= required]
+        # По расстоянию сравниваются только имена с наибольшим числом общих с запросом триграмм
+        if len(candidates) > _MAX_CANDIDATES:
+            candidates.sort(key=counts.__getitem__, reverse=True)
+            del candidates[_MAX_CANDIDATES:]
+
+        best, best_distance, ties = None, max_distance + 1, 0
+        for name_id in candidates:
+            name = names[name_id]
+            if name.count(' ') != len(query_words) - 1:
+                continue
+            distance = _distance(query, name, max_distance)
+            if distance > max_distance or distance > best_distance:
+                continue
+            if not _same_words(query_words, name.split(' ')):
+                continue
+            if distance < best_distance:
+                best, best_distance, ties = name, distance, 0
+            else:
+                ties += 1
+
+        if best is None:
+            return False, None
+        return True, None if ties else best
+
+
+# Имена фильмов (русские, английские и альтернативные названия) и персон, известные боту
+movie_names = TrigramIndex()
+person_names = TrigramIndex()
+
+
+async def correct_query(index: TrigramIndex, query: str) -> str | None:
+    """
+    Исправляет опечатки в запросе по известным боту именам. Поиск идёт в отдельном потоке, чтобы
+    длинные поиски не задерживали обработку других обновлений.
+
+    :param index: Индекс имён фильмов или персон.
+    :param query: Запрос пользователя.
+    :return: Исправленный запрос или None, если исправлять нечего.
+    """
+    if not config.NAME_CORRECTION_ENABLED:
+        return None
+    if not index.ready:
+        # Индексы ещё строятся после запуска: запрос ищется как есть
+        metrics.inc('name_matcher.not_ready')
+        return None
+    corrected = await asyncio.to_thread(index.correct, query)
+    metrics.inc('name_matcher.corrected' if corrected else 'name_matcher.kept')
+    return corrected
+
+
+def _person_docs(key: str, payload: bytes) -> list[dict]:
+    """Документы персон из записи постоянного кэша: результата поиска или карточки персоны."""
+    value = json.loads(zlib.decompress(payload))
+    if key.startswith('person_search:'):
+        return value.get('docs') or []
+    return [value]
+
+
+def _build_name_indexes(movie_rows: list, person_rows: list) -> tuple[TrigramIndex, TrigramIndex]:
+    """Строит индексы имён фильмов и персон из строк базы; выполняется в отдельном потоке."""
+    movies, persons = TrigramIndex(), TrigramIndex()
+    movies.add(name for row in movie_rows for name in row)
+    for key, payload in person_rows:
+        try:
+            docs = _person_docs(key, payload)
+        except (ValueError, zlib.error):
+            continue
+        persons.add(name for doc in docs for name in (doc.get('name'), doc.get('enName')))
+    return movies, persons
+
+
+async def build_name_indexes(read_session_factory: async_sessionmaker = ReadSessionLocal
+                             ) -> tuple[TrigramIndex, TrigramIndex]:
+    """
+    Строит индексы имён из локального индекса фильмов и персон из постоянного кэша API. Чтение идёт
+    через соединение только для чтения, построение — в отдельном потоке.
+
+    :param read_session_factory: Фабрика сессий для чтения.
+    :return: Индексы имён фильмов и персон; пустые, если базу прочитать не удалось.
+    """
+    try:
+        async with read_session_factory() as session:
+            movie_rows = (await session.execute(_MOVIE_NAMES_SQL)).all()
+            person_rows = (await session.execute(
+                select(KinopoiskCache.key, KinopoiskCache.payload).where(
+                    KinopoiskCache.key.startswith('person_search:') | KinopoiskCache.key.startswith('person:')
+                )
+            )).all()
+    except Exception as e:
+        print(f'Error in build_name_indexes: {e}')
+        return TrigramIndex(), TrigramIndex()
+    return await asyncio.to_thread(_build_name_indexes, movie_rows, person_rows)
+
+
+def _use_name_indexes(built: tuple[TrigramIndex, TrigramIndex]) -> None:
+    movie_names.absorb(built[0])
+    person_names.absorb(built[1])
+    metrics.set_gauge('name_matcher.movie_names', len(movie_names))
+    metrics.set_gauge('name_matcher.person_names', len(person_names))
+
+
+async def load_name_indexes(read_session_factory: async_sessionmaker = ReadSessionLocal) -> None:
+    """
+    Заполняет индексы имён при запуске. Запускается фоновой задачей: пока индексы строятся, бот
+    работает, а запросы не исправляются.
+
+    :param read_session_factory: Фабрика сессий для чтения.
+    """
+    _use_name_indexes(await build_name_indexes(read_session_factory))
+
+
+def _write_snapshot(path: str, built: tuple[TrigramIndex, TrigramIndex]) -> None:
+    # Снимок записывается во временный файл и заменяет прежний целиком: воркер не прочитает его наполовину
+    temporary_path = f'{path}.tmp'
+    with open(temporary_path, 'wb') as file:
+        pickle.dump(built, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary_path, path)
+
+
+def _read_snapshot(path: str) -> tuple[TrigramIndex, TrigramIndex]:
+    with open(path, 'rb') as file:
+        return pickle.load(file)
+
+
+def remove_name_indexes_snapshot(path: str = config.NAME_INDEX_SNAPSHOT) -> None:
+    """Удаляет снимок индексов имён прошлого запуска, чтобы воркеры дождались нового."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+async def save_name_indexes_snapshot(path: str = config.NAME_INDEX_SNAPSHOT,
+                                     read_session_factory: async_sessionmaker = ReadSessionLocal) -> None:
+    """
+    Строит индексы имён один раз для всех воркеров и сохраняет их снимок. Выполняется в главном
+    процессе при работе с воркерами.
+
+    :param path: Путь к файлу снимка.
+    :param read_session_factory: Фабрика сессий для чтения.
+    """
+    built = await build_name_indexes(read_session_factory)
+    try:
+        await asyncio.to_thread(_write_snapshot, path, built)
+    except OSError as e:
+        print(f'Error in save_name_indexes_snapshot: {e}')
+
+
+async def load_name_indexes_snapshot(path: str = config.NAME_INDEX_SNAPSHOT) -> None:
+    """
+    Ждёт снимок индексов имён от главного процесса и загружает его вместо построения в каждом воркере.
+    Запускается фоновой задачей, как и load_name_indexes.
+
+    :param path: Путь к файлу снимка.
+    """
+    while not os.path.exists(path):
+        await asyncio.sleep(_SNAPSHOT_POLL_INTERVAL)
+    try:
+        built = await asyncio.to_thread(_read_snapshot, path)
+    except (OSError, EOFError, pickle.UnpicklingError) as e:
+        print(f'Error in load_name_indexes_snapshot: {e}')
+        built = TrigramIndex(), TrigramIndex()
+    _use_name_indexes(built)
@@ -0,0 +1,165 @@
+import asyncio
+import json
+import time
+import zlib
+from typing import Awaitable, Callable, Hashable
+
+from sqlalchemy import delete
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config_data import config
+from db import ReadSessionLocal
+from db.models import KinopoiskCache
+from db.writer import db_writer
+from utils import metrics
+
+
+def _storage_key(key: tuple) -> str:
+    """Превращает ключ кэша вида ('person', 123) в строку 'person:123' для хранения в базе."""
+    return ':'.join(map(str, key))
+
+
+class PersistentCache:
+    """
+    Кэш ответов API Кинопоиска в базе данных, переживающий перезапуск бота.
+
+    Ответы хранятся сжатыми вместе со временем получения. Устаревшие записи можно
+    отдать сразу и обновить в фоне, а совсем старые удаляет периодическая очистка.
+    """
+
+    def __init__(self, stale_ttl: float = config.KINOPOISK_CACHE_STALE_TTL):
+        """
+        :param stale_ttl: Максимальный возраст записи в секундах, после которого она не отдаётся и удаляется.
+        """
+        self.stale_ttl = stale_ttl
+        self._refreshing: set[Hashable] = set()  # Ключи, которые сейчас обновляются в фоне
+        self._tasks: set[asyncio.Task] = set()  # Ссылки на фоновые задачи, чтобы их не собрал GC
+
+    async def get(self, key: tuple, max_age: float | None = None) -> tuple[dict, int | None, float] | None:
+        """
+        Читает запись из базы.
+
+        :param key: Ключ кэша.
+        :param max_age: Максимальный возраст записи в секундах; по умолчанию stale_ttl.
+        :return: Кортеж (ответ API, лимит поиска, возраст в секундах) или None, если записи нет или она слишком старая.
+        """
+        async with ReadSessionLocal() as session:
+            try:
+                row = await session.get(KinopoiskCache, _storage_key(key))
+            except Exception as e:
+                print(f'Error in PersistentCache.get: {e}')
+                return None
+
+        if row is None:
+            metrics.inc('kinopoisk_disk_cache.misses')
+            return None
+
+        age = time.time() - row.fetched_at
+        if age > (self.stale_ttl if max_age is None else max_age):
+            metrics.inc('kinopoisk_disk_cache.misses')
+            return None
+
+        metrics.inc('kinopoisk_disk_cache.hits')
+        payload = json.loads(zlib.decompress(row.payload))
+        return payload, row.search_limit, age
+
+    async def set(self, key: tuple, payload: dict, search_limit: int | None = None) -> None:
+        """
+        Сохраняет ответ API в базу (вставка или замена существующей записи).
+
+        :param key: Ключ кэша.
+        :param payload: Ответ API.
+        :param search_limit: Лимит, с которым выполнялся поиск, если это поиск.
+        """
+        values = {
+            'key': _storage_key(key),
+            'payload': zlib.compress(json.dumps(payload, ensure_ascii=False).encode()),
+            'search_limit': search_limit,
+            'fetched_at': time.time(),
+        }
+        stmt = insert(KinopoiskCache).values(**values)
+        stmt = stmt.on_conflict_do_update(index_elements=[KinopoiskCache.key], set_=values)
+
+        try:
+            await db_writer.submit(lambda session: session.execute(stmt))
+        except Exception as e:
+            print(f'Error in PersistentCache.set: {e}')
+
+    def _spawn(self, coro: Awaitable) -> asyncio.Task:
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def set_later(self, key: tuple, payload: dict, search_limit: int | None = None) -> None:
+        """
+        Сохраняет ответ в фоне, чтобы запись на диск не задерживала ответ пользователю.
+
+        :param key: Ключ кэша.
+        :param payload: Ответ API.
+        :param search_limit: Лимит, с которым выполнялся поиск, если это поиск.
+        """
+        self._spawn(self.set(key, payload, search_limit))
+
+    def schedule_refresh(self, key: tuple, refresh: Callable[[], Awaitable]) -> None:
+        """
+        Запускает фоновое обновление устаревшей записи, если оно ещё не запущено.
+
+        :param key: Ключ кэша.
+        :param refresh: Функция, запрашивающая свежие данные и сохраняющая их в кэш.
+        """
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+        metrics.inc('kinopoisk_disk_cache.refreshes')
+
+        async def run_refresh():
+            try:
+                await refresh()
+            except Exception as e:
+                print(f'Error in background refresh for {_storage_key(key)}: {e}')
+            finally:
+                self._refreshing.discard(key)
+
+        self._spawn(run_refresh())
+
+    async def compact(self) -> int:
+        """
+        Удаляет записи старше допустимого возраста.
+
+        :return: Количество удалённых записей.
+        """
+        threshold = time.time() - self.stale_ttl
+
+        async def delete_expired(session: AsyncSession) -> int:
+            result = await session.execute(delete(KinopoiskCache).where(KinopoiskCache.fetched_at < threshold))
+            return result.rowcount
+
+        try:
+            return await db_writer.submit(delete_expired)
+        except Exception as e:
+            print(f'Error in PersistentCache.compact: {e}')
+            return 0
+
+    async def run_compaction(self, interval: float = config.KINOPOISK_CACHE_COMPACT_INTERVAL) -> None:
+        """
+        Периодически очищает кэш от просроченных записей. Запускается фоновой задачей из main().
+
+        :param interval: Период очистки в секундах.
+        """
+        while True:
+            removed = await self.compact()
+            if removed:
+                print(f'Кэш Кинопоиска: удалено просроченных записей: {removed}')
+            await asyncio.sleep(interval)
+
+    async def close(self) -> None:
+        """Отменяет незавершённые фоновые обновления и записи."""
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+# Общий постоянный кэш для всех модулей kinopoisk_API
+persistent_cache = PersistentCache()
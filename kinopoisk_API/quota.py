@@ -0,0 +1,118 @@
+import asyncio
+import datetime
+
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.future import select
+
+from db import ReadSessionLocal
+from db.models import KinopoiskQuota
+from db.writer import db_writer
+
+# Приоритеты запросов: чем меньше число, тем раньше запрос уходит в API
+PRIORITY_DETAIL = 0  # Детальная информация (нажатие пользователя на конкретного актёра)
+PRIORITY_SEARCH = 1  # Поиск фильмов и актёров
+
+# Суточная квота Кинопоиска сбрасывается по московскому времени
+MOSCOW_TZ = datetime.timezone(datetime.timedelta(hours=3))
+
+
+class QuotaExhausted(Exception):
+    """Запрос не отправлен: у всех ключей API квота исчерпана, осталась только в резерве или ключи отключены."""
+
+
+def _today() -> str:
+    return datetime.datetime.now(MOSCOW_TZ).strftime('%Y-%m-%d')
+
+
+class DailyQuota:
+    """
+    Суточный счётчик запросов к API с сохранением в базе данных.
+
+    Счётчик живёт в памяти и сбрасывается в базу в фоне, поэтому переживает перезапуск
+    бота, но не добавляет запись в базу к каждому запросу.
+    """
+
+    def __init__(self, key_name: str, limit: int, reserve: int):
+        """
+        :param key_name: Имя счётчика в базе.
+        :param limit: Суточный лимит запросов.
+        :param reserve: Часть лимита, доступная только запросам с приоритетом PRIORITY_DETAIL.
+        """
+        self.key_name = key_name
+        self.limit = limit
+        self.reserve = reserve
+        self.day = _today()
+        self.used = 0
+        self._flushed: tuple[str, int] | None = None  # Последнее сохранённое значение: день и счётчик
+        self._flush_task: asyncio.Task | None = None
+
+    def _roll_day(self) -> None:
+        today = _today()
+        if today != self.day:
+            self.day = today
+            self.used = 0
+
+    @property
+    def remaining(self) -> int:
+        """Сколько запросов осталось на сегодня."""
+        self._roll_day()
+        return max(0, self.limit - self.used)
+
+    def allows(self, priority: int) -> bool:
+        """
+        Проверяет, можно ли отправить запрос с указанным приоритетом.
+
+        :param priority: Приоритет запроса.
+        """
+        if priority <= PRIORITY_DETAIL:
+            return self.remaining > 0
+        return self.remaining > self.reserve
+
+    def consume(self) -> None:
+        """Учитывает отправленный запрос и планирует сохранение счётчика."""
+        self._roll_day()
+        self.used += 1
+        self._schedule_flush()
+
+    def exhaust(self) -> None:
+        """Отмечает квоту исчерпанной, например если API ответило, что суточный лимит израсходован."""
+        self._roll_day()
+        self.used = max(self.used, self.limit)
+        self._schedule_flush()
+
+    async def load(self) -> None:
+        """Загружает сегодняшнее значение счётчика из базы."""
+        self.day = _today()
+        async with ReadSessionLocal() as session:
+            try:
+                row = await session.scalar(
+                    select(KinopoiskQuota).filter(KinopoiskQuota.day == self.day,
+                                                  KinopoiskQuota.key_name == self.key_name)
+                )
+                self.used = max(self.used, row.used if row else 0)
+            except Exception as e:
+                print(f'Error in DailyQuota.load: {e}')
+
+    async def flush(self) -> None:
+        """Сохраняет счётчик в базу."""
+        values = {'day': self.day, 'key_name': self.key_name, 'used': self.used}
+        stmt = insert(KinopoiskQuota).values(**values)
+        stmt = stmt.on_conflict_do_update(index_elements=[KinopoiskQuota.day, KinopoiskQuota.key_name],
+                                          set_={'used': values['used']})
+        try:
+            await db_writer.submit(lambda session: session.execute(stmt))
+            self._flushed = values['day'], values['used']
+        except Exception as e:
+            print(f'Error in DailyQuota.flush: {e}')
+
+    def _schedule_flush(self) -> None:
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.ensure_future(self._delayed_flush())
+
+    async def _delayed_flush(self) -> None:
+        # Небольшая задержка, чтобы несколько запросов подряд сохранились одной записью
+        await asyncio.sleep(1)
+        await self.flush()
+        if (self.day, self.used) != self._flushed:
+            # Запросы, учтённые во время записи или не сохранённые из-за ошибки, уйдут следующей записью
+            self._flush_task = asyncio.ensure_future(self._delayed_flush())
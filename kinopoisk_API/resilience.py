@@ -0,0 +1,108 @@
+import random
+import time
+
+from config_data import config
+from utils import metrics
+
+# Состояния автоматического выключателя
+STATE_CLOSED = 'closed'  # Запросы идут как обычно
+STATE_OPEN = 'open'  # API считается недоступным, запросы сразу отклоняются
+STATE_HALF_OPEN = 'half_open'  # Пропускается один пробный запрос
+
+
+class CircuitOpen(Exception):
+    """Запрос не отправлен: автоматический выключатель разомкнут после серии ошибок API."""
+
+
+def backoff_delay(attempt: int,
+                  base: float = config.KINOPOISK_BACKOFF_BASE,
+                  cap: float = config.KINOPOISK_BACKOFF_CAP) -> float:
+    """
+    Возвращает задержку перед повтором: экспоненциальный рост со случайным разбросом (full jitter),
+    чтобы повторы от многих пользователей не приходили в API одновременно.
+
+    :param attempt: Номер повтора, начиная с 1.
+    :param base: Базовая задержка в секундах.
+    :param cap: Максимальная задержка в секундах.
+    """
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+class CircuitBreaker:
+    """
+    Автоматический выключатель для вызовов API.
+
+    После threshold ошибок подряд размыкается, и запросы сразу отклоняются, чтобы
+    обработчики не копили корутины в ожидании недоступного API. Через recovery_timeout
+    пропускает один пробный запрос: успех замыкает выключатель, ошибка снова размыкает.
+    """
+
+    def __init__(self, name: str,
+                 threshold: int = config.KINOPOISK_BREAKER_THRESHOLD,
+                 recovery_timeout: float = config.KINOPOISK_BREAKER_RECOVERY):
+        """
+        :param name: Имя выключателя, используется как префикс метрик.
+        :param threshold: Количество ошибок подряд, после которого выключатель размыкается.
+        :param recovery_timeout: Время в секундах до пробного запроса после размыкания.
+        """
+        self.name = name
+        self.threshold = threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = STATE_CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        metrics.set_gauge(f'{self.name}.state', self.state)
+
+    def _transition(self, state: str) -> None:
+        if state == self.state:
+            return
+        print(f'Выключатель {self.name}: {self.state} -> {state}')
+        self.state = state
+        metrics.inc(f'{self.name}.transitions.{state}')
+        metrics.set_gauge(f'{self.name}.state', state)
+
+    def allow(self) -> bool:
+        """
+        Проверяет, можно ли сейчас отправить запрос.
+
+        :return: True, если выключатель замкнут или пора отправить пробный запрос.
+        """
+        if self.state == STATE_OPEN and time.monotonic() - self.opened_at >= self.recovery_timeout:
+            self._transition(STATE_HALF_OPEN)
+            self._probe_in_flight = False
+
+        if self.state == STATE_CLOSED:
+            return True
+        if self.state == STATE_HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+
+        metrics.inc(f'{self.name}.rejected')
+        return False
+
+    def release_probe(self) -> None:
+        """
+        Освобождает пробный запрос, который завершился без ответа API: например, кончилась квота
+        или запрос отменён. Иначе выключатель остался бы полуразомкнутым и отклонял все запросы.
+        """
+        if self.state == STATE_HALF_OPEN:
+            self._probe_in_flight = False
+
+    def record_success(self) -> None:
+        """Учитывает успешный ответ и замыкает выключатель."""
+        self.failures = 0
+        self._probe_in_flight = False
+        self._transition(STATE_CLOSED)
+
+    def record_failure(self) -> None:
+        """Учитывает ошибку и размыкает выключатель, если ошибок слишком много или упал пробный запрос."""
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.state == STATE_HALF_OPEN or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+            self._transition(STATE_OPEN)
+
+
+# Общий выключатель для всех запросов к API Кинопоиска
+circuit_breaker = CircuitBreaker('kinopoisk_breaker')
@@ -0,0 +1,99 @@
+import asyncio
+import heapq
+import itertools
+
+from kinopoisk_API.key_pool import ApiKey, KeyPool, key_pool
+from kinopoisk_API.quota import QuotaExhausted
+from utils import metrics
+
+
+class RequestScheduler:
+    """
+    Планировщик исходящих запросов к API Кинопоиска.
+
+    Пропускает запросы в порядке приоритета (детальные запросы раньше поиска) и для
+    каждого выдаёт API-ключ из пула, у которого есть свободный токен и квота. Когда
+    квота всех ключей почти израсходована, отказывает поисковым запросам, чтобы
+    вызывающий код отдал данные из кэша.
+    """
+
+    def __init__(self, pool: KeyPool = key_pool):
+        """
+        :param pool: Пул API-ключей.
+        """
+        self.pool = pool
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []  # Куча (приоритет, номер, future)
+        self._counter = itertools.count()
+        self._wakeup: asyncio.Event | None = None
+        self._dispatcher: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        """Загружает сохранённые квоты ключей и запускает раздачу разрешений."""
+        await self.pool.load()
+        self._ensure_dispatcher()
+
+    def _ensure_dispatcher(self) -> None:
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.ensure_future(self._dispatch())
+
+    async def _dispatch(self) -> None:
+        """Выдаёт ключи ожидающим запросам по одному, начиная с высшего приоритета."""
+        while True:
+            while not self._waiters:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+
+            priority, _, waiter = self._waiters[0]
+            if waiter.done():
+                # Запрос отменили, пока он ждал в очереди
+                heapq.heappop(self._waiters)
+                continue
+
+            if not self.pool.allows(priority):
+                heapq.heappop(self._waiters)
+                metrics.inc('kinopoisk_scheduler.quota_rejected')
+                waiter.set_exception(QuotaExhausted('Нет ключей с доступной квотой'))
+                continue
+
+            key = self.pool.take(priority)
+            if key is None:
+                # Ни у одного ключа нет свободного токена — ждём ближайший
+                await asyncio.sleep(self.pool.delay(priority))
+                continue
+
+            heapq.heappop(self._waiters)
+            waiter.set_result(key)
+
+    async def acquire(self, priority: int) -> ApiKey:
+        """
+        Ждёт разрешения на отправку запроса.
+
+        :param priority: Приоритет запроса (PRIORITY_DETAIL или PRIORITY_SEARCH).
+        :return: API-ключ, с которым нужно выполнить запрос; запрос уже учтён в его квоте.
+        :raises QuotaExhausted: Если квоты на запрос с таким приоритетом не осталось.
+        """
+        if not self.pool.allows(priority):
+            metrics.inc('kinopoisk_scheduler.quota_rejected')
+            raise QuotaExhausted('Нет ключей с доступной квотой')
+
+        self._ensure_dispatcher()
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._counter), waiter))
+        self._wakeup.set()
+        key = await waiter
+        metrics.inc('kinopoisk_scheduler.sent')
+        return key
+
+    async def close(self) -> None:
+        """Останавливает раздачу разрешений и сохраняет счётчики квот."""
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            await asyncio.gather(self._dispatcher, return_exceptions=True)
+            self._dispatcher = None
+        await self.pool.flush()
+
+
+# Общий планировщик запросов для всех модулей kinopoisk_API
+request_scheduler = RequestScheduler()
@@ -0,0 +1,69 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+
+from utils import metrics
+
+
+class _Call:
+    """Выполняющийся запрос и количество ожидающих его вызовов."""
+    __slots__ = ('task', 'waiters')
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Объединяет одновременные одинаковые запросы в один.
+
+    Первый вызов с ключом запускает запрос, остальные вызовы с тем же ключом, пришедшие
+    до его завершения, ждут тот же результат. Исключение запроса получают все ожидающие.
+    Отмена одного ожидающего не отменяет общий запрос, пока его ждёт кто-то ещё.
+    """
+
+    def __init__(self, name: str):
+        """
+        :param name: Имя группы, используется как префикс метрик.
+        """
+        self.name = name
+        self.collapsed = 0  # Сколько вызовов присоединилось к уже выполняющемуся запросу
+        self._calls: dict[Hashable, _Call] = {}
+
+    def in_flight(self) -> int:
+        """Возвращает количество выполняющихся сейчас запросов."""
+        return len(self._calls)
+
+    def _forget(self, key: Hashable, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Выполняет fn() или присоединяется к уже выполняющемуся запросу с тем же ключом.
+
+        :param key: Ключ запроса.
+        :param fn: Функция без аргументов, возвращающая корутину запроса.
+        :return: Результат запроса.
+        """
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+        else:
+            self.collapsed += 1
+            metrics.inc(f'{self.name}.collapsed')
+
+        call.waiters += 1
+        try:
+            # shield: отмена этого вызова не должна отменять запрос для остальных
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            if not call.task.done() and call.waiters == 1:
+                # Это был последний ожидающий — результат больше никому не нужен
+                call.task.cancel()
+                self._forget(key, call)
+            raise
+        finally:
+            call.waiters -= 1
@@ -1,4 +1,6 @@
 import asyncio
+import hashlib
+import signal
 
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
@@ -8,17 +10,34 @@ from aiogram.types import Message
 from aiogram.fsm.storage.memory import MemoryStorage
 
 from config_data import config
-from db import init_db
+from db import close_db, init_db
+from db.db_service import user_writer
+from db.writer import db_writer
+from db.fsm_storage import SQLiteStorage
+from db.middleware import DbSessionMiddleware
 from handlers import handlers
 from handlers.default_handlers import help, start
+from kinopoisk_API.client import kinopoisk_client
+from kinopoisk_API.movie_index import movie_index
+from kinopoisk_API.name_matcher import (load_name_indexes, load_name_indexes_snapshot, remove_name_indexes_snapshot,
+                                        save_name_indexes_snapshot)
+from kinopoisk_API.persistent_cache import persistent_cache
+from kinopoisk_API.scheduler import request_scheduler
+from utils.file_id_cache import FileIdMiddleware, file_id_cache
+from utils.send_scheduler import send_scheduler
+from utils.sharding import ChatOrderedFeeder, ShardRouter, WorkerSupervisor, consume
+from utils.webhook import WebhookServer
 
 TOKEN = config.TELEGRAM_BOT_TOKEN
 
-# Создаем хранилище для состояний
-storage = MemoryStorage()
+# Создаем хранилище для состояний: по умолчанию в базе бота, чтобы диалоги переживали перезапуск.
+# Диспетчер сам закрывает хранилище при остановке, сохраняя последние изменения.
+storage = MemoryStorage() if config.FSM_STORAGE == 'memory' else SQLiteStorage()
 
 # Инициализация диспетчера с хранилищем
 dp = Dispatcher(storage=storage)
+# Одна сессия базы данных на обновление, обработчики получают её аргументом session
+dp.update.middleware(DbSessionMiddleware())
 
 
 # Асинхронный вызов инициализации базы данных
@@ -38,19 +57,202 @@ async def cmd_help(message: Message) -> None:
     await help.help_command(message)
 
 
-async def main() -> None:
-    # Вызов функции инициализации базы данных
-    await setup_db()
+async def run_polling(bot: Bot, dispatcher: Dispatcher = dp) -> None:
+    # Снимаем вебхук, если бот раньше работал в режиме вебхука. Накопившиеся обновления
+    # по умолчанию сохраняются, чтобы сообщения, отправленные во время перезапуска, не терялись
+    await bot.delete_webhook(drop_pending_updates=config.DROP_PENDING_UPDATES)
+    # Распределителю обновлений по воркерам важен порядок, а сам он работает быстро
+    await dispatcher.start_polling(bot, allowed_updates=dp.resolve_used_update_types(),
+                                   handle_as_tasks=not isinstance(dispatcher, ShardRouter))
+
+
+def webhook_secret() -> str:
+    """
+    Возвращает секрет вебхука: WEBHOOK_SECRET или значение, производное от токена бота.
+
+    Секрет должен совпадать у всех экземпляров бота и не меняться при перезапуске, иначе обновления,
+    отправленные с секретом из set_webhook другого экземпляра, будут отклонены.
+    """
+    if config.WEBHOOK_SECRET:
+        return config.WEBHOOK_SECRET
+    return hashlib.sha256(f'kinobot-webhook:{TOKEN}'.encode()).hexdigest()
+
+
+async def run_webhook(bot: Bot, dispatcher: Dispatcher = dp) -> None:
+    secret_token = webhook_secret()
+    server = WebhookServer(dispatcher, bot, secret_token=secret_token)
+    await server.start()
+
+    # Останавливаемся по SIGTERM (docker stop) так же, как по Ctrl+C
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+
+    try:
+        await bot.set_webhook(
+            url=config.WEBHOOK_BASE_URL.rstrip('/') + config.WEBHOOK_PATH,
+            secret_token=secret_token,
+            max_connections=config.WEBHOOK_MAX_CONNECTIONS,
+            allowed_updates=dp.resolve_used_update_types(),
+            drop_pending_updates=config.DROP_PENDING_UPDATES,
+        )
+        server.ready = True
+        print(f'Вебхук запущен на {config.WEBHOOK_HOST}:{config.WEBHOOK_PORT}{config.WEBHOOK_PATH}')
+        await stop.wait()
+    finally:
+        # Вебхук в Telegram не удаляем: обновления, пришедшие во время перезапуска, дождутся бота
+        await server.close()
 
+
+def create_bot() -> Bot:
     # Инициализируем бота
     bot = Bot(token=TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+    # Постеры, которые бот уже отправлял, повторно отправляются по file_id, а не по URL
+    bot.session.middleware(FileIdMiddleware(file_id_cache))
+    return bot
+
+
+async def prepare_shared_storage() -> asyncio.Task:
+    """
+    Готовит данные, общие для всех процессов бота: схему базы с миграциями и локальный индекс фильмов,
+    и запускает периодическую очистку постоянного кэша. С несколькими воркерами выполняется один раз
+    в главном процессе до их запуска.
+
+    :return: Фоновая задача очистки кэша, которую нужно передать в stop_shared_storage.
+    """
+    # Вызов функции инициализации базы данных
+    await setup_db()
+    # Локальный индекс фильмов строится из кэша API при первом запуске
+    await movie_index.backfill()
+
+    # Запускаем периодическую очистку постоянного кэша Кинопоиска
+    return asyncio.create_task(persistent_cache.run_compaction())
+
+
+async def stop_shared_storage(compaction_task: asyncio.Task) -> None:
+    """Останавливает очистку кэша и закрывает базу главного процесса при работе с воркерами."""
+    compaction_task.cancel()
+    await persistent_cache.close()
+    await movie_index.close()
+    await db_writer.close()
+    await close_db()
+
+
+async def start_services(shared: bool = True) -> list[asyncio.Task]:
+    """
+    Подготавливает всё, что нужно для обработки обновлений: базу, хранилища, обработчики и клиент API.
+
+    :param shared: Готовить ли и общие данные (см. prepare_shared_storage); воркеры получают их
+        готовыми от главного процесса.
+    :return: Фоновые задачи, которые нужно передать в stop_services.
+    """
+    tasks = [await prepare_shared_storage()] if shared else []
+    # Индексы для исправления опечаток строятся в фоне (воркеры загружают снимок главного процесса),
+    # бот начинает работу, не дожидаясь их
+    tasks.append(asyncio.create_task(load_name_indexes() if shared else load_name_indexes_snapshot()))
+
+    if isinstance(storage, SQLiteStorage):
+        await storage.start()
+    await file_id_cache.load()
 
     # Регистрируем обработчики
     registry = handlers.HandlerRegistry(dp)
     registry.register_all_handlers(dp)
 
-    # Стартуем бот
-    await dp.start_polling(bot, skip_updates=True)
+    # При остановке досылаем поставленные в очередь сообщения, пока сессия бота ещё открыта
+    dp.shutdown.register(send_scheduler.close)
+
+    # Открываем общий пул соединений к API Кинопоиска
+    await kinopoisk_client.start()
+    await request_scheduler.start()
+    return tasks
+
+
+async def stop_services(tasks: list[asyncio.Task]) -> None:
+    # Останавливаем фоновые задачи и закрываем соединения с API Кинопоиска
+    for task in tasks:
+        task.cancel()
+    await persistent_cache.close()
+    await movie_index.close()
+    await file_id_cache.close()
+    await user_writer.close()
+    await db_writer.close()
+    await close_db()
+    await request_scheduler.close()
+    await kinopoisk_client.close()
+
+
+async def run_worker_async(queue) -> None:
+    bot = create_bot()
+    # Схема базы, индекс фильмов и очистка кэша уже подготовлены главным процессом
+    tasks = await start_services(shared=False)
+    await dp.emit_startup(bot=bot)
+    try:
+        await consume(queue, ChatOrderedFeeder(dp, bot))
+    finally:
+        await dp.emit_shutdown(bot=bot)
+        await bot.session.close()
+        await stop_services(tasks)
+
+
+def run_worker(index: int, queue) -> None:
+    """
+    Точка входа процесса-воркера: обрабатывает обновления своих чатов из очереди.
+
+    :param index: Номер воркера.
+    :param queue: Очередь обновлений от главного процесса.
+    """
+    # Ctrl+C в терминале получает вся группа процессов; воркер останавливает главный процесс,
+    # дав ему дообработать очередь
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    print(f'Воркер {index} запущен.')
+    asyncio.run(run_worker_async(queue))
+
+
+async def run_sharded() -> None:
+    # Обработчики регистрируются и здесь, чтобы знать, какие типы обновлений запрашивать у Telegram
+    handlers.HandlerRegistry.register_all_handlers(dp)
+    # Общие данные готовятся один раз до запуска воркеров, а не в каждом из них
+    compaction_task = await prepare_shared_storage()
+    # Индексы имён тоже строятся один раз: воркеры ждут снимок и загружают его
+    remove_name_indexes_snapshot()
+    snapshot_task = asyncio.create_task(save_name_indexes_snapshot())
+
+    supervisor = WorkerSupervisor(run_worker, config.WORKERS)
+    supervisor.start()
+    supervise_task = asyncio.create_task(supervisor.supervise())
+
+    router = ShardRouter(supervisor.queues)
+    bot = Bot(token=TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+    try:
+        if config.BOT_MODE == 'webhook':
+            await run_webhook(bot, router)
+        else:
+            await run_polling(bot, router)
+    finally:
+        supervise_task.cancel()
+        snapshot_task.cancel()
+        await supervisor.stop()
+        await stop_shared_storage(compaction_task)
+
+
+async def main() -> None:
+    # Несколько воркеров: этот процесс только принимает обновления и распределяет их
+    if config.WORKERS > 1:
+        await run_sharded()
+        return
+
+    bot = create_bot()
+    tasks = await start_services()
+    try:
+        # Стартуем бот
+        if config.BOT_MODE == 'webhook':
+            await run_webhook(bot)
+        else:
+            await run_polling(bot)
+    finally:
+        await stop_services(tasks)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,7 @@
+from . import metrics
+from . import token_bucket
+from . import send_scheduler
+from . import album
+from . import file_id_cache
+from . import webhook
+from . import sharding
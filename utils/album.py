@@ -0,0 +1,56 @@
+from aiogram.methods import TelegramMethod
+from aiogram.types import InputMediaPhoto, Message
+
+# Ограничения Bot API: в альбоме от 2 до 10 элементов, текстовое сообщение до 4096 символов
+ALBUM_SIZE = 10
+MAX_MESSAGE_LENGTH = 4096
+
+
+def album_batch(message: Message, items: list[tuple[str | None, str]]) -> list[TelegramMethod]:
+    """
+    Собирает пачку методов для отправки результатов поиска альбомами.
+
+    Идущие подряд результаты с картинкой группируются в альбомы (sendMediaGroup) до 10 штук
+    с подписью на каждом элементе; если в группе одна картинка, она уходит обычным фото.
+    Идущие подряд результаты без картинки объединяются в текстовые сообщения. Сообщения
+    отправляются в порядке нумерации результатов.
+
+    :param message: Сообщение, в чат которого отправляются результаты.
+    :param items: Пары (URL картинки или None, подпись в HTML) в порядке нумерации.
+    :return: Методы Bot API для планировщика отправки.
+    """
+    batch = []
+    group = []  # Картинки текущего альбома
+    text = ''  # Текущее текстовое сообщение
+
+    def close_group() -> None:
+        if len(group) == 1:
+            photo, caption = group[0]
+            batch.append(message.answer_photo(photo=photo, caption=caption, parse_mode='HTML'))
+        elif group:
+            batch.append(message.answer_media_group(media=[
+                InputMediaPhoto(media=photo, caption=caption, parse_mode='HTML') for photo, caption in group
+            ]))
+        group.clear()
+
+    def close_text() -> None:
+        nonlocal text
+        if text:
+            batch.append(message.answer(text, parse_mode='HTML'))
+            text = ''
+
+    for photo, caption in items:
+        if photo:
+            close_text()
+            group.append((photo, caption))
+            if len(group) == ALBUM_SIZE:
+                close_group()
+        else:
+            close_group()
+            if text and len(text) + len(caption) + 2 > MAX_MESSAGE_LENGTH:
+                close_text()
+            text = f'{text}\n\n{caption}' if text else caption
+    close_group()
+    close_text()
+
+    return batch
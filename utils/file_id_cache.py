@@ -0,0 +1,239 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.methods import SendMediaGroup, SendPhoto, TelegramMethod
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config_data import config
+from db import ReadSessionLocal
+from db.models import TelegramFileId
+from utils import metrics
+
+# Фрагменты ошибок Bot API, означающих, что сохранённый file_id больше не действителен. Другие ошибки,
+# в которых упоминается file_id, не должны вытеснять действующие записи
+INVALID_FILE_ID_ERRORS = (
+    'wrong file identifier', 'wrong remote file identifier', 'file reference expired', 'file_reference_expired'
+)
+
+
+def is_invalid_file_id(error: TelegramBadRequest) -> bool:
+    """
+    Проверяет, что Telegram отклонил запрос из-за недействительного file_id.
+
+    :param error: Ошибка Bot API.
+    """
+    message = error.message.lower()
+    return any(fragment in message for fragment in INVALID_FILE_ID_ERRORS)
+
+
+def _is_url(media: Any) -> bool:
+    return isinstance(media, str) and media.startswith(('http://', 'https://'))
+
+
+class FileIdCache:
+    """
+    Кэш соответствия URL картинки Кинопоиска и file_id, который Telegram вернул при первой отправке.
+
+    Повторная отправка по file_id не заставляет Telegram заново скачивать картинку с CDN.
+    Соответствия хранятся в памяти (ограниченный LRU) и в базе, чтобы переживать перезапуск;
+    запись в базу идёт в фоне пачками.
+    """
+
+    def __init__(self, max_size: int = config.TELEGRAM_FILE_ID_CACHE_SIZE):
+        """
+        :param max_size: Сколько соответствий держать в памяти.
+        """
+        self.max_size = max_size
+        self._items: OrderedDict[str, str] = OrderedDict()
+        self._pending: dict[str, str | None] = {}  # Несохранённые изменения: URL -> file_id или None для удаления
+        self._flush_task: asyncio.Task | None = None
+
+    async def load(self) -> None:
+        """Загружает из базы последние сохранённые соответствия."""
+        async with ReadSessionLocal() as session:
+            try:
+                result = await session.execute(
+                    select(TelegramFileId.url, TelegramFileId.file_id)
+                    .order_by(TelegramFileId.updated_at.desc())
+                    .limit(self.max_size)
+                )
+                # Самые свежие записи должны оказаться в конце LRU
+                for url, file_id in reversed(result.all()):
+                    self._items[url] = file_id
+            except Exception as e:
+                print(f'Error in FileIdCache.load: {e}')
+
+    def get(self, url: str) -> str | None:
+        """
+        Возвращает file_id для URL картинки.
+
+        :param url: URL картинки.
+        :return: file_id или None, если картинка ещё не отправлялась.
+        """
+        file_id = self._items.get(url)
+        if file_id is None:
+            metrics.inc('file_id_cache.misses')
+            return None
+        self._items.move_to_end(url)
+        metrics.inc('file_id_cache.hits')
+        return file_id
+
+    def set(self, url: str, file_id: str) -> None:
+        """
+        Запоминает file_id картинки.
+
+        :param url: URL картинки.
+        :param file_id: file_id из ответа Telegram.
+        """
+        if self._items.get(url) == file_id:
+            return
+        self._items[url] = file_id
+        self._items.move_to_end(url)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+        self._pending[url] = file_id
+        self._schedule_flush()
+
+    def evict(self, url: str) -> None:
+        """
+        Забывает file_id, который Telegram признал недействительным.
+
+        :param url: URL картинки.
+        """
+        self._items.pop(url, None)
+        self._pending[url] = None
+        metrics.inc('file_id_cache.evicted')
+        self._schedule_flush()
+
+    async def flush(self) -> None:
+        """Сохраняет накопленные изменения в базу одной транзакцией."""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        now = time.time()
+        rows = [{'url': url, 'file_id': file_id, 'updated_at': now} for url, file_id in pending.items() if file_id]
+        removed = [url for url, file_id in pending.items() if file_id is None]
+
+        async def write(session: AsyncSession) -> None:
+            if rows:
+                stmt = insert(TelegramFileId)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[TelegramFileId.url],
+                    set_={'file_id': stmt.excluded.file_id, 'updated_at': stmt.excluded.updated_at},
+                )
+                await session.execute(stmt, rows)
+            if removed:
+                await session.execute(delete(TelegramFileId).where(TelegramFileId.url.in_(removed)))
+
+        # Писатель базы импортирует utils.metrics, а пакет utils при импорте загружает этот модуль
+        from db.writer import db_writer
+
+        try:
+            await db_writer.submit(write)
+        except Exception as e:
+            # Более новые изменения тех же URL, сделанные во время записи, важнее
+            self._pending = {**pending, **self._pending}
+            print(f'Error in FileIdCache.flush: {e}')
+
+    def _schedule_flush(self) -> None:
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.ensure_future(self._delayed_flush())
+
+    async def _delayed_flush(self) -> None:
+        # Небольшая задержка, чтобы картинки одной пачки результатов сохранились одной записью
+        await asyncio.sleep(1)
+        await self.flush()
+        if self._pending:
+            # Изменения, сделанные во время записи или не записанные из-за ошибки, уйдут следующей записью
+            self._flush_task = asyncio.ensure_future(self._delayed_flush())
+
+    async def close(self) -> None:
+        """Дожидается начатой записи и сохраняет оставшиеся изменения."""
+        if self._flush_task is not None:
+            # Отмена посреди записи потеряла бы изменения, уже забранные из очереди
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            # Запись, запланированная после начатой, ещё ждёт задержки: её изменения сохранятся ниже
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+
+
+class FileIdMiddleware(BaseRequestMiddleware):
+    """
+    Middleware сессии бота: подменяет URL картинок в sendPhoto и sendMediaGroup на
+    сохранённые file_id и запоминает file_id из ответов Telegram.
+
+    Если Telegram отвечает, что file_id недействителен, соответствие удаляется из кэша,
+    а запрос повторяется с исходными URL.
+    """
+
+    def __init__(self, cache: FileIdCache):
+        """
+        :param cache: Кэш file_id.
+        """
+        self.cache = cache
+
+    async def __call__(self, make_request: NextRequestMiddlewareType, bot: Bot, method: TelegramMethod) -> Any:
+        if isinstance(method, SendPhoto) and _is_url(method.photo):
+            return await self._send_photo(make_request, bot, method)
+        if isinstance(method, SendMediaGroup) and any(_is_url(media.media) for media in method.media):
+            return await self._send_media_group(make_request, bot, method)
+        return await make_request(bot, method)
+
+    async def _send_photo(self, make_request: NextRequestMiddlewareType, bot: Bot, method: SendPhoto) -> Any:
+        url = method.photo
+        file_id = self.cache.get(url)
+        if file_id is not None:
+            try:
+                return await make_request(bot, method.model_copy(update={'photo': file_id}))
+            except TelegramBadRequest as e:
+                if not is_invalid_file_id(e):
+                    raise
+                self.cache.evict(url)
+
+        result = await make_request(bot, method)
+        if result.photo:
+            # Последний размер — исходное изображение
+            self.cache.set(url, result.photo[-1].file_id)
+        return result
+
+    async def _send_media_group(self, make_request: NextRequestMiddlewareType, bot: Bot,
+                                method: SendMediaGroup) -> Any:
+        urls = [media.media if _is_url(media.media) else None for media in method.media]
+        file_ids = [self.cache.get(url) if url else None for url in urls]
+
+        if any(file_ids):
+            media = [
+                item.model_copy(update={'media': file_id}) if file_id else item
+                for item, file_id in zip(method.media, file_ids)
+            ]
+            try:
+                result = await make_request(bot, method.model_copy(update={'media': media}))
+            except TelegramBadRequest as e:
+                if not is_invalid_file_id(e):
+                    raise
+                # Telegram не сообщает, какой из элементов альбома недействителен, поэтому забываем все
+                for url, file_id in zip(urls, file_ids):
+                    if file_id:
+                        self.cache.evict(url)
+                file_ids = [None] * len(urls)
+                result = await make_request(bot, method)
+        else:
+            result = await make_request(bot, method)
+
+        # Запоминаем file_id картинок, которые были отправлены по URL
+        for url, file_id, message in zip(urls, file_ids, result):
+            if url and not file_id and message.photo:
+                self.cache.set(url, message.photo[-1].file_id)
+        return result
+
+
+# Общий кэш file_id картинок для бота
+file_id_cache = FileIdCache()
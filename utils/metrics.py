@@ -0,0 +1,36 @@
+from collections import Counter
+
+# Счётчики метрик процесса: имя метрики -> значение
+counters: Counter = Counter()
+
+# Текущие значения метрик-состояний (например, состояние автомата): имя метрики -> значение
+gauges: dict = {}
+
+
+def inc(name: str, value: int = 1) -> None:
+    """
+    Увеличивает счётчик метрики.
+
+    :param name: Имя метрики.
+    :param value: На сколько увеличить счётчик.
+    """
+    counters[name] += value
+
+
+def set_gauge(name: str, value) -> None:
+    """
+    Запоминает текущее значение метрики-состояния.
+
+    :param name: Имя метрики.
+    :param value: Текущее значение.
+    """
+    gauges[name] = value
+
+
+def snapshot() -> dict:
+    """
+    Возвращает копию всех счётчиков и состояний, например для логов или эндпоинта мониторинга.
+
+    :return: Словарь имя метрики -> значение.
+    """
+    return {**counters, **gauges}
@@ -0,0 +1,206 @@
+import asyncio
+from collections import deque
+from typing import Any, Iterable
+
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import TelegramMethod
+
+from config_data import config
+from utils import metrics
+from utils.token_bucket import TokenBucket
+
+
+class _Batch:
+    """Пачка сообщений одного обработчика и future с результатами отправки."""
+    __slots__ = ('methods', 'results', 'future')
+
+    def __init__(self, methods: list[TelegramMethod], future: asyncio.Future):
+        self.methods = methods
+        self.results: list[Any] = []
+        self.future = future
+
+
+class SendScheduler:
+    """
+    Планировщик исходящих сообщений Telegram.
+
+    Обработчики ставят в очередь пачку методов Bot API (например, результат
+    message.answer_photo(...) без await) и сразу возвращаются. Планировщик
+    отправляет их с максимальной допустимой скоростью: не чаще chat_rate сообщений
+    в секунду в один чат и global_rate сообщений в секунду суммарно, сохраняя
+    порядок сообщений внутри чата. На ответ 429 (RetryAfter) ставится на паузу
+    только чат, в котором он получен.
+    """
+
+    def __init__(
+            self,
+            global_rate: float = config.TELEGRAM_GLOBAL_RATE / config.SHARD_COUNT,
+            chat_rate: float = config.TELEGRAM_CHAT_RATE,
+            chat_burst: float = config.TELEGRAM_CHAT_BURST,
+            max_retries: int = config.TELEGRAM_SEND_RETRIES,
+    ):
+        """
+        :param global_rate: Сообщений в секунду на весь процесс (доля общего лимита бота, если воркеров несколько).
+        :param chat_rate: Сообщений в секунду в один чат.
+        :param chat_burst: Сколько сообщений можно отправить в чат подряд без паузы.
+        :param max_retries: Сколько раз повторять сообщение после 429, прежде чем отказаться от него.
+        """
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self._queues: dict[int, deque[_Batch]] = {}  # Очереди пачек по чатам; порядок ключей — очередь обхода
+        self._buckets: dict[int, TokenBucket] = {}
+        self._retries: dict[int, int] = {}  # Сколько раз подряд получено 429 для текущего сообщения чата
+        self._busy: set[int] = set()  # Чаты, в которые сейчас идёт отправка
+        self._tasks: set[asyncio.Task] = set()
+        self._wakeup: asyncio.Event | None = None
+        self._dispatcher: asyncio.Task | None = None
+
+    def enqueue(self, methods: Iterable[TelegramMethod]) -> asyncio.Future:
+        """
+        Ставит пачку сообщений в очередь чата и сразу возвращает управление.
+
+        Методы должны быть привязаны к боту (как результат message.answer(...) без await).
+        Все методы пачки отправляются в один чат — в чат первого метода.
+
+        :param methods: Методы Bot API в порядке отправки.
+        :return: Future со списком результатов (None для сообщений, которые не удалось отправить).
+        """
+        self._ensure_dispatcher()
+        future = asyncio.get_running_loop().create_future()
+        methods = list(methods)
+        if not methods:
+            future.set_result([])
+            return future
+
+        chat_id = methods[0].chat_id
+        self._queues.setdefault(chat_id, deque()).append(_Batch(methods, future))
+        metrics.inc('telegram_sender.enqueued', len(methods))
+        self._wakeup.set()
+        return future
+
+    def _ensure_dispatcher(self) -> None:
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.ensure_future(self._dispatch())
+
+    def _bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    def _prune_buckets(self) -> None:
+        """Забывает ограничители чатов без очереди, которые полностью восстановились."""
+        for chat_id, bucket in list(self._buckets.items()):
+            if chat_id not in self._queues and bucket.delay() == 0 and bucket.tokens >= bucket.capacity:
+                del self._buckets[chat_id]
+
+    async def _dispatch(self) -> None:
+        """Обходит чаты по кругу и запускает отправку, как только позволяют оба ограничителя."""
+        while True:
+            if not self._queues:
+                self._prune_buckets()
+
+            delay = None
+            for chat_id in list(self._queues):
+                if chat_id in self._busy:
+                    continue
+                chat_delay = self._bucket(chat_id).delay()
+                if chat_delay > 0:
+                    delay = chat_delay if delay is None else min(delay, chat_delay)
+                    continue
+                global_delay = self.global_bucket.delay()
+                if global_delay > 0:
+                    delay = global_delay if delay is None else min(delay, global_delay)
+                    break
+
+                self._bucket(chat_id).try_acquire()
+                self.global_bucket.try_acquire()
+                # Переставляем чат в конец, чтобы остальные чаты получили свою очередь
+                self._queues[chat_id] = self._queues.pop(chat_id)
+                self._busy.add(chat_id)
+                task = asyncio.ensure_future(self._send(chat_id))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _send(self, chat_id: int) -> None:
+        """Отправляет очередное сообщение чата и продвигает его очередь."""
+        queue = self._queues[chat_id]
+        batch = queue[0]
+        method = batch.methods[len(batch.results)]
+        try:
+            result = await method
+            metrics.inc('telegram_sender.sent')
+        except TelegramRetryAfter as e:
+            retries = self._retries.get(chat_id, 0) + 1
+            self._bucket(chat_id).pause(e.retry_after)
+            metrics.inc('telegram_sender.retry_after')
+            if retries <= self.max_retries:
+                # Сообщение остаётся первым в очереди и уйдёт после паузы
+                self._retries[chat_id] = retries
+                return
+            print(f'Error in SendScheduler._send: {e}')
+            metrics.inc('telegram_sender.failed')
+            result = None
+        except Exception as e:
+            print(f'Error in SendScheduler._send: {e}')
+            metrics.inc('telegram_sender.failed')
+            result = None
+        finally:
+            self._busy.discard(chat_id)
+            self._wakeup.set()
+
+        self._retries.pop(chat_id, None)
+        batch.results.append(result)
+        if len(batch.results) == len(batch.methods):
+            queue.popleft()
+            if not batch.future.done():
+                batch.future.set_result(batch.results)
+            if not queue:
+                del self._queues[chat_id]
+
+    async def drain(self) -> None:
+        """Ждёт, пока будут отправлены все поставленные в очередь сообщения."""
+        while self._queues:
+            await asyncio.gather(*(queue[-1].future for queue in list(self._queues.values())),
+                                 return_exceptions=True)
+
+    async def close(self, timeout: float = 5.0) -> None:
+        """
+        Дожидается отправки очереди (не дольше timeout) и останавливает планировщик.
+
+        :param timeout: Сколько секунд ждать отправки оставшихся сообщений.
+        """
+        if self._queues:
+            try:
+                await asyncio.wait_for(self.drain(), timeout)
+            except asyncio.TimeoutError:
+                print(f'Планировщик отправки: не отправлено пачек: {sum(map(len, self._queues.values()))}')
+
+        tasks = list(self._tasks)
+        if self._dispatcher is not None:
+            tasks.append(self._dispatcher)
+            self._dispatcher = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        for queue in self._queues.values():
+            for batch in queue:
+                if not batch.future.done():
+                    batch.future.cancel()
+        self._queues.clear()
+        self._busy.clear()
+
+
+# Общий планировщик исходящих сообщений для всех обработчиков
+send_scheduler = SendScheduler()
@@ -0,0 +1,212 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from collections import deque
+from typing import Any, Callable
+
+from aiogram import Bot, Dispatcher
+from aiogram.dispatcher.middlewares.user_context import UserContextMiddleware
+from aiogram.types import Update
+
+from utils import metrics
+
+# Сигнал воркеру, что обновлений больше не будет
+STOP = None
+
+
+def update_chat_id(update: Update) -> int:
+    """
+    Определяет чат, к которому относится обновление; по нему выбирается воркер.
+
+    :param update: Обновление Telegram.
+    :return: ID чата, ID пользователя для обновлений без чата или 0.
+    """
+    context = UserContextMiddleware.resolve_event_context(update)
+    if context.chat is not None:
+        return context.chat.id
+    if context.user is not None:
+        return context.user.id
+    return 0
+
+
+class ShardRouter(Dispatcher):
+    """
+    Диспетчер фронтового процесса: не обрабатывает обновления сам, а отправляет их воркерам.
+
+    Обновления одного чата всегда попадают к одному воркеру (chat_id по модулю числа воркеров),
+    поэтому порядок сообщений чата и его состояние FSM остаются в одном процессе. Работает и с
+    long polling, и с вебхуком, так как оба пути проходят через feed_update.
+    """
+
+    def __init__(self, queues: list, **kwargs: Any):
+        """
+        :param queues: Очереди воркеров (multiprocessing.Queue), по одной на воркер.
+        """
+        super().__init__(**kwargs)
+        self.queues = queues
+
+    async def feed_update(self, bot: Bot, update: Update, **kwargs: Any) -> Any:
+        shard = update_chat_id(update) % len(self.queues)
+        self.queues[shard].put(update.model_dump_json(exclude_unset=True))
+        metrics.inc(f'shard.{shard}.updates')
+        return None
+
+
+class ChatOrderedFeeder:
+    """
+    Передаёт обновления в диспетчер воркера: разные чаты обрабатываются параллельно,
+    обновления одного чата — строго по очереди, в порядке поступления.
+    """
+
+    def __init__(self, dispatcher: Dispatcher, bot: Bot):
+        """
+        :param dispatcher: Диспетчер воркера с зарегистрированными обработчиками.
+        :param bot: Бот воркера.
+        """
+        self.dispatcher = dispatcher
+        self.bot = bot
+        self._chats: dict[int, deque[Update]] = {}  # Необработанные обновления чатов, у которых есть задача
+        self._tasks: set[asyncio.Task] = set()
+
+    def feed(self, raw_update: str) -> None:
+        """
+        Ставит обновление в очередь его чата.
+
+        :param raw_update: Обновление в JSON, как его отправил ShardRouter.
+        """
+        update = Update.model_validate_json(raw_update, context={'bot': self.bot})
+        chat_id = update_chat_id(update)
+        pending = self._chats.get(chat_id)
+        if pending is not None:
+            pending.append(update)
+            return
+
+        self._chats[chat_id] = deque([update])
+        task = asyncio.ensure_future(self._run_chat(chat_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_chat(self, chat_id: int) -> None:
+        pending = self._chats[chat_id]
+        try:
+            while pending:
+                update = pending.popleft()
+                try:
+                    await self.dispatcher.feed_update(self.bot, update)
+                except Exception as e:
+                    print(f'Error in ChatOrderedFeeder for chat {chat_id}: {e}')
+        finally:
+            del self._chats[chat_id]
+
+    async def drain(self) -> None:
+        """Ждёт обработки всех полученных обновлений."""
+        while self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+async def consume(queue, feeder: ChatOrderedFeeder) -> None:
+    """
+    Читает обновления из очереди воркера, пока не придёт сигнал остановки.
+
+    :param queue: Очередь воркера.
+    :param feeder: Передатчик обновлений в диспетчер.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        raw_update = await loop.run_in_executor(None, queue.get)
+        if raw_update is STOP:
+            break
+        feeder.feed(raw_update)
+    await feeder.drain()
+
+
+class WorkerSupervisor:
+    """
+    Запускает процессы-воркеры и перезапускает упавшие.
+
+    Очередь воркера создаётся один раз и переживает его перезапуск, так что обновления,
+    пришедшие, пока воркер поднимался, не теряются. Повторные падения подряд
+    перезапускаются с растущей задержкой.
+    """
+
+    def __init__(self, target: Callable[[int, Any], None], count: int, check_interval: float = 1.0):
+        """
+        :param target: Функция процесса-воркера: target(номер воркера, очередь).
+        :param count: Число воркеров.
+        :param check_interval: Период проверки воркеров в секундах.
+        """
+        self.target = target
+        self.count = count
+        self.check_interval = check_interval
+        self._context = multiprocessing.get_context('spawn')
+        self.queues = [self._context.Queue() for _ in range(count)]
+        self._processes: list = [None] * count
+        self._started_at = [0.0] * count
+        self._restart_at: list[float | None] = [None] * count  # Когда перезапустить упавший воркер
+        self._failures = [0] * count  # Падений подряд вскоре после запуска
+
+    def _start(self, index: int) -> None:
+        # Настройки читаются при импорте config, поэтому номер шарда и число шардов
+        # передаются воркеру через окружение, которое он наследует при запуске
+        environ = {'SHARD_INDEX': str(index), 'SHARD_COUNT': str(self.count)}
+        saved = {name: os.environ.get(name) for name in environ}
+        os.environ.update(environ)
+        try:
+            process = self._context.Process(target=self.target, args=(index, self.queues[index]),
+                                            name=f'kinobot-worker-{index}', daemon=True)
+            process.start()
+        finally:
+            for name, value in saved.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+        self._processes[index] = process
+        self._started_at[index] = time.monotonic()
+        self._restart_at[index] = None
+
+    def start(self) -> None:
+        """Запускает все воркеры."""
+        for index in range(self.count):
+            self._start(index)
+
+    def check(self) -> None:
+        """Перезапускает завершившиеся воркеры (с задержкой, если они падают сразу после запуска)."""
+        now = time.monotonic()
+        for index, process in enumerate(self._processes):
+            restart_at = self._restart_at[index]
+            if restart_at is not None:
+                if now >= restart_at:
+                    self._start(index)
+                continue
+            if process.is_alive():
+                continue
+
+            # Воркер, проработавший больше минуты, перезапускается сразу
+            self._failures[index] = self._failures[index] + 1 if now - self._started_at[index] < 60 else 0
+            delay = min(30.0, 2.0 ** self._failures[index] - 1)
+            print(f'Воркер {index} завершился с кодом {process.exitcode}, перезапуск через {delay:.0f} с')
+            metrics.inc('shard.restarts')
+            self._restart_at[index] = now + delay
+
+    async def supervise(self) -> None:
+        """Периодически проверяет воркеры. Запускается фоновой задачей."""
+        while True:
+            await asyncio.sleep(self.check_interval)
+            self.check()
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """
+        Отправляет воркерам сигнал остановки и ждёт, пока они обработают оставшиеся обновления.
+
+        :param timeout: Сколько секунд ждать воркеры, прежде чем завершить их принудительно.
+        """
+        for queue in self.queues:
+            queue.put(STOP)
+        deadline = time.monotonic() + timeout
+        loop = asyncio.get_running_loop()
+        for process in self._processes:
+            await loop.run_in_executor(None, process.join, max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.terminate()
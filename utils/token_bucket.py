@@ -0,0 +1,67 @@
+import asyncio
+import time
+
+
+class TokenBucket:
+    """
+    Ограничитель частоты «ведро с токенами».
+
+    Токены пополняются со скоростью rate в секунду, но не больше capacity.
+    Каждое действие забирает один токен; если токенов нет, нужно подождать.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        :param rate: Скорость пополнения, токенов в секунду.
+        :param capacity: Максимальное количество накопленных токенов (размер всплеска).
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def delay(self) -> float:
+        """
+        Возвращает, сколько секунд нужно подождать до появления токена.
+
+        :return: 0, если токен доступен прямо сейчас.
+        """
+        self._refill()
+        pause = max(0.0, self.paused_until - time.monotonic())
+        if self.tokens >= 1:
+            return pause
+        return max(pause, (1 - self.tokens) / self.rate)
+
+    def try_acquire(self) -> bool:
+        """
+        Забирает токен, если он доступен прямо сейчас.
+
+        :return: True, если токен получен.
+        """
+        if self.delay() > 0:
+            return False
+        self.tokens -= 1
+        return True
+
+    async def acquire(self) -> None:
+        """Ждёт появления токена и забирает его."""
+        while not self.try_acquire():
+            await asyncio.sleep(self.delay())
+
+    def refund(self) -> None:
+        """Возвращает неиспользованный токен."""
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+    def pause(self, seconds: float) -> None:
+        """
+        Приостанавливает выдачу токенов, например после ответа 429 Too Many Requests.
+
+        :param seconds: Длительность паузы в секундах.
+        """
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
@@ -0,0 +1,115 @@
+import asyncio
+from typing import Any
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+from config_data import config
+from utils import metrics
+
+
+class LimitedRequestHandler(SimpleRequestHandler):
+    """
+    Обработчик вебхука aiogram с ограничением числа одновременно обрабатываемых обновлений.
+
+    Telegram получает ответ сразу после того, как обновление взято в обработку. Если заняты
+    все max_concurrent слотов, ответ задерживается до освобождения слота: Telegram не шлёт
+    новые обновления по занятым соединениям и держит их у себя, так что очередь не растёт
+    в памяти бота и обновления не теряются. Секретный токен проверяет SimpleRequestHandler.
+    """
+
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, secret_token: str, max_concurrent: int, **data: Any):
+        """
+        :param dispatcher: Диспетчер aiogram.
+        :param bot: Бот, для которого принимаются обновления.
+        :param secret_token: Секрет из заголовка X-Telegram-Bot-Api-Secret-Token.
+        :param max_concurrent: Сколько обновлений обрабатывать одновременно.
+        """
+        super().__init__(dispatcher=dispatcher, bot=bot, handle_in_background=True, secret_token=secret_token,
+                         **data)
+        self.max_concurrent = max_concurrent
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self.in_flight = 0
+
+    def verify_secret(self, telegram_secret_token: str, bot: Bot) -> bool:
+        verified = super().verify_secret(telegram_secret_token, bot)
+        if not verified:
+            metrics.inc('webhook.unauthorized')
+        return verified
+
+    async def _handle_request_background(self, bot: Bot, request: web.Request) -> web.Response:
+        update = await request.json(loads=bot.session.json_loads)
+        await self._slots.acquire()
+        self.in_flight += 1
+        metrics.inc('webhook.updates')
+
+        task = asyncio.create_task(self._background_feed_update(bot=bot, update=update))
+        self._background_feed_update_tasks.add(task)
+        task.add_done_callback(self._release)
+        return web.json_response({}, dumps=bot.session.json_dumps)
+
+    def _release(self, task: asyncio.Task) -> None:
+        self._background_feed_update_tasks.discard(task)
+        self.in_flight -= 1
+        self._slots.release()
+
+
+class WebhookServer:
+    """
+    HTTP-сервер бота в режиме вебхука: приём обновлений и эндпоинты проверки состояния.
+
+    /health — жив ли процесс (всегда 200), /ready — готов ли бот принимать обновления:
+    200 после регистрации вебхука в Telegram и 503 до неё и во время остановки, чтобы
+    балансировщик не отправлял запросы в неготовый экземпляр.
+    """
+
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, secret_token: str,
+                 max_concurrent: int = config.WEBHOOK_MAX_CONCURRENT_UPDATES):
+        """
+        :param dispatcher: Диспетчер aiogram.
+        :param bot: Бот.
+        :param secret_token: Секретный токен вебхука.
+        :param max_concurrent: Сколько обновлений обрабатывать одновременно.
+        """
+        self.ready = False
+        self.app = web.Application()
+        self.handler = LimitedRequestHandler(dispatcher, bot, secret_token=secret_token,
+                                             max_concurrent=max_concurrent)
+        # Остановка диспетчера (и досылка очереди сообщений) должна идти до закрытия сессии бота,
+        # которое регистрирует handler.register, поэтому setup_application вызывается первым
+        setup_application(self.app, dispatcher, bot=bot)
+        self.handler.register(self.app, path=config.WEBHOOK_PATH)
+        self.app.router.add_get('/health', self.health)
+        self.app.router.add_get('/ready', self.readiness)
+        self._runner: web.AppRunner | None = None
+
+    async def health(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            'status': 'ok',
+            'updates_in_flight': self.handler.in_flight,
+            'max_concurrent_updates': self.handler.max_concurrent,
+        })
+
+    async def readiness(self, request: web.Request) -> web.Response:
+        if self.ready:
+            return web.json_response({'status': 'ready'})
+        return web.json_response({'status': 'not ready'}, status=503)
+
+    async def start(self, host: str = config.WEBHOOK_HOST, port: int = config.WEBHOOK_PORT) -> None:
+        """
+        Запускает HTTP-сервер (вместе с ним срабатывает запуск диспетчера).
+
+        :param host: Адрес, на котором слушать.
+        :param port: Порт.
+        """
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+
+    async def close(self) -> None:
+        """Останавливает сервер: диспетчер, затем сессию бота."""
+        self.ready = False
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None